@@ -0,0 +1,353 @@
+"""
+计算准入控制
+按网格规模、插值方法、岩层数和导出类型估算请求的计算成本:
+全局计算预算占满时请求排队等待, 队列已满或等待超时返回 429 与 Retry-After;
+每个客户端另有按成本扣减的令牌桶, 避免单个客户端连续提交大任务占满预算。
+预算与令牌桶均为进程内状态, 多工作进程部署时每个进程各自限额。
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from rate_limiter import get_client_ip
+
+# 成本基准: 150×150 网格、线性插值、单个岩层
+REFERENCE_CELLS = 150 * 150
+MIN_COST = 0.1
+
+# 插值方法的相对计算量 (以线性插值为 1), 未列出的方法按 DEFAULT_METHOD_COST
+METHOD_COSTS = {
+    "nearest": 0.3,
+    "linear": 1.0,
+    "bilinear": 1.0,
+    "cubic": 1.5,
+    "idw": 2.0,
+    "natural_neighbor": 2.0,
+    "anisotropic": 2.5,
+    "modified_shepard": 2.5,
+    "multiquadric": 4.0,
+    "inverse": 4.0,
+    "gaussian": 4.0,
+    "thin_plate": 4.0,
+    "radial_basis": 4.0,
+    "linear_rbf": 4.0,
+    "cubic_rbf": 4.0,
+    "quintic_rbf": 4.0,
+    "kriging": 8.0,
+    "ordinary_kriging": 8.0,
+    "universal_kriging": 10.0,
+}
+DEFAULT_METHOD_COST = 2.0
+
+# 导出格式相对于只建模的额外倍数
+EXPORT_COSTS = {
+    "dxf": 1.5,
+    "stl": 1.5,
+    "stl_single": 1.5,
+    "stl_layered": 1.5,
+    "obj": 1.5,
+    "flac3d": 3.0,
+    "f3grid": 3.0,
+}
+
+# 插值方法对比固定训练约十种方法, 只在检验点上求值
+COMPARISON_COST = 2.0
+
+
+def estimate_cost(
+    resolution: Optional[int] = None,
+    method: Optional[str] = None,
+    seams: int = 1,
+    export_type: Optional[str] = None,
+) -> float:
+    """估算一次插值 / 建模 / 导出的计算成本"""
+    resolution = int(resolution or 150)
+    method_cost = METHOD_COSTS.get(str(method or "linear").lower(), DEFAULT_METHOD_COST)
+    export_cost = EXPORT_COSTS.get(str(export_type).lower(), 1.0) if export_type else 1.0
+    cost = resolution * resolution / REFERENCE_CELLS * method_cost * max(int(seams), 1) * export_cost
+    return max(cost, MIN_COST)
+
+
+def _contour_cost(body: Dict[str, Any]) -> float:
+    return estimate_cost(body.get("resolution"), body.get("method"))
+
+
+def _block_model_cost(body: Dict[str, Any]) -> float:
+    return estimate_cost(body.get("resolution"), body.get("method"), len(body.get("selected_seams") or ()))
+
+
+def _export_cost(body: Dict[str, Any]) -> float:
+    return estimate_cost(
+        body.get("resolution"),
+        body.get("method"),
+        len(body.get("selected_seams") or ()),
+        body.get("export_type"),
+    )
+
+
+COST_ESTIMATORS: Dict[str, Callable[[Dict[str, Any]], float]] = {
+    "contour": _contour_cost,
+    "block_model": _block_model_cost,
+    "export": _export_cost,
+    "comparison": lambda body: COMPARISON_COST,
+}
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入 (客户端额度不足或全局队列已满 / 等待超时)"""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """按成本扣减的令牌桶"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self, cost: float) -> float:
+        """扣减成本, 成功返回 0, 额度不足时返回需要等待的秒数 (不扣减)"""
+        self._refill(time.monotonic())
+        # 超过桶容量的请求在桶满时放行, 否则永远无法执行
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def refund(self, cost: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class Ticket:
+    """已获准入的请求, 结束时交还预算"""
+
+    __slots__ = ("client", "cost", "started_at")
+
+    def __init__(self, client: str, cost: float) -> None:
+        self.client = client
+        self.cost = cost
+        self.started_at = time.monotonic()
+
+
+class AdmissionController:
+    """全局计算预算 + 先进先出等待队列 + 客户端令牌桶
+
+    所有方法都在事件循环线程中调用, 不需要加锁。单个成本超过预算的请求在预算空闲时独占执行;
+    队首请求放不下时后面的请求也继续等待, 大任务不会被小任务饿死。
+    """
+
+    MAX_CLIENTS = 4096
+
+    def __init__(
+        self,
+        budget: float,
+        max_queue: int,
+        queue_timeout: float,
+        client_burst: float,
+        client_rate: float,
+    ) -> None:
+        self.budget = budget
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.client_burst = client_burst
+        self.client_rate = client_rate
+        self._in_use = 0.0
+        self._waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # 每单位成本的平均耗时 (秒), 用于估算 Retry-After
+        self._seconds_per_unit = 1.0
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_CLIENTS:
+                # 已补满的桶与新建的桶等价, 可以丢弃
+                for key in [key for key, item in self._buckets.items() if item.is_full()]:
+                    del self._buckets[key]
+            bucket = TokenBucket(self.client_burst, self.client_rate)
+            self._buckets[client] = bucket
+        return bucket
+
+    def _queue_length(self) -> int:
+        return sum(1 for _, future in self._waiters if not future.done())
+
+    def _queued_cost(self) -> float:
+        return sum(cost for cost, future in self._waiters if not future.done())
+
+    def _retry_after(self, cost: float) -> int:
+        """按当前占用与排队的成本估算多久后可以重试"""
+        backlog = self._in_use + self._queued_cost() + cost
+        return max(1, math.ceil(backlog * self._seconds_per_unit / max(self.budget, MIN_COST)))
+
+    def _fits(self, cost: float) -> bool:
+        return self._in_use == 0 or self._in_use + cost <= self.budget
+
+    def _wake(self) -> None:
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()  # 已超时或已取消
+                continue
+            if not self._fits(cost):
+                break
+            self._waiters.popleft()
+            self._in_use += cost
+            future.set_result(None)
+
+    async def admit(self, client: str, cost: float) -> Ticket:
+        """获取准入, 预算不足时排队; 被拒绝时抛出 AdmissionRejected"""
+        bucket = self._bucket(client)
+        wait = bucket.take(cost)
+        if wait > 0:
+            self._rejected += 1
+            raise AdmissionRejected("计算请求过于频繁", max(1, math.ceil(min(wait, 3600))))
+
+        requested, cost = cost, min(cost, self.budget)
+        if not self._waiters and self._fits(cost):
+            self._in_use += cost
+            self._admitted += 1
+            return Ticket(client, cost)
+
+        if self._queue_length() >= self.max_queue:
+            bucket.refund(requested)
+            self._rejected += 1
+            raise AdmissionRejected("服务器计算繁忙, 排队已满", self._retry_after(cost))
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((cost, future))
+        self._queued += 1
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # 客户端断开: 已分到的预算立即交还
+            if future.done() and not future.cancelled():
+                self._release_cost(cost)
+            else:
+                future.cancel()
+            raise
+        if not done:
+            future.cancel()
+            self._wake()
+            bucket.refund(requested)
+            self._rejected += 1
+            raise AdmissionRejected("服务器计算繁忙, 排队超时", self._retry_after(cost))
+        self._admitted += 1
+        return Ticket(client, cost)
+
+    def _release_cost(self, cost: float) -> None:
+        self._in_use = self._in_use - cost
+        if self._in_use < 1e-9:  # 浮点累计误差
+            self._in_use = 0.0
+        self._wake()
+
+    def release(self, ticket: Ticket) -> None:
+        """请求结束 (成功或失败) 后交还预算"""
+        elapsed = time.monotonic() - ticket.started_at
+        self._seconds_per_unit = 0.8 * self._seconds_per_unit + 0.2 * elapsed / max(ticket.cost, MIN_COST)
+        self._release_cost(ticket.cost)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "in_use": round(self._in_use, 2),
+            "queue_length": self._queue_length(),
+            "queued_cost": round(self._queued_cost(), 2),
+            "max_queue": self.max_queue,
+            "clients": len(self._buckets),
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "rejected": self._rejected,
+            "seconds_per_unit": round(self._seconds_per_unit, 3),
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器"""
+    global _controller
+    if _controller is None:
+        from performance_config import (
+            ADMISSION_BUDGET,
+            ADMISSION_CLIENT_BURST,
+            ADMISSION_CLIENT_RATE,
+            ADMISSION_MAX_QUEUE,
+            ADMISSION_QUEUE_TIMEOUT,
+        )
+
+        _controller = AdmissionController(
+            budget=ADMISSION_BUDGET,
+            max_queue=ADMISSION_MAX_QUEUE,
+            queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+            client_burst=ADMISSION_CLIENT_BURST,
+            client_rate=ADMISSION_CLIENT_RATE,
+        )
+    return _controller
+
+
+def admission_control(kind: str):
+    """计算密集接口的准入依赖, 按请求体估算成本, 请求处理完成后交还预算
+
+    Example:
+        @app.post("/api/export")
+        async def export_model_endpoint(payload: ExportRequest, _: Any = Depends(admission_control("export"))):
+            ...
+    """
+    estimator = COST_ESTIMATORS[kind]
+
+    async def dependency(request: Request):
+        from performance_config import ADMISSION_ENABLED
+
+        if not ADMISSION_ENABLED:
+            yield None
+            return
+
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        try:
+            cost = estimator(body if isinstance(body, dict) else {})
+        except (TypeError, ValueError):
+            cost = estimator({})  # 请求体字段类型不对时交给接口自身的校验报错
+
+        controller = get_admission_controller()
+        try:
+            ticket = await controller.admit(get_client_ip(request), cost)
+        except AdmissionRejected as exc:
+            print(f"[准入控制] 拒绝 {kind} 请求 (成本 {cost:.1f}): {exc}")
+            raise HTTPException(
+                status_code=429,
+                detail=f"{exc}，请{exc.retry_after}秒后重试",
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+        try:
+            yield ticket
+        finally:
+            controller.release(ticket)
+
+    return dependency
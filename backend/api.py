@@ -1,16 +1,18 @@
 # backend/api.py
-import io
 import os
 import sys
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple
 import threading
 import json
 from scipy.interpolate import griddata, Rbf
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
+from csv_reader import read_csv
+from property_fill import build_lithology_stats, fill_properties, summarize_fill
+
 # 导入优化后的模块
 from key_strata_calculator import calculate_key_strata_details as calculate_key_strata_optimized
 from data_validation import validate_geological_data, GeologicalDataValidator
@@ -31,16 +33,11 @@ def calculate_key_strata_details(df_strata_above_coal, coal_seam_properties_df):
 
 
 def _read_csv_from_bytes(file_bytes: bytes) -> pd.DataFrame:
-    """Read CSV content from raw bytes with robust encoding fallbacks."""
-    encodings = ["utf-8-sig", "utf-8", "gbk"]
-    last_error: Optional[Exception] = None
-    for encoding in encodings:
-        try:
-            return pd.read_csv(io.BytesIO(file_bytes), encoding=encoding)
-        except Exception as exc:  # pragma: no cover - relies on external files
-            last_error = exc
-            continue
-    raise ValueError(f"无法解析CSV文件: {last_error}")
+    """Read CSV content from raw bytes, sniffing the encoding before a single parse."""
+    try:
+        return read_csv(file_bytes)
+    except Exception as exc:  # pragma: no cover - relies on external files
+        raise ValueError(f"无法解析CSV文件: {exc}")
 
 
 def process_single_borehole_file(file_bytes: bytes, filename: str) -> Tuple[List[Dict[str, Any]], str, str]:
@@ -152,61 +149,13 @@ def fill_missing_properties(df: pd.DataFrame, rock_db: pd.DataFrame, stat_prefer
     if lithology_col is None or "岩性" not in rock_db.columns:
         return df, 0, []
 
-    stats_group = rock_db.copy()
-    stats_group["岩性"] = stats_group["岩性"].astype(str).str.strip()
-    stats_group = stats_group[stats_group["岩性"].astype(bool)]
-
-    aggregation: Dict[str, str] = {}
-    numeric_columns = []
-    for column in stats_group.columns:
-        if column == "岩性":
-            continue
-        if pd.api.types.is_numeric_dtype(stats_group[column]):
-            numeric_columns.append(column)
-            aggregation[column] = stat_preference
-
-    if not numeric_columns:
+    stats_map = build_lithology_stats(rock_db, stat=stat_preference)
+    if stats_map.empty:
         return df, 0, []
 
-    stats_map = stats_group.groupby("岩性").agg(aggregation)
-
-    filled_df = df.copy()
-    filled_count = 0
-    filled_cols: set[str] = set()
-
-    for idx, row in filled_df.iterrows():
-        lithology = str(row.get(lithology_col, "")).strip()
-        match_row = None
-        if lithology:
-            exact = stats_map.loc[stats_map.index == lithology]
-            if not exact.empty:
-                match_row = exact.iloc[0]
-            elif "煤" in lithology:
-                coal_candidates = stats_map.loc[stats_map.index.str.contains("煤")]
-                if not coal_candidates.empty:
-                    match_row = coal_candidates.iloc[0]
-
-        if match_row is None:
-            continue
-
-        for column in numeric_columns:
-            if column not in filled_df.columns:
-                continue
-            current = filled_df.at[idx, column]
-            needs_fill = pd.isna(current)
-            if not needs_fill:
-                try:
-                    needs_fill = float(current) == 0.0
-                except Exception:
-                    needs_fill = False
-            if needs_fill:
-                value = match_row.get(column)
-                if pd.notna(value):
-                    filled_df.at[idx, column] = value
-                    filled_count += 1
-                    filled_cols.add(column)
-
-    return filled_df, filled_count, sorted(filled_cols)
+    filled_df, filled_mask = fill_properties(df, stats_map, lithology_col)
+    report = summarize_fill(filled_mask)
+    return filled_df, report["filled_count"], sorted(report["filled_columns"])
 
 # ==============================================================================
 #  API 类
@@ -3,87 +3,213 @@
 无需Redis，使用Python内置数据结构实现缓存
 """
 import time
-import hashlib
-import json
-from typing import Any, Dict, Optional, Callable
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from functools import wraps
 from threading import RLock
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fingerprint import fingerprint
+from single_flight import get_single_flight
+
+
+DEFAULT_NAMESPACE = "default"
+
+
+def cache_namespace(key: str) -> str:
+    """缓存键的命名空间: 第一个冒号之前的前缀 (如 db:records_count:... 属于 db)"""
+    namespace = key.split(":", 1)[0] if ":" in key else ""
+    return namespace or DEFAULT_NAMESPACE
+
+
+def key_matcher(pattern: str) -> Tuple[str, Callable[[str], bool]]:
+    """解析失效模式, 返回 (字面前缀, 匹配函数)
+
+    不含通配符时按前缀匹配 (如 "db:records"), 含 * ? [ 时按 fnmatch 规则匹配整个键
+    (如 "db:records_count:*@records=*")。
+    """
+    wildcard = next((index for index, char in enumerate(pattern) if char in "*?["), None)
+    if wildcard is None:
+        return pattern, lambda key: key.startswith(pattern)
+    return pattern[:wildcard], lambda key: fnmatchcase(key, pattern)
 
 
 class MemoryCache:
-    """线程安全的内存缓存实现"""
+    """线程安全的内存缓存实现
 
-    def __init__(self, max_size: int = 100, default_ttl: int = 300):
+    按条目实际占用的字节数淘汰: 全局字节预算之外, 各命名空间另有配额,
+    某个命名空间超出配额时只淘汰该命名空间内最久未使用的条目。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100,
+        default_ttl: int = 300,
+        max_bytes: Optional[int] = None,
+        namespace_quotas: Optional[Dict[str, int]] = None,
+        on_evict: Optional[Callable[[str, Any, float, int], None]] = None,
+    ):
         """
         Args:
             max_size: 最大缓存条目数
             default_ttl: 默认TTL (秒)
+            max_bytes: 全局字节预算, None 表示不限制
+            namespace_quotas: 命名空间 -> 字节配额, 未列出的命名空间只受全局预算限制
+            on_evict: 条目因容量被淘汰或拒绝时回调 (键, 值, 过期时间戳, 字节数), 在锁外调用
         """
         self.max_size = max_size
         self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.namespace_quotas = dict(namespace_quotas or {})
+        self.on_evict = on_evict
+        self._evicted: List[Tuple[str, Any, float, int]] = []
         self._cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        # 命名空间 -> 按 LRU 顺序排列的键, 配额淘汰时不必扫描全部条目
+        self._namespace_keys: Dict[str, OrderedDict] = {}
+        self._namespace_stats: Dict[str, Dict[str, int]] = {}
+        self._bytes = 0
         self._lock = RLock()
         self._hits = 0
         self._misses = 0
+        self._evictions = 0
+        self._rejected = 0
 
     def _generate_key(self, *args, **kwargs) -> str:
-        """生成缓存键"""
-        key_data = {
-            "args": args,
-            "kwargs": sorted(kwargs.items())
-        }
-        key_str = json.dumps(key_data, sort_keys=True, default=str)
-        return hashlib.md5(key_str.encode()).hexdigest()
+        """生成缓存键 (按参数内容计算指纹, 数组与 DataFrame 直接哈希底层缓冲区)"""
+        return fingerprint(*args, **kwargs)
+
+    def _ns_stats(self, namespace: str) -> Dict[str, int]:
+        stats = self._namespace_stats.get(namespace)
+        if stats is None:
+            stats = {"bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "rejected": 0}
+            self._namespace_stats[namespace] = stats
+        return stats
+
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key)
+        namespace = entry["namespace"]
+        self._namespace_keys[namespace].pop(key, None)
+        self._ns_stats(namespace)["bytes"] -= entry["nbytes"]
+        self._bytes -= entry["nbytes"]
+
+    def _evict(self, key: str) -> None:
+        entry = self._cache[key]
+        namespace = entry["namespace"]
+        if self.on_evict is not None:
+            self._evicted.append((key, entry["value"], entry["expires_at"], entry["nbytes"]))
+        self._remove(key)
+        self._evictions += 1
+        self._ns_stats(namespace)["evictions"] += 1
 
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         with self._lock:
+            namespace = cache_namespace(key)
             if key not in self._cache:
                 self._misses += 1
+                self._ns_stats(namespace)["misses"] += 1
                 return None
 
             entry = self._cache[key]
             # 检查是否过期
             if time.time() > entry["expires_at"]:
-                del self._cache[key]
+                self._remove(key)
                 self._misses += 1
+                self._ns_stats(namespace)["misses"] += 1
                 return None
 
             # 移到末尾 (LRU)
             self._cache.move_to_end(key)
+            self._namespace_keys[namespace].move_to_end(key)
             self._hits += 1
+            self._ns_stats(namespace)["hits"] += 1
             return entry["value"]
 
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """设置缓存值"""
-        with self._lock:
-            ttl = ttl if ttl is not None else self.default_ttl
-            expires_at = time.time() + ttl
-
-            self._cache[key] = {
-                "value": value,
-                "expires_at": expires_at,
-                "created_at": time.time()
-            }
-            self._cache.move_to_end(key)
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, nbytes: Optional[int] = None):
+        """设置缓存值
 
-            # 超过最大大小时，删除最旧的条目
-            while len(self._cache) > self.max_size:
-                self._cache.popitem(last=False)
+        单个条目超过所属命名空间配额或全局预算时不放入内存, 避免为它清空整个缓存
+        (与被淘汰的条目一样交给 on_evict, 由二级缓存接收)。
+        nbytes 为条目计入预算的字节数, 未提供时按值估算。
+        """
+        from memory_utils import estimate_nbytes
+
+        if nbytes is None:
+            nbytes = estimate_nbytes(value) + len(key)
+        namespace = cache_namespace(key)
+        quota = self.namespace_quotas.get(namespace)
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now + ttl, now, nbytes, namespace, quota)
+            evicted, self._evicted = self._evicted, []
+        for item in evicted:
+            self.on_evict(*item)
+
+    def _store(
+        self, key: str, value: Any, expires_at: float, now: float, nbytes: int, namespace: str, quota: Optional[int]
+    ) -> None:
+        if key in self._cache:
+            self._remove(key)
+        if (quota is not None and nbytes > quota) or (self.max_bytes is not None and nbytes > self.max_bytes):
+            self._rejected += 1
+            self._ns_stats(namespace)["rejected"] += 1
+            if self.on_evict is not None:
+                self._evicted.append((key, value, expires_at, nbytes))
+            return
+
+        self._cache[key] = {
+            "value": value,
+            "expires_at": expires_at,
+            "created_at": now,
+            "nbytes": nbytes,
+            "namespace": namespace,
+        }
+        self._namespace_keys.setdefault(namespace, OrderedDict())[key] = None
+        self._ns_stats(namespace)["bytes"] += nbytes
+        self._bytes += nbytes
+
+        # 先按命名空间配额淘汰, 再按全局预算和条目数淘汰最旧的条目
+        namespace_keys = self._namespace_keys[namespace]
+        while quota is not None and self._ns_stats(namespace)["bytes"] > quota:
+            self._evict(next(iter(namespace_keys)))
+        while len(self._cache) > self.max_size or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            self._evict(next(iter(self._cache)))
 
     def delete(self, key: str):
         """删除缓存"""
         with self._lock:
             if key in self._cache:
-                del self._cache[key]
+                self._remove(key)
+
+    def delete_matching(self, pattern: str) -> int:
+        """删除键匹配模式的条目 (规则见 key_matcher), 返回删除的条目数"""
+        prefix, match = key_matcher(pattern)
+        with self._lock:
+            if ":" in prefix:
+                # 前缀已确定命名空间时只扫描该命名空间的键
+                candidates = list(self._namespace_keys.get(cache_namespace(prefix), ()))
+            else:
+                candidates = list(self._cache)
+            keys = [key for key in candidates if match(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
 
     def clear(self):
         """清空缓存"""
         with self._lock:
             self._cache.clear()
+            self._namespace_keys.clear()
+            self._namespace_stats.clear()
+            self._bytes = 0
             self._hits = 0
             self._misses = 0
+            self._evictions = 0
+            self._rejected = 0
 
     def cleanup_expired(self):
         """清理过期缓存"""
@@ -94,7 +220,7 @@ class MemoryCache:
                 if now > entry["expires_at"]
             ]
             for key in expired_keys:
-                del self._cache[key]
+                self._remove(key)
             return len(expired_keys)
 
     def get_stats(self) -> Dict[str, Any]:
@@ -102,38 +228,161 @@ class MemoryCache:
         with self._lock:
             total = self._hits + self._misses
             hit_rate = (self._hits / total * 100) if total > 0 else 0
+            namespaces = {}
+            for namespace in sorted(set(self._namespace_stats) | set(self.namespace_quotas)):
+                stats = self._ns_stats(namespace)
+                quota = self.namespace_quotas.get(namespace)
+                namespaces[namespace] = {
+                    "entries": len(self._namespace_keys.get(namespace, ())),
+                    "bytes": stats["bytes"],
+                    "mb": round(stats["bytes"] / (1024 * 1024), 2),
+                    "quota_mb": round(quota / (1024 * 1024), 2) if quota is not None else None,
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "evictions": stats["evictions"],
+                    "rejected": stats["rejected"],
+                }
             return {
                 "size": len(self._cache),
                 "max_size": self.max_size,
+                "bytes": self._bytes,
+                "mb": round(self._bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2) if self.max_bytes is not None else None,
                 "hits": self._hits,
                 "misses": self._misses,
                 "hit_rate": round(hit_rate, 2),
-                "total_requests": total
+                "total_requests": total,
+                "evictions": self._evictions,
+                "rejected": self._rejected,
+                "namespaces": namespaces,
             }
 
 
 # 全局缓存实例
 _global_cache = None
 
+# 多进程部署时的缓存失效代数: 任一进程清除缓存都会递增共享计数器,
+# 其他进程最多在 GENERATION_CHECK_INTERVAL 秒后发现并清空本地缓存
+SHARED_GENERATION_KEY = "cache:generation"
+GENERATION_CHECK_INTERVAL = 1.0
+_generation_lock = RLock()
+_local_generation: Optional[int] = None
+_generation_checked_at = 0.0
+
+
+def _sync_shared_generation(cache: MemoryCache):
+    """与其他工作进程同步缓存失效代数"""
+    global _local_generation, _generation_checked_at
+    from shared_state import get_shared_store, is_shared_state_enabled
+
+    if not is_shared_state_enabled():
+        return
+    now = time.time()
+    if now - _generation_checked_at < GENERATION_CHECK_INTERVAL:
+        return
+    with _generation_lock:
+        if now - _generation_checked_at < GENERATION_CHECK_INTERVAL:
+            return
+        _generation_checked_at = now
+        generation = get_shared_store().get_counter(SHARED_GENERATION_KEY)
+        if _local_generation is not None and generation != _local_generation:
+            cache.clear()
+            print("[缓存] 其他工作进程已清除缓存, 本地缓存同步失效")
+        _local_generation = generation
+
 
 def get_cache() -> MemoryCache:
     """获取全局缓存实例"""
     global _global_cache
     if _global_cache is None:
-        from performance_config import CACHE_MAX_SIZE, CACHE_TTL_SECONDS
+        from performance_config import CACHE_MAX_MB, CACHE_MAX_SIZE, CACHE_NAMESPACE_QUOTAS_MB, CACHE_TTL_SECONDS
         _global_cache = MemoryCache(
             max_size=CACHE_MAX_SIZE,
-            default_ttl=CACHE_TTL_SECONDS
+            default_ttl=CACHE_TTL_SECONDS,
+            max_bytes=CACHE_MAX_MB * 1024 * 1024,
+            namespace_quotas={
+                namespace: quota_mb * 1024 * 1024
+                for namespace, quota_mb in CACHE_NAMESPACE_QUOTAS_MB.items()
+            },
+            on_evict=_demote_to_l2,
         )
+    _sync_shared_generation(_global_cache)
     return _global_cache
 
 
+# ============================================================================
+# 磁盘二级缓存
+# ============================================================================
+
+def _l2_eligible(key: str, nbytes: int) -> bool:
+    from performance_config import CACHE_L2_MIN_KB, CACHE_L2_NAMESPACES
+
+    return cache_namespace(key) in CACHE_L2_NAMESPACES and nbytes >= CACHE_L2_MIN_KB * 1024
+
+
+def _l2_ttl() -> float:
+    from performance_config import CACHE_L2_TTL_SECONDS
+
+    return CACHE_L2_TTL_SECONDS
+
+
+def _demote_to_l2(key: str, value: Any, expires_at: float, nbytes: int):
+    """内存缓存淘汰的大条目降级到磁盘 (已在磁盘中的不重复写入), 磁盘有效期使用 CACHE_L2_TTL_SECONDS"""
+    from disk_cache import get_disk_cache
+
+    disk = get_disk_cache()
+    if disk is None or expires_at <= time.time() or not _l2_eligible(key, nbytes) or disk.contains(key):
+        return
+    disk.set(key, value, _l2_ttl())
+
+
+def _promote_from_l2(cache: MemoryCache, key: str) -> Optional[Any]:
+    from disk_cache import MISSING, get_disk_cache
+    from memory_utils import estimate_nbytes
+    from performance_config import CACHE_L2_NAMESPACES
+
+    disk = get_disk_cache()
+    if disk is None or cache_namespace(key) not in CACHE_L2_NAMESPACES:
+        return None
+    value, expires_at = disk.get_with_expiry(key)
+    if value is MISSING:
+        return None
+    # 磁盘读出的数组是内存映射, 按逻辑大小计入预算, 否则提升的条目会绕过字节预算与命名空间配额
+    nbytes = estimate_nbytes(value, include_mapped=True) + len(key)
+    # 磁盘条目的剩余有效期可能长达数天, 提升回内存后仍按内存缓存的 TTL 过期
+    cache.set(key, value, ttl=min(max(expires_at - time.time(), 0), cache.default_ttl), nbytes=nbytes)
+    return value
+
+
+_l2_writer: Optional[ThreadPoolExecutor] = None
+_l2_writer_lock = RLock()
+
+
+def _write_through_l2(key: str, value: Any):
+    """大体积结果计算完成后同时写入磁盘, 进程重启后仍可命中
+
+    磁盘有效期使用 CACHE_L2_TTL_SECONDS 而非内存 TTL; 写入交给后台线程,
+    计算方 (single-flight 的执行者) 不必等待磁盘写完。
+    """
+    global _l2_writer
+    from disk_cache import get_disk_cache
+    from memory_utils import estimate_nbytes
+
+    disk = get_disk_cache()
+    if disk is None or not _l2_eligible(key, estimate_nbytes(value) + len(key)):
+        return
+    with _l2_writer_lock:
+        if _l2_writer is None:
+            _l2_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-l2")
+    _l2_writer.submit(disk.set, key, value, _l2_ttl())
+
+
 def cached(ttl: Optional[int] = None, key_prefix: str = ""):
-    """缓存装饰器
+    """缓存装饰器 (内存 + 磁盘两级, 大体积结果写入磁盘并在内存未命中时提升)
 
     Args:
-        ttl: 缓存时间 (秒), None使用默认值
-        key_prefix: 缓存键前缀
+        ttl: 内存缓存时间 (秒), None使用默认值; 磁盘缓存使用 CACHE_L2_TTL_SECONDS
+        key_prefix: 缓存键前缀, 同时决定条目所属的命名空间 (如 interpolation)
 
     Example:
         @cached(ttl=300, key_prefix="stats")
@@ -160,25 +409,110 @@ def cached(ttl: Optional[int] = None, key_prefix: str = ""):
             if cached_value is not None:
                 return cached_value
 
-            # 调用函数并缓存结果
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl=ttl)
-            return result
+            # 内存未命中时查磁盘缓存, 命中则提升回内存
+            cached_value = _promote_from_l2(cache, cache_key)
+            if cached_value is not None:
+                return cached_value
+
+            # 调用函数并缓存结果, 并发的相同调用只计算一次
+            def compute():
+                result = func(*args, **kwargs)
+                cache.set(cache_key, result, ttl=ttl)
+                _write_through_l2(cache_key, result)
+                return result
+
+            return get_single_flight().run(cache_key, compute)
 
         return wrapper
     return decorator
 
 
-def cache_clear_pattern(pattern: str):
-    """清除匹配模式的缓存 (简化版，清除所有缓存)"""
+def cache_clear_pattern(pattern: str) -> int:
+    """清除键匹配模式的缓存 (内存与磁盘两级), 返回清除的内存条目数
+
+    模式规则见 key_matcher。依赖数据库的条目已按数据版本区分 (见 bump_data_version),
+    其他工作进程中的旧条目不会再被读到, 这里只需回收本进程内存和共享的磁盘缓存;
+    空模式或 "*" 表示清空全部缓存, 同时通知其他工作进程。
+    """
+    global _local_generation
+    from disk_cache import get_disk_cache
+    from shared_state import get_shared_store, is_shared_state_enabled
+
     cache = get_cache()
-    cache.clear()
+    disk = get_disk_cache()
+    if pattern in ("", "*"):
+        removed = len(cache._cache)
+        cache.clear()
+        if disk is not None:
+            disk.clear()
+        if is_shared_state_enabled():
+            with _generation_lock:
+                _local_generation = get_shared_store().incr(SHARED_GENERATION_KEY)
+        return removed
+
+    removed = cache.delete_matching(pattern)
+    if disk is not None:
+        prefix, match = key_matcher(pattern)
+        disk.delete_prefix(prefix, match)
+    return removed
+
+
+# ============================================================================
+# 数据版本
+# ============================================================================
+
+# 每张表一个递增的数据版本号, 写入路径提交后递增。依赖某些表的缓存键带上这些表的版本号,
+# 写入后旧条目不会再被命中 (读取不会过期), 与被写入的表无关的条目继续有效。
+# 多进程部署时版本号保存在共享状态中, 其他工作进程的下一次读取即可看到。
+DATA_VERSION_KEY_PREFIX = "data_version:"
+_data_versions: Dict[str, int] = {}
+_data_version_lock = RLock()
+
+
+def get_data_versions(*tables: str) -> Dict[str, int]:
+    """获取各表当前的数据版本号"""
+    from shared_state import get_shared_store, is_shared_state_enabled
+
+    if is_shared_state_enabled():
+        counters = get_shared_store().get_counters(*(DATA_VERSION_KEY_PREFIX + table for table in tables))
+        return {table: counters[DATA_VERSION_KEY_PREFIX + table] for table in tables}
+    with _data_version_lock:
+        return {table: _data_versions.get(table, 0) for table in tables}
+
+
+def bump_data_version(*tables: str) -> Dict[str, int]:
+    """表写入提交后递增其数据版本号, 返回新的版本号"""
+    from shared_state import get_shared_store, is_shared_state_enabled
+
+    with _data_version_lock:
+        if is_shared_state_enabled():
+            store = get_shared_store()
+            # 本地只记录最近看到的版本号, 用于统计信息
+            _data_versions.update({table: store.incr(DATA_VERSION_KEY_PREFIX + table) for table in tables})
+        else:
+            for table in tables:
+                _data_versions[table] = _data_versions.get(table, 0) + 1
+        return {table: _data_versions[table] for table in tables}
+
+
+def data_version_tag(tables: Iterable[str]) -> str:
+    """缓存键中的版本标记 (形如 records=3,records_fts=1)"""
+    versions = get_data_versions(*sorted(set(tables)))
+    return ",".join(f"{table}={version}" for table, version in versions.items())
 
 
 def get_cache_stats() -> Dict[str, Any]:
     """获取缓存统计信息"""
+    from disk_cache import get_disk_cache
+
     cache = get_cache()
-    return cache.get_stats()
+    stats = cache.get_stats()
+    disk = get_disk_cache()
+    stats["l2"] = disk.get_stats() if disk is not None else None
+    with _data_version_lock:
+        tables = sorted(_data_versions)
+    stats["data_versions"] = get_data_versions(*tables)
+    return stats
 
 
 # ============================================================================
@@ -191,6 +525,7 @@ _cleanup_task = None
 def start_cache_cleanup_task():
     """启动后台缓存清理任务"""
     import threading
+    from disk_cache import get_disk_cache
     global _cleanup_task
 
     def cleanup_loop():
@@ -200,6 +535,11 @@ def start_cache_cleanup_task():
             expired = cache.cleanup_expired()
             if expired > 0:
                 print(f"[缓存清理] 清除了 {expired} 个过期缓存条目")
+            disk = get_disk_cache()
+            if disk is not None:
+                expired = disk.cleanup_expired()
+                if expired > 0:
+                    print(f"[缓存清理] 清除了 {expired} 个过期磁盘缓存条目")
 
     if _cleanup_task is None:
         _cleanup_task = threading.Thread(target=cleanup_loop, daemon=True)
@@ -211,13 +551,16 @@ def start_cache_cleanup_task():
 # 专用缓存函数
 # ============================================================================
 
-def cache_database_query(query_key: str, query_func: Callable, ttl: int = 180) -> Any:
+def cache_database_query(
+    query_key: str, query_func: Callable, ttl: int = 180, tables: Iterable[str] = ()
+) -> Any:
     """缓存数据库查询结果
 
     Args:
         query_key: 查询键
         query_func: 查询函数
         ttl: 缓存时间
+        tables: 查询依赖的表, 其数据版本号并入缓存键, 任一表写入后不再命中旧结果
 
     Returns:
         查询结果
@@ -229,11 +572,17 @@ def cache_database_query(query_key: str, query_func: Callable, ttl: int = 180) -
 
     cache = get_cache()
     cache_key = f"db:{query_key}"
+    tables = tuple(tables)
+    if tables:
+        cache_key += f"@{data_version_tag(tables)}"
 
     cached_result = cache.get(cache_key)
     if cached_result is not None:
         return cached_result
 
-    result = query_func()
-    cache.set(cache_key, result, ttl=ttl)
-    return result
+    def compute():
+        result = query_func()
+        cache.set(cache_key, result, ttl=ttl)
+        return result
+
+    return get_single_flight().run(cache_key, compute)
@@ -1,21 +1,53 @@
 import os
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Tuple, Optional, Union
 
+from csv_reader import read_csv
 
-def load_borehole_csv(file_path: str, encoding: Optional[str] = None) -> pd.DataFrame:
+# 文件路径, 原始字节或可 seek 的二进制流 (例如 UploadFile.file)
+CsvSource = Union[str, bytes, BinaryIO]
+
+
+def load_borehole_csv(source: CsvSource, encoding: Optional[str] = None, name: Optional[str] = None) -> pd.DataFrame:
     """Load a single borehole CSV file with robust encoding handling."""
-    encodings_to_try = [encoding] if encoding else ["utf-8-sig", "gbk", "utf-8"]
-    last_error = None
-    for enc in encodings_to_try:
-        try:
-            return pd.read_csv(file_path, encoding=enc)
-        except UnicodeDecodeError as e:
-            last_error = e
-            continue
-        except Exception as e:
-            raise RuntimeError(f"读取钻孔文件失败: {file_path} -> {e}") from e
-    raise RuntimeError(f"无法解析钻孔文件编码: {file_path} -> {last_error}")
+    label = name or (source if isinstance(source, str) else "<upload>")
+    try:
+        return read_csv(source, encoding=encoding)
+    except UnicodeDecodeError as e:
+        raise RuntimeError(f"无法解析钻孔文件编码: {label} -> {e}") from e
+    except Exception as e:
+        raise RuntimeError(f"读取钻孔文件失败: {label} -> {e}") from e
+
+
+def parse_borehole_sources(
+    sources: List[Tuple[str, CsvSource]],
+    insert_borehole_name: bool = True,
+    max_workers: Optional[int] = None,
+) -> List[pd.DataFrame]:
+    """并发解析多个钻孔文件, 每个文件只解析一次
+
+    Args:
+        sources: (文件名, 数据源) 列表
+        insert_borehole_name: 数据中没有钻孔名列时是否用文件名补充
+        max_workers: 线程数, 默认不超过 8
+
+    Returns:
+        与 sources 顺序一致的 DataFrame 列表 (已统一列名)
+    """
+    def parse(item: Tuple[str, CsvSource]) -> pd.DataFrame:
+        filename, source = item
+        df = unify_columns(load_borehole_csv(source, name=filename))
+        # 如果数据中没有钻孔名列，则从文件名提取
+        if insert_borehole_name and "钻孔名" not in df.columns:
+            df.insert(0, "钻孔名", os.path.splitext(os.path.basename(filename))[0])
+        return df
+
+    if len(sources) <= 1:
+        return [parse(item) for item in sources]
+    workers = max_workers or min(8, len(sources))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse, sources))
 
 
 def unify_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -40,33 +72,16 @@ def unify_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def aggregate_boreholes(borehole_files: List[str], coordinate_file: str, merge_column: str = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """
-    Aggregate multiple borehole CSV files and merge with coordinates.
+def merge_with_coordinates(
+    strata_df: pd.DataFrame,
+    coords_df: pd.DataFrame,
+    merge_column: str = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """按钻孔标识列 inner join 坐标数据, 同时统计连接损失
 
-    Returns a tuple of (merged_strata_df, coordinate_df).
+    Returns:
+        (merged_df, stats), stats 包含合并键、各自记录数、丢失记录数和未匹配的钻孔名
     """
-    if not borehole_files:
-        raise ValueError("未选择任何钻孔文件")
-    if not coordinate_file:
-        raise ValueError("请提供坐标文件")
-
-    coords_df = load_borehole_csv(coordinate_file)
-
-    merged_frames = []
-    for file_path in borehole_files:
-        df = load_borehole_csv(file_path)
-        df = unify_columns(df)
-        
-        # 如果数据中没有钻孔名列，则从文件名提取
-        if "钻孔名" not in df.columns:
-            borehole_name = os.path.splitext(os.path.basename(file_path))[0]
-            df.insert(0, "钻孔名", borehole_name)
-        
-        merged_frames.append(df)
-
-    strata_df = pd.concat(merged_frames, ignore_index=True)
-
     if merge_column and merge_column in strata_df.columns and merge_column in coords_df.columns:
         merge_key = merge_column
     else:
@@ -81,6 +96,52 @@ def aggregate_boreholes(borehole_files: List[str], coordinate_file: str, merge_c
     if merged_df.empty:
         raise RuntimeError("合并后的数据为空，请检查钻孔文件和坐标文件的匹配关系。")
 
+    matched = strata_df[merge_key].isin(coords_df[merge_key])
+    stats = {
+        "merge_key": merge_key,
+        "borehole_records": int(len(strata_df)),
+        "coordinate_records": int(len(coords_df)),
+        "merged_records": int(len(merged_df)),
+        "lost_records": int((~matched).sum()),
+        "unmatched_boreholes": [str(name) for name in strata_df.loc[~matched, merge_key].dropna().unique()],
+    }
+    return merged_df, stats
+
+
+def aggregate_borehole_sources(
+    borehole_sources: List[Tuple[str, CsvSource]],
+    coordinate_source: Tuple[str, CsvSource],
+    merge_column: str = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """解析钻孔与坐标数据源并合并 (每个数据源只解析一次)
+
+    Returns a tuple of (merged_strata_df, coordinate_df, join_stats).
+    """
+    if not borehole_sources:
+        raise ValueError("未选择任何钻孔文件")
+    if not coordinate_source:
+        raise ValueError("请提供坐标文件")
+
+    coords_name, coords_data = coordinate_source
+    coords_df = load_borehole_csv(coords_data, name=coords_name)
+    strata_df = pd.concat(parse_borehole_sources(borehole_sources), ignore_index=True)
+    merged_df, stats = merge_with_coordinates(strata_df, coords_df, merge_column)
+    return merged_df, coords_df, stats
+
+
+def aggregate_boreholes(borehole_files: List[str], coordinate_file: str, merge_column: str = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aggregate multiple borehole CSV files and merge with coordinates.
+
+    Returns a tuple of (merged_strata_df, coordinate_df).
+    """
+    if not coordinate_file:
+        raise ValueError("请提供坐标文件")
+    merged_df, coords_df, _ = aggregate_borehole_sources(
+        [(path, path) for path in borehole_files],
+        (coordinate_file, coordinate_file),
+        merge_column,
+    )
     return merged_df, coords_df
 
 
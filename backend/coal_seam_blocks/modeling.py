@@ -3,17 +3,21 @@ import pandas as pd
 from typing import Dict, List, Tuple, Optional
 from scipy.ndimage import gaussian_filter
 
+from coal_seam_blocks.seam_index import SeamIndex
+
 
 class BlockModel:
     def __init__(self,
                  name: str,
                  points: int,
                  top_surface: np.ndarray,
-                 bottom_surface: np.ndarray):
+                 bottom_surface: np.ndarray,
+                 dtype=float):
         self.name = name
         self.points = points
-        self.top_surface = np.asarray(top_surface, dtype=float)
-        self.bottom_surface = np.asarray(bottom_surface, dtype=float)
+        # 内存不足时曲面以 float32 保存 (见 memory_estimator)
+        self.top_surface = np.asarray(top_surface, dtype=dtype)
+        self.bottom_surface = np.asarray(bottom_surface, dtype=dtype)
 
         # 计算厚度网格及统计信息
         thickness = self.top_surface - self.bottom_surface
@@ -236,16 +240,26 @@ def build_block_models(merged_df: pd.DataFrame,
                        method_callable,
                        resolution: int,
                        base_level: float,
-                       gap_value: float) -> Tuple[List[BlockModel], List[str], Tuple[np.ndarray, np.ndarray]]:
+                       gap_value: float,
+                       seam_index: Optional[SeamIndex] = None,
+                       dtype=float) -> Tuple[List[BlockModel], List[str], Tuple[np.ndarray, np.ndarray]]:
+    """按选定岩层自下而上插值生成块体模型
+
+    ``seam_index`` 为 merged_df 上岩层列的分组索引 (未提供时在此构建一次),
+    用于直接取出每个岩层的行, 避免逐层对整列做字符串比较。
+    ``dtype`` 为各层曲面的保存精度, 内存预估要求降级时为 float32。
+    """
     if merged_df.empty:
         raise ValueError("合并数据为空，无法建模")
 
     required_cols = [x_col, y_col, thickness_col, seam_column]
-    valid_data = merged_df.dropna(subset=required_cols).copy()
+    valid_rows = merged_df[required_cols].notna().all(axis=1).to_numpy()
+    valid_data = merged_df[valid_rows]
     if len(valid_data) < 8:
         raise ValueError("生成块体至少需要8个有效数据点")
 
-    valid_data[seam_column] = valid_data[seam_column].astype(str)
+    if seam_index is None or seam_index.column != seam_column or len(seam_index) != len(merged_df):
+        seam_index = SeamIndex.build(merged_df, seam_column)
     x_vals = valid_data[x_col].astype(float)
     y_vals = valid_data[y_col].astype(float)
 
@@ -259,7 +273,8 @@ def build_block_models(merged_df: pd.DataFrame,
     current_base_surface = np.full((XI.shape[0], XI.shape[1]), float(base_level), dtype=float)
 
     for seam_name in selected_seams:
-        seam_df = valid_data[valid_data[seam_column] == str(seam_name)]
+        rows = seam_index.rows_for([seam_name])
+        seam_df = merged_df.iloc[rows[valid_rows[rows]]]
         if seam_df.empty:
             skipped.append(f"{seam_name} (无数据点)")
             continue
@@ -388,7 +403,8 @@ def build_block_models(merged_df: pd.DataFrame,
                 name=str(seam_name),
                 points=num_valid,
                 top_surface=top_surface,
-                bottom_surface=bottom_surface
+                bottom_surface=bottom_surface,
+                dtype=dtype,
             ))
 
             # 更新下一层的基准面: current_base_surface = 本层顶面 + gap
@@ -0,0 +1,97 @@
+"""
+岩层分组索引
+对岩层/钻孔等文本列一次性编码, 记录每个取值的行号分组和最小序号,
+避免每次查询都对整列做 astype(str) 比较
+"""
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 用于确定地层顺序的序号列候选 (与 /api/modeling/seams 保持一致)
+SEQUENCE_COLUMN_CANDIDATES = ['序号', '序号(从下到上)', '层序', '编号', 'sequence', 'order']
+
+
+def find_sequence_column(df: pd.DataFrame) -> Optional[str]:
+    for candidate in SEQUENCE_COLUMN_CANDIDATES:
+        if candidate in df.columns:
+            return candidate
+    return None
+
+
+def normalize_labels(series: pd.Series) -> pd.Series:
+    """统一为去除首尾空白的字符串, 缺失值与空串记为 NaN"""
+    labels = series.astype(str).str.strip()
+    return labels.mask(series.isna() | labels.isin(["", "nan"]))
+
+
+class SeamIndex:
+    """单列分组索引
+
+    Attributes:
+        column: 列名
+        categories: 取值列表 (按首次出现顺序)
+        codes: 每行对应的取值编号, 缺失为 -1
+        min_sequence: 每个取值的最小序号, 无序号时为 NaN
+    """
+
+    def __init__(
+        self,
+        column: str,
+        categories: List[str],
+        codes: np.ndarray,
+        min_sequence: np.ndarray,
+        sequence_column: Optional[str] = None,
+    ) -> None:
+        self.column = column
+        self.categories = list(categories)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.min_sequence = np.asarray(min_sequence, dtype=float)
+        self.sequence_column = sequence_column
+        self._positions = {value: position for position, value in enumerate(self.categories)}
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, column: str, sequence_column: Optional[str] = None) -> "SeamIndex":
+        codes, uniques = pd.factorize(normalize_labels(df[column]), sort=False)
+        min_sequence = np.full(len(uniques), np.inf)
+        if sequence_column and sequence_column in df.columns:
+            sequence = pd.to_numeric(df[sequence_column], errors="coerce").to_numpy(dtype=float)
+            valid = (codes >= 0) & ~np.isnan(sequence)
+            np.minimum.at(min_sequence, codes[valid], sequence[valid])
+        min_sequence[np.isinf(min_sequence)] = np.nan
+        return cls(column, [str(value) for value in uniques], codes, min_sequence, sequence_column)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _groups(self):
+        if self._order is None:
+            self._order = np.argsort(self.codes, kind="stable")
+            self._offsets = np.searchsorted(self.codes[self._order], np.arange(len(self.categories) + 1))
+        return self._order, self._offsets
+
+    def counts(self) -> Dict[str, int]:
+        """每个取值的行数"""
+        tally = np.bincount(self.codes[self.codes >= 0], minlength=len(self.categories))
+        return {value: int(tally[position]) for position, value in enumerate(self.categories)}
+
+    def rows_for(self, values: Iterable[str]) -> np.ndarray:
+        """给定取值对应的行位置 (升序)"""
+        order, offsets = self._groups()
+        groups = [
+            order[offsets[position]:offsets[position + 1]]
+            for position in (self._positions.get(str(value).strip()) for value in values)
+            if position is not None
+        ]
+        if not groups:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(groups))
+
+    def ordered_values(self) -> List[str]:
+        """按最小序号 (从下到上) 排列的取值; 无有效序号时按名称排序"""
+        if self.sequence_column is None or np.isnan(self.min_sequence).all():
+            return sorted(self.categories)
+        keys = np.where(np.isnan(self.min_sequence), np.inf, self.min_sequence)
+        return [self.categories[position] for position in np.argsort(keys, kind="stable")]
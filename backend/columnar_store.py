@@ -0,0 +1,300 @@
+"""
+列式二进制存储
+DataFrame 按列写入 .npy 文件 (字符串列写为编码 + 字典), 读取时内存映射,
+用于工作区快照、项目持久化等需要快速重新打开大数据集的场景
+"""
+import json
+import os
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# 读取模式: 写时复制映射, 下游代码对数组的原地修改不会写回文件
+MMAP_MODE = "c"
+
+
+def _is_string_series(series: pd.Series) -> bool:
+    if series.dtype != object:
+        return False
+    values = series.dropna()
+    if values.empty:
+        return True
+    return bool(values.map(type).eq(str).all())
+
+
+def _save_npy(directory: Path, name: str, array: np.ndarray) -> str:
+    filename = f"{name}.npy"
+    np.save(directory / filename, np.ascontiguousarray(array), allow_pickle=False)
+    return filename
+
+
+def _load_npy(directory: Path, filename: str, mmap: bool) -> np.ndarray:
+    array = np.load(directory / filename, mmap_mode=MMAP_MODE if mmap else None, allow_pickle=False)
+    # 返回普通 ndarray 视图, 避免 np.memmap 子类随运算结果扩散到下游
+    return np.asarray(array)
+
+
+def write_frame(df: pd.DataFrame, directory: Path) -> Dict[str, Any]:
+    """将 DataFrame 写入目录 (每列一个文件 + manifest.json)"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    columns: List[Dict[str, Any]] = []
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        name = df.columns[position]
+        entry: Dict[str, Any] = {"name": name if isinstance(name, (str, int, float)) else str(name)}
+        file_stem = f"c{position}"
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["kind"] = "category"
+            entry["codes"] = _save_npy(directory, file_stem, series.cat.codes.to_numpy(dtype=np.int32))
+            entry["categories"] = [str(value) for value in series.cat.categories]
+        elif _is_string_series(series):
+            codes, uniques = pd.factorize(series, sort=False)
+            entry["kind"] = "strings"
+            entry["codes"] = _save_npy(directory, file_stem, codes.astype(np.int32))
+            entry["categories"] = list(uniques)
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM":
+            entry["kind"] = "numpy"
+            entry["file"] = _save_npy(directory, file_stem, series.to_numpy())
+        else:
+            entry["kind"] = "pickle"
+            entry["file"] = f"{file_stem}.pkl"
+            with (directory / entry["file"]).open("wb") as f:
+                pickle.dump(series.array, f, protocol=pickle.HIGHEST_PROTOCOL)
+        columns.append(entry)
+
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index_entry: Dict[str, Any] = {"kind": "range", "start": index.start, "stop": index.stop, "step": index.step}
+    else:
+        index_entry = {"kind": "pickle", "file": "index.pkl"}
+        with (directory / "index.pkl").open("wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifest = {"format": FORMAT_VERSION, "rows": int(len(df)), "columns": columns, "index": index_entry}
+    with (directory / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def read_frame(directory: Path, mmap: bool = True) -> pd.DataFrame:
+    """读取 write_frame 写出的 DataFrame, 数值列默认内存映射"""
+    directory = Path(directory)
+    with (directory / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    arrays: Dict[int, Any] = {}
+    names: List[Any] = []
+    for position, entry in enumerate(manifest["columns"]):
+        kind = entry["kind"]
+        if kind == "numpy":
+            values: Any = _load_npy(directory, entry["file"], mmap)
+        elif kind in ("strings", "category"):
+            codes = _load_npy(directory, entry["codes"], mmap)
+            if kind == "category":
+                values = pd.Categorical.from_codes(np.asarray(codes), categories=entry["categories"])
+            else:
+                lookup = np.array(entry["categories"] + [np.nan], dtype=object)
+                # -1 表示缺失值, 正好索引到末尾的 NaN
+                values = lookup[np.asarray(codes)]
+        else:
+            with (directory / entry["file"]).open("rb") as f:
+                values = pickle.load(f)
+        arrays[position] = values
+        names.append(entry["name"])
+
+    index_entry = manifest["index"]
+    if index_entry["kind"] == "range":
+        index: pd.Index = pd.RangeIndex(index_entry["start"], index_entry["stop"], index_entry["step"])
+    else:
+        with (directory / index_entry["file"]).open("rb") as f:
+            index = pickle.load(f)
+
+    df = pd.DataFrame(arrays, index=index, copy=False)
+    df.columns = names
+    return df
+
+
+def write_arrays(arrays: Dict[str, np.ndarray], directory: Path) -> None:
+    """写入一组命名数组"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for position, (name, array) in enumerate(arrays.items()):
+        files[name] = _save_npy(directory, f"a{position}", np.asarray(array))
+    with (directory / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "arrays": files}, f, ensure_ascii=False)
+
+
+def read_arrays(directory: Path, mmap: bool = True) -> Dict[str, np.ndarray]:
+    directory = Path(directory)
+    with (directory / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {name: _load_npy(directory, filename, mmap) for name, filename in manifest["arrays"].items()}
+
+
+def write_layer_stack(models: List[Any], directory: Path) -> None:
+    """写入 BlockModel 层栈: 同名数组属性按层堆叠为 (nlay, ny, nx)"""
+    directory = Path(directory)
+    array_attrs = [
+        name for name, value in vars(models[0]).items()
+        if isinstance(value, np.ndarray)
+        and all(isinstance(vars(m).get(name), np.ndarray) and vars(m)[name].shape == value.shape for m in models)
+    ]
+    stacked = {name: np.stack([vars(m)[name] for m in models]) for name in array_attrs}
+    write_arrays(stacked, directory / "arrays")
+
+    scalars = []
+    for model in models:
+        scalars.append({name: value for name, value in vars(model).items() if name not in array_attrs})
+    with (directory / "layers.pkl").open("wb") as f:
+        pickle.dump({"class": type(models[0]), "scalars": scalars}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_layer_stack(directory: Path, mmap: bool = True) -> List[Any]:
+    directory = Path(directory)
+    with (directory / "layers.pkl").open("rb") as f:
+        payload = pickle.load(f)
+    stacked = read_arrays(directory / "arrays", mmap=mmap)
+    models = []
+    for layer_index, scalars in enumerate(payload["scalars"]):
+        model = payload["class"].__new__(payload["class"])
+        model.__dict__.update(scalars)
+        for name, stack in stacked.items():
+            setattr(model, name, stack[layer_index])
+        models.append(model)
+    return models
+
+
+def _is_layer_stack(value: Any) -> bool:
+    from coal_seam_blocks.modeling import BlockModel
+
+    return isinstance(value, list) and bool(value) and all(isinstance(item, BlockModel) for item in value)
+
+
+def _link_tree(source: Path, target: Path) -> None:
+    """硬链接复用已写出的目录, 不支持硬链接时退化为复制"""
+    for path in source.rglob("*"):
+        destination = target / path.relative_to(source)
+        if path.is_dir():
+            destination.mkdir(parents=True, exist_ok=True)
+            continue
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, destination)
+        except OSError:
+            shutil.copy2(path, destination)
+
+
+def write_object_state(
+    obj: Any,
+    directory: Path,
+    reuse_from: Optional[Path] = None,
+    unchanged: Iterable[str] = (),
+) -> None:
+    """按属性类型将状态对象写入目录
+
+    DataFrame、ndarray、BlockModel 列表与 {名称: DataFrame} 字典走列式格式,
+    其余小对象写入 scalars.pkl。``unchanged`` 中的属性直接从 ``reuse_from``
+    (上一次写出的目录) 硬链接, 避免重复写出未修改的大数据集。
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    layout: Dict[str, Any] = {}
+    scalars: Dict[str, Any] = {}
+    arrays: Dict[str, np.ndarray] = {}
+    reusable = set(unchanged) if reuse_from is not None else set()
+
+    for name, value in vars(obj).items():
+        if name in reusable:
+            reused = False
+            for prefix, kind in (("frame_", "frame"), ("layers_", "layers"), ("frames_", None)):
+                source = Path(reuse_from) / f"{prefix}{name}"
+                if source.exists():
+                    _link_tree(source, directory / f"{prefix}{name}")
+                    layout[name] = kind if kind else {"frames": list(value.keys())}
+                    reused = True
+                    break
+            if reused:
+                continue
+
+        if isinstance(value, pd.DataFrame):
+            write_frame(value, directory / f"frame_{name}")
+            layout[name] = "frame"
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            arrays[name] = value
+            layout[name] = "array"
+        elif _is_layer_stack(value):
+            write_layer_stack(value, directory / f"layers_{name}")
+            layout[name] = "layers"
+        elif isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+            keys = list(value.keys())
+            for position, key in enumerate(keys):
+                write_frame(value[key], directory / f"frames_{name}" / str(position))
+            layout[name] = {"frames": keys}
+        else:
+            scalars[name] = value
+            layout[name] = "scalar"
+
+    if arrays:
+        write_arrays(arrays, directory / "arrays")
+    with (directory / "scalars.pkl").open("wb") as f:
+        pickle.dump({"class": type(obj), "layout": layout, "scalars": scalars}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_object_state(directory: Path, mmap: bool = True) -> Any:
+    """读取 write_object_state 写出的状态对象"""
+    directory = Path(directory)
+    with (directory / "scalars.pkl").open("rb") as f:
+        payload = pickle.load(f)
+    arrays = read_arrays(directory / "arrays", mmap=mmap) if (directory / "arrays").exists() else {}
+
+    obj = payload["class"].__new__(payload["class"])
+    for name, kind in payload["layout"].items():
+        if kind == "frame":
+            value = read_frame(directory / f"frame_{name}", mmap=mmap)
+        elif kind == "array":
+            value = arrays[name]
+        elif kind == "layers":
+            value = read_layer_stack(directory / f"layers_{name}", mmap=mmap)
+        elif isinstance(kind, dict):
+            value = {
+                key: read_frame(directory / f"frames_{name}" / str(position), mmap=mmap)
+                for position, key in enumerate(kind["frames"])
+            }
+        else:
+            value = payload["scalars"][name]
+        setattr(obj, name, value)
+    return obj
+
+
+def atomic_write_dir(target: Path, writer) -> Path:
+    """先写入同级临时目录, 完成后整体重命名, 读者不会看到写了一半的数据"""
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.parent / f".{target.name}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        writer(staging)
+        if target.exists():
+            remove_dir(target)
+        staging.rename(target)
+    finally:
+        if staging.exists():
+            remove_dir(staging)
+    return target
+
+
+def remove_dir(directory: Optional[Path]) -> None:
+    if directory is None:
+        return
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,98 @@
+"""
+CSV 读取工具
+先根据 BOM 和有限长度的解码探测确定编码, 再只解析一次,
+替代逐个编码尝试、失败后整文件重新解析的做法
+"""
+import codecs
+import io
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+import pandas as pd
+
+# 探测样本大小 (字节)
+SNIFF_SAMPLE_BYTES = 64 * 1024
+
+# 按优先级尝试的编码; latin-1 可解码任意字节, 作为最后的兜底
+CANDIDATE_ENCODINGS = ("utf-8", "gbk", "latin-1")
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+CsvSource = Union[str, Path, bytes, BinaryIO]
+
+
+def _decodes(sample: bytes, encoding: str, final: bool) -> bool:
+    # 增量解码器允许样本末尾截断在多字节字符中间
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(sample, final=final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_encoding(sample: bytes, final: bool = False, exclude: tuple = ()) -> str:
+    """根据字节样本判断编码
+
+    Args:
+        sample: 文件开头的字节 (或完整内容)
+        final: 样本是否为完整内容
+        exclude: 已确认不适用的编码
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom) and encoding not in exclude:
+            return encoding
+    for encoding in CANDIDATE_ENCODINGS:
+        if encoding not in exclude and _decodes(sample, encoding, final):
+            return encoding
+    return "latin-1"
+
+
+def _peek(source: CsvSource) -> bytes:
+    if isinstance(source, bytes):
+        return source[:SNIFF_SAMPLE_BYTES]
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return f.read(SNIFF_SAMPLE_BYTES)
+    source.seek(0)
+    sample = source.read(SNIFF_SAMPLE_BYTES)
+    source.seek(0)
+    return sample
+
+
+def _read_all(source: CsvSource) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (str, Path)):
+        return Path(source).read_bytes()
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def read_csv(source: CsvSource, encoding: Optional[str] = None, **kwargs) -> pd.DataFrame:
+    """读取 CSV (路径、字节或可 seek 的二进制流), 自动判断编码并只解析一次
+
+    其余关键字参数原样传给 pandas.read_csv。
+    """
+    handle = io.BytesIO(source) if isinstance(source, bytes) else source
+    if encoding is not None:
+        return pd.read_csv(handle, encoding=encoding, **kwargs)
+
+    detected = sniff_encoding(_peek(source))
+    if not isinstance(handle, (str, Path)):
+        handle.seek(0)
+    try:
+        return pd.read_csv(handle, encoding=detected, **kwargs)
+    except UnicodeDecodeError:
+        # 非法字节出现在探测样本之后, 用完整内容重新判定
+        fallback = sniff_encoding(_read_all(source), final=True, exclude=(detected,))
+        print(f"[CSV] 编码 {detected} 解码失败, 改用 {fallback}")
+        if not isinstance(handle, (str, Path)):
+            handle.seek(0)
+        return pd.read_csv(handle, encoding=fallback, **kwargs)
@@ -0,0 +1,165 @@
+"""
+建模数据集缓存
+按上传内容指纹缓存解析、统一列名并合并后的 DataFrame (列式二进制格式),
+同一批钻孔文件重复上传时直接内存映射, 无需重新解析
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from columnar_store import atomic_write_dir, read_frame, remove_dir, write_frame
+from fingerprint import new_hasher
+
+APP_ROOT = Path(__file__).resolve().parent
+
+CACHE_META = "meta.json"
+# 解析/统一列名/合并逻辑或存储格式变化时递增, 旧版本的缓存条目按未命中处理
+DATASET_FORMAT_VERSION = "1"
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def fingerprint_sources(sources: List[Tuple[str, BinaryIO]], *extra: str) -> str:
+    """对 (文件名, 二进制流) 列表计算内容指纹, 读取后流位置复位到开头"""
+    digest = new_hasher()
+    for value in extra:
+        digest.update(value.encode("utf-8") + b"\0")
+    for name, stream in sources:
+        digest.update(name.encode("utf-8") + b"\0")
+        stream.seek(0)
+        size = 0
+        for chunk in iter(lambda: stream.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+            size += len(chunk)
+        digest.update(size.to_bytes(8, "little"))
+        stream.seek(0)
+    return digest.hexdigest()
+
+
+def _dir_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+class DatasetCache:
+    """磁盘数据集缓存 (按总字节数 LRU 淘汰)"""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, Optional[pd.DataFrame], Dict[str, Any]]]:
+        """命中时返回 (merged_df, coords_df, meta)"""
+        directory = self._entry_dir(key)
+        meta_path = directory / CACHE_META
+        try:
+            with meta_path.open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != DATASET_FORMAT_VERSION:
+                raise ValueError("数据集缓存格式版本不一致")
+            merged_df = read_frame(directory / "merged")
+            coords_df = read_frame(directory / "coords") if meta.get("has_coords") else None
+            # 更新访问时间, 用于 LRU 淘汰; 目录可能已被并发的淘汰删除
+            meta_path.touch()
+        except (OSError, ValueError, KeyError):
+            self._misses += 1
+            return None
+        self._hits += 1
+        return merged_df, coords_df, meta
+
+    def put(
+        self,
+        key: str,
+        merged_df: pd.DataFrame,
+        coords_df: Optional[pd.DataFrame],
+        meta: Dict[str, Any],
+    ) -> None:
+        """写入缓存 (失败只记录日志, 不影响请求)"""
+        entry = dict(
+            meta,
+            has_coords=coords_df is not None,
+            format_version=DATASET_FORMAT_VERSION,
+            created_at=time.time(),
+        )
+
+        def writer(staging: Path) -> None:
+            write_frame(merged_df, staging / "merged")
+            if coords_df is not None:
+                write_frame(coords_df, staging / "coords")
+            with (staging / CACHE_META).open("w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+
+        try:
+            with self._lock:
+                atomic_write_dir(self._entry_dir(key), writer)
+                self._evict()
+        except Exception as exc:
+            print(f"[数据集缓存] 写入失败: {key[:12]} -> {exc}")
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        if not self.root.exists():
+            return entries
+        for directory in self.root.iterdir():
+            meta_path = directory / CACHE_META
+            if directory.is_dir() and meta_path.exists():
+                entries.append((meta_path.stat().st_mtime, _dir_size(directory), directory))
+        return entries
+
+    def _evict(self) -> int:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        # 最新写入的条目保留, 即使单个条目超过上限
+        for _, size, directory in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            remove_dir(directory)
+            total -= size
+            evicted += 1
+        if evicted:
+            print(f"[数据集缓存] 超出容量, 淘汰 {evicted} 个数据集")
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, directory in self._entries():
+                remove_dir(directory)
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "size_mb": round(sum(size for _, size, _ in entries) / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_dataset_cache: Optional[DatasetCache] = None
+
+
+def get_dataset_cache() -> Optional[DatasetCache]:
+    """获取全局数据集缓存, 未启用时返回 None"""
+    global _dataset_cache
+    from performance_config import DATASET_CACHE_DIR, DATASET_CACHE_ENABLED, DATASET_CACHE_MAX_MB
+
+    if not DATASET_CACHE_ENABLED:
+        return None
+    if _dataset_cache is None:
+        root = Path(DATASET_CACHE_DIR) if DATASET_CACHE_DIR else APP_ROOT.parent / "data" / "dataset_cache"
+        _dataset_cache = DatasetCache(root, DATASET_CACHE_MAX_MB * 1024 * 1024)
+    return _dataset_cache
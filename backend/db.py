@@ -4,7 +4,7 @@ from contextlib import contextmanager
 from pathlib import Path
 from typing import Iterator
 
-from sqlalchemy import MetaData, Table, create_engine
+from sqlalchemy import MetaData, Table, create_engine, event
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
 
@@ -13,22 +13,74 @@ DB_PATH = APP_ROOT.parent / "data" / "database.db"
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 
 _engine: Engine | None = None
+_read_engine: Engine | None = None
 _SessionLocal: sessionmaker | None = None
+_ReadSessionLocal: sessionmaker | None = None
 _metadata = MetaData()
 _records_table: Table | None = None
 
 
+def apply_sqlite_pragmas(dbapi_connection, readonly: bool = False) -> None:
+    """为 SQLite 连接设置运行参数
+
+    写连接负责切换到 WAL (持久化在数据库文件中), 读连接设为 query_only,
+    WAL 模式下读连接不会被写入事务阻塞。
+    """
+    from performance_config import SQLITE_CACHE_SIZE_MB, SQLITE_MMAP_SIZE_MB
+
+    cursor = dbapi_connection.cursor()
+    try:
+        if not readonly:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_MB * 1024}")  # 负数表示KB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        if readonly:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _create_sqlite_engine(readonly: bool) -> Engine:
+    from performance_config import DB_POOL_SIZE, DB_QUERY_TIMEOUT
+
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": DB_QUERY_TIMEOUT},
+        # SQLite 同一时刻只允许一个写事务, 写引擎只保留一个连接, 写请求在连接池中排队
+        pool_size=DB_POOL_SIZE if readonly else 1,
+        max_overflow=DB_POOL_SIZE if readonly else 0,
+        pool_timeout=DB_QUERY_TIMEOUT,
+        future=True,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, readonly=readonly)
+
+    return engine
+
+
 def get_engine() -> Engine:
+    """写引擎 (单连接), 用于所有写入以及需要读写一致的操作"""
     global _engine
     if _engine is None:
-        _engine = create_engine(
-            DATABASE_URL,
-            connect_args={"check_same_thread": False},
-            future=True,
-        )
+        _engine = _create_sqlite_engine(readonly=False)
     return _engine
 
 
+def get_read_engine() -> Engine:
+    """只读引擎 (连接池), 用于列表、统计等查询接口"""
+    global _read_engine
+    if _read_engine is None:
+        # 先由写连接把数据库切换到 WAL, 只读连接无法修改日志模式
+        with get_engine().connect():
+            pass
+        _read_engine = _create_sqlite_engine(readonly=True)
+    return _read_engine
+
+
 def get_sessionmaker() -> sessionmaker:
     global _SessionLocal
     if _SessionLocal is None:
@@ -36,6 +88,13 @@ def get_sessionmaker() -> sessionmaker:
     return _SessionLocal
 
 
+def get_read_sessionmaker() -> sessionmaker:
+    global _ReadSessionLocal
+    if _ReadSessionLocal is None:
+        _ReadSessionLocal = sessionmaker(bind=get_read_engine(), autoflush=False, autocommit=False, future=True)
+    return _ReadSessionLocal
+
+
 @contextmanager
 def session_scope() -> Iterator[Session]:
     SessionLocal = get_sessionmaker()
@@ -54,7 +113,7 @@ def get_records_table() -> Table:
     global _records_table
     if _records_table is None:
         metadata = MetaData()
-        metadata.reflect(bind=get_engine(), only=["records"])
+        metadata.reflect(bind=get_read_engine(), only=["records"])
         if "records" not in metadata.tables:
             raise RuntimeError("数据库尚未初始化，请先运行数据导入脚本")
         _records_table = metadata.tables["records"]
@@ -73,3 +132,13 @@ def get_session() -> Iterator[Session]:
         yield session
     finally:
         session.close()
+
+
+def get_read_session() -> Iterator[Session]:
+    """只读会话依赖, 查询接口使用, 不与写入争用写连接"""
+    SessionLocal = get_read_sessionmaker()
+    session: Session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
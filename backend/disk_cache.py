@@ -0,0 +1,265 @@
+"""
+磁盘二级缓存
+插值网格、层栈、导出文件等大体积结果写入本地磁盘 (数组为 .npy, 读取时内存映射),
+条目索引保存在 SQLite 中, 按访问时间 LRU 淘汰并遵守 TTL; 服务重启后仍可命中
+"""
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import (
+    read_arrays,
+    read_frame,
+    read_layer_stack,
+    read_object_state,
+    remove_dir,
+    write_arrays,
+    write_frame,
+    write_layer_stack,
+    write_object_state,
+    _is_layer_stack,
+)
+
+APP_ROOT = Path(__file__).resolve().parent
+
+INDEX_NAME = "index.sqlite"
+# get_with_expiry 未命中时返回的占位值 (缓存值本身可能是 None)
+MISSING = object()
+
+
+def _dir_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def _entry_name(key: str) -> str:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _write_value(value: Any, directory: Path) -> str:
+    """按类型写入条目目录, 返回类型标记"""
+    directory.mkdir(parents=True, exist_ok=True)
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        write_arrays({"value": value}, directory / "arrays")
+        return "array"
+    if isinstance(value, pd.DataFrame):
+        write_frame(value, directory / "frame")
+        return "frame"
+    if isinstance(value, (bytes, bytearray)):
+        (directory / "value.bin").write_bytes(bytes(value))
+        return "bytes"
+    if _is_layer_stack(value):
+        write_layer_stack(value, directory / "layers")
+        return "layers"
+    if not isinstance(value, (dict, list, tuple)) and hasattr(value, "__dict__"):
+        write_object_state(value, directory / "object")
+        return "object"
+    with (directory / "value.pkl").open("wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return "pickle"
+
+
+def _read_value(kind: str, directory: Path) -> Any:
+    if kind == "array":
+        # 读出的数组会提升到内存缓存并被多个调用方共享, 设为只读
+        value = read_arrays(directory / "arrays")["value"]
+        value.flags.writeable = False
+        return value
+    if kind == "frame":
+        return read_frame(directory / "frame")
+    if kind == "bytes":
+        return (directory / "value.bin").read_bytes()
+    if kind == "layers":
+        return read_layer_stack(directory / "layers")
+    if kind == "object":
+        return read_object_state(directory / "object")
+    with (directory / "value.pkl").open("rb") as f:
+        return pickle.load(f)
+
+
+class DiskCache:
+    """磁盘缓存 (SQLite 索引, 按总字节数 LRU 淘汰, 多进程共享同一目录)"""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / INDEX_NAME), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, name TEXT NOT NULL, kind TEXT NOT NULL, nbytes INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _remove_rows(self, rows: List[Tuple[str, str]]) -> None:
+        for key, name in rows:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            remove_dir(self.root / name)
+        self._conn.commit()
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def get_with_expiry(self, key: str) -> Tuple[Any, float]:
+        """命中时返回 (值, 过期时间戳), 未命中时值为 MISSING"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, kind, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return MISSING, 0.0
+            name, kind, expires_at = row
+            if expires_at <= now:
+                self._remove_rows([(key, name)])
+                self._misses += 1
+                return MISSING, 0.0
+            try:
+                value = _read_value(kind, self.root / name)
+            except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError):
+                # 文件被其他进程淘汰或损坏, 视为未命中
+                self._remove_rows([(key, name)])
+                self._misses += 1
+                return MISSING, 0.0
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._hits += 1
+            return value, expires_at
+
+    def get(self, key: str) -> Optional[Any]:
+        value, _ = self.get_with_expiry(key)
+        return None if value is MISSING else value
+
+    def set(self, key: str, value: Any, ttl: float) -> bool:
+        """写入缓存 (失败只记录日志, 不影响请求), 返回是否写入成功
+
+        数据先写入临时目录 (不持有锁, 可能耗时较长), 之后只在重命名和更新索引时加锁,
+        其他线程的读取不会被大条目的写入阻塞。
+        """
+        name = _entry_name(key)
+        staging = self.root / f".{name}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            kind = _write_value(value, staging)
+            nbytes = _dir_size(staging)
+            with self._lock:
+                target = self.root / name
+                if target.exists():
+                    remove_dir(target)
+                staging.rename(target)
+                now = time.time()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, name, kind, nbytes, created_at, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, name, kind, nbytes, now, now + ttl, now),
+                )
+                self._conn.commit()
+                self._evict()
+            return True
+        except Exception as exc:
+            print(f"[磁盘缓存] 写入失败: {key[:40]} -> {exc}")
+            return False
+        finally:
+            if staging.exists():
+                remove_dir(staging)
+
+    def _evict(self) -> int:
+        total = self._conn.execute("SELECT coalesce(sum(nbytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        victims = []
+        # 最新写入的条目保留, 即使单个条目超过上限
+        rows = self._conn.execute(
+            "SELECT key, name, nbytes FROM entries ORDER BY accessed_at"
+        ).fetchall()
+        for key, name, nbytes in rows[:-1]:
+            if total <= self.max_bytes:
+                break
+            victims.append((key, name))
+            total -= nbytes
+        self._remove_rows(victims)
+        self._evictions += len(victims)
+        return len(victims)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, name FROM entries WHERE key = ?", (key,)).fetchall()
+            self._remove_rows(rows)
+
+    def delete_prefix(self, prefix: str, match: Optional[Callable[[str], bool]] = None) -> int:
+        """删除键以 prefix 开头 (且满足 match) 的条目, 返回删除的条目数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, name FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+            if match is not None:
+                rows = [row for row in rows if match(row[0])]
+            self._remove_rows(rows)
+        return len(rows)
+
+    def cleanup_expired(self) -> int:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, name FROM entries WHERE expires_at <= ?", (time.time(),)
+            ).fetchall()
+            self._remove_rows(rows)
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, name FROM entries").fetchall()
+            self._remove_rows(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT count(*), coalesce(sum(nbytes), 0) FROM entries"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "size_mb": round(total / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_disk_cache: Optional[DiskCache] = None
+_disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """获取全局磁盘缓存, 未启用时返回 None"""
+    global _disk_cache
+    from performance_config import CACHE_L2_DIR, CACHE_L2_ENABLED, CACHE_L2_MAX_MB
+
+    if not CACHE_L2_ENABLED:
+        return None
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                root = Path(CACHE_L2_DIR) if CACHE_L2_DIR else APP_ROOT.parent / "data" / "cache_l2"
+                _disk_cache = DiskCache(root, CACHE_L2_MAX_MB * 1024 * 1024)
+    return _disk_cache
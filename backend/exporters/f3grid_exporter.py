@@ -21,29 +21,24 @@ from dataclasses import dataclass
 from .base_exporter import BaseExporter
 
 
-@dataclass
-class GridPoint:
-    """网格节点"""
-    id: int
-    x: float
-    y: float
-    z: float
-
-
-@dataclass
-class Zone:
-    """网格单元(BRICK六面体)"""
-    id: int
-    type: str  # "brick"
-    gridpoint_ids: List[int]  # 8个节点ID,顺序: bottom(0-1-2-3逆时针) + top(4-5-6-7逆时针)
-    group: str  # 所属layer名称
+# 写文件时每次批量格式化的行数
+WRITE_BLOCK_ROWS = 16384
+# ZGROUP 段每行的单元ID个数
+GROUP_IDS_PER_LINE = 15
 
 
 @dataclass
 class ZoneGroup:
-    """单元分组"""
+    """单元分组 (zones 为该组在单元数组中的行范围)"""
     name: str
-    zone_ids: List[int]
+    zones: slice
+
+
+def _write_rows(f, line_format: str, rows: np.ndarray) -> None:
+    """按行格式批量写入二维数组 (每次格式化 WRITE_BLOCK_ROWS 行)"""
+    for start in range(0, len(rows), WRITE_BLOCK_ROWS):
+        block = rows[start:start + WRITE_BLOCK_ROWS]
+        f.write((line_format * len(block)) % tuple(block.ravel().tolist()))
 
 
 class F3GridExporter(BaseExporter):
@@ -51,25 +46,29 @@ class F3GridExporter(BaseExporter):
     FLAC3D原生网格格式(.f3grid)导出器
     
     工作流程:
-    1. 对每一层调用_generate_layer_grid()生成独立网格
-    2. 调用_merge_layers()合并所有层,复用层间节点
-    3. 调用_write_f3grid()写入文本格式文件
+    1. 对每一层调用_generate_layer_grid()降采样并平移坐标
+    2. 调用_merge_layers()合并所有层,复用层间节点,按索引数组生成单元
+    3. 调用_write_f3grid()分块批量写入文本格式文件
     
     层间节点共享策略:
     - 上层底面节点 = 下层顶面节点 (同一(x,y)位置)
-    - 通过节点ID复用实现拓扑连续
+    - 节点按 (层面, y, x) 排列, ID = 1 + 扁平下标, 第k层单元连接第k与第k+1个层面
     - 确保Z坐标完全一致(已由enforce_columnwise_order保证)
     """
     
     def __init__(self):
         super().__init__()
-        self.gridpoints: List[GridPoint] = []
-        self.zones: List[Zone] = []
+        self.node_x = np.empty((0, 0))  # [ny, nx], 各层面共用
+        self.node_y = np.empty((0, 0))
+        self.node_z = np.empty((0, 0, 0))  # [nlay+1, ny, nx]
+        self.zone_ids = np.empty(0, dtype=np.int64)
+        self.zones = np.empty((0, 8), dtype=np.int64)  # 每行8个节点ID (B8顺序)
         self.groups: List[ZoneGroup] = []
-        self._next_gp_id = 1  # 节点ID计数器
-        self._next_zone_id = 1  # 单元ID计数器
-        self._gridpoint_lookup: Dict[int, GridPoint] = {}
         self.interface_tolerance = 1e-4
+
+    @property
+    def gridpoint_count(self) -> int:
+        return int(self.node_z.size)
     
     def export(self, data: Dict[str, Any], output_path: str, options: Optional[Dict[str, Any]] = None) -> str:
         """
@@ -159,14 +158,6 @@ class F3GridExporter(BaseExporter):
         else:
             coord_offset = (0.0, 0.0, 0.0)
         
-        # 重置数据
-        self.gridpoints = []
-        self.zones = []
-        self.groups = []
-        self._next_gp_id = 1
-        self._next_zone_id = 1
-        self._gridpoint_lookup = {}
-        
         # 验证数据
         for i, layer in enumerate(layers):
             required_keys = ['name', 'grid_x', 'grid_y', 'top_surface_z', 'bottom_surface_z']
@@ -194,7 +185,7 @@ class F3GridExporter(BaseExporter):
         # Step 5 - 写入.f3grid文件
         self._write_f3grid(output_path)
         
-        print(f"Total GridPoints: {len(self.gridpoints)}")
+        print(f"Total GridPoints: {self.gridpoint_count}")
         print(f"Total Zones: {len(self.zones)}")
         print(f"Total Groups: {len(self.groups)}")
         print(f"=== F3GRID Export Completed ===\n")
@@ -204,7 +195,7 @@ class F3GridExporter(BaseExporter):
     
     def _generate_layer_grid(self, layer: Dict[str, Any], downsample: int, coord_offset: Optional[Tuple[float, float, float]]) -> Dict[str, Any]:
         """
-        为单层生成网格数据(节点+单元)
+        单层网格数据: 降采样并应用坐标偏移 (节点与单元在合并时按索引数组生成)
         
         Args:
             layer: 单层数据,包含grid_x, grid_y, top_surface_z, bottom_surface_z
@@ -212,96 +203,45 @@ class F3GridExporter(BaseExporter):
             coord_offset: 坐标偏移量(x_offset, y_offset, z_offset)
         
         Returns:
-            Dict: 包含该层的节点和单元数据
+            Dict: 该层的坐标数组
                 {
                     "name": str,
-                    "top_nodes": List[GridPoint],  # 顶面节点 (shape: [ny, nx])
-                    "bottom_nodes": List[GridPoint],  # 底面节点 (shape: [ny, nx])
-                    "zones": List[Zone],  # 单元列表
+                    "x": np.ndarray,  # [ny, nx]
+                    "y": np.ndarray,
+                    "top_z": np.ndarray,
+                    "bottom_z": np.ndarray,
                     "nx": int,  # X方向节点数
                     "ny": int   # Y方向节点数
                 }
         """
         layer_name = layer['name']
         
-        # 1. 降采样
-        grid_x = self._downsample_grid(layer['grid_x'], downsample)
-        grid_y = self._downsample_grid(layer['grid_y'], downsample)
-        top_z = self._downsample_grid(layer['top_surface_z'], downsample)
-        bottom_z = self._downsample_grid(layer['bottom_surface_z'], downsample)
-        
-        ny, nx = grid_x.shape
-        
-        # 2. 应用坐标偏移
         if coord_offset is None:
             coord_offset = (0.0, 0.0, 0.0)
         x_off, y_off, z_off = coord_offset
+
+        def prepare(key: str, offset: float) -> np.ndarray:
+            grid = self._downsample_grid(np.asarray(layer[key], dtype=float), downsample)
+            return grid - offset
         
-        # 3. 创建底面节点 (二维数组: [ny, nx])
-        bottom_nodes = []
-        for j in range(ny):
-            row = []
-            for i in range(nx):
-                gp = GridPoint(
-                    id=self._next_gp_id,
-                    x=grid_x[j, i] - x_off,
-                    y=grid_y[j, i] - y_off,
-                    z=bottom_z[j, i] - z_off
-                )
-                self._next_gp_id += 1
-                row.append(gp)
-            bottom_nodes.append(row)
-        
-        # 4. 创建顶面节点 (二维数组: [ny, nx])
-        top_nodes = []
-        for j in range(ny):
-            row = []
-            for i in range(nx):
-                gp = GridPoint(
-                    id=self._next_gp_id,
-                    x=grid_x[j, i] - x_off,
-                    y=grid_y[j, i] - y_off,
-                    z=top_z[j, i] - z_off
-                )
-                self._next_gp_id += 1
-                row.append(gp)
-            top_nodes.append(row)
-        
-        # 5. 创建BRICK单元
-        # 对每个格子 (j, i)，创建一个BRICK
-        # 底面4个角: (j,i), (j,i+1), (j+1,i+1), (j+1,i)
-        # 节点编号规则(逆时针):
-        #   bottom: [sw, se, ne, nw] = [(j,i), (j,i+1), (j+1,i+1), (j+1,i)]
-        #   top:    [sw, se, ne, nw] = 同样位置
-        zones = []
-        for j in range(ny - 1):
-            for i in range(nx - 1):
-                # 底面4个节点 (逆时针: sw->se->ne->nw)
-                gp_bottom = [
-                    bottom_nodes[j][i].id,      # sw (j, i)
-                    bottom_nodes[j][i+1].id,    # se (j, i+1)
-                    bottom_nodes[j+1][i+1].id,  # ne (j+1, i+1)
-                    bottom_nodes[j+1][i].id     # nw (j+1, i)
-                ]
-                
-                # 顶面4个节点 (逆时针: sw->se->ne->nw)
-                gp_top = [
-                    top_nodes[j][i].id,      # sw
-                    top_nodes[j][i+1].id,    # se
-                    top_nodes[j+1][i+1].id,  # ne
-                    top_nodes[j+1][i].id     # nw
-                ]
-                
-                zone = self._create_brick_zone(gp_bottom, gp_top, layer_name)
-                zones.append(zone)
-        
-        print(f"  Layer '{layer_name}': {nx}x{ny} nodes, {len(zones)} zones")
+        grid_x = prepare('grid_x', x_off)
+        grid_y = prepare('grid_y', y_off)
+        top_z = prepare('top_surface_z', z_off)
+        bottom_z = prepare('bottom_surface_z', z_off)
+        
+        ny, nx = grid_x.shape
+        for key, grid in (('grid_y', grid_y), ('top_surface_z', top_z), ('bottom_surface_z', bottom_z)):
+            if grid.shape != (ny, nx):
+                raise ValueError(f"Layer '{layer_name}' {key} shape {grid.shape} != grid_x shape {(ny, nx)}")
+        
+        print(f"  Layer '{layer_name}': {nx}x{ny} nodes, {max(nx - 1, 0) * max(ny - 1, 0)} zones")
         
         return {
             "name": layer_name,
-            "top_nodes": top_nodes,      # [ny][nx]
-            "bottom_nodes": bottom_nodes, # [ny][nx]
-            "zones": zones,
+            "x": grid_x,
+            "y": grid_y,
+            "top_z": top_z,
+            "bottom_z": bottom_z,
             "nx": nx,
             "ny": ny
         }
@@ -345,11 +285,12 @@ class F3GridExporter(BaseExporter):
         
         核心策略:
         1. 从下往上遍历各层
-        2. 对于第i层的top_nodes和第i+1层的bottom_nodes:
-           - 检查(x,y)坐标是否匹配
+        2. 对于第i层的顶面和第i+1层的底面:
+           - 检查(x,y)坐标是否逐点匹配(取整到微米级)
            - 检查Z坐标是否一致(应该已由enforce_columnwise_order保证)
-           - 复用节点ID(上层底面使用下层顶面的节点ID)
-        3. 更新上层的zone的gridpoint_ids(0-3节点用下层的top节点ID)
+           - 两者为同一层面, 上层底面直接复用下层顶面节点
+        3. 节点ID = arange 排成 [nlay+1, ny, nx]; 第k层单元的底面4个节点取第k个层面,
+           顶面4个节点取第k+1个层面, 由相邻节点的切片视图一次生成
         
         Args:
             layer_grids: 各层的网格数据列表(从下到上排序)
@@ -368,139 +309,85 @@ class F3GridExporter(BaseExporter):
                     f"expected ({nx0}, {ny0}), got ({grid['nx']}, {grid['ny']})"
                 )
         
-        # 2. 处理第一层(最下层): 添加所有节点和单元
-        bottom_grid = layer_grids[0]
-        
-        # 添加底面节点
-        for row in bottom_grid['bottom_nodes']:
-            for gp in row:
-                self.gridpoints.append(gp)
-                self._gridpoint_lookup[gp.id] = gp
-        
-        # 添加顶面节点
-        for row in bottom_grid['top_nodes']:
-            for gp in row:
-                self.gridpoints.append(gp)
-                self._gridpoint_lookup[gp.id] = gp
-        
-        # 添加单元
-        self.zones.extend(bottom_grid['zones'])
-        
-        # 创建group
-        self.groups.append(ZoneGroup(
-            name=bottom_grid['name'],
-            zone_ids=[z.id for z in bottom_grid['zones']]
-        ))
-        
-        print(f"  Layer 0 '{bottom_grid['name']}': added {len(bottom_grid['zones'])} zones")
-        
-        # 3. 处理后续各层: 复用interface节点
-        for layer_idx in range(1, len(layer_grids)):
-            lower_grid = layer_grids[layer_idx - 1]
-            upper_grid = layer_grids[layer_idx]
-            
-            print(f"\n  Processing layer {layer_idx} '{upper_grid['name']}'...")
-            
-            # 3.1 创建(x,y) -> 下层top节点ID的映射
-            # 用于快速查找interface节点
-            lower_top_map = {}  # (x, y) -> GridPoint.id
-            for j in range(ny0):
-                for i in range(nx0):
-                    gp = lower_grid['top_nodes'][j][i]
-                    key = (round(gp.x, 6), round(gp.y, 6))  # 坐标取整到微米级
-                    lower_top_map[key] = gp.id
-            
-            # 3.2 创建上层bottom节点的ID映射: old_id -> new_id(复用下层top)
-            bottom_id_remap = {}  # old_bottom_id -> reused_top_id
-            z_diff_max = 0.0
-            z_diff_count = 0
-            
-            for j in range(ny0):
-                for i in range(nx0):
-                    old_gp = upper_grid['bottom_nodes'][j][i]
-                    key = (round(old_gp.x, 6), round(old_gp.y, 6))
-                    
-                    if key not in lower_top_map:
-                        raise ValueError(
-                            f"Layer {layer_idx} bottom node at ({old_gp.x}, {old_gp.y}) "
-                            f"has no matching lower layer top node"
-                        )
-                    
-                    # 复用下层顶面节点ID
-                    reused_id = lower_top_map[key]
-                    bottom_id_remap[old_gp.id] = reused_id
-                    
-                    # 验证Z坐标一致性
-                    lower_top_gp = self._gridpoint_lookup[reused_id]
-                    z_diff = abs(old_gp.z - lower_top_gp.z)
-                    z_diff_max = max(z_diff_max, z_diff)
-                    z_diff_count += 1
-                    if z_diff > self.interface_tolerance:
-                        raise ValueError(
-                            f"层间节点不连续: ({old_gp.x}, {old_gp.y}) diff={z_diff:.6f}m "
-                            f"> tol {self.interface_tolerance:.6f}m"
-                        )
-            
-            print(f"    Interface nodes: {z_diff_count} matched, max Z diff: {z_diff_max:.6f}m")
-            
-            # 3.3 添加上层的顶面节点(新节点)
-            for row in upper_grid['top_nodes']:
-                for gp in row:
-                    self.gridpoints.append(gp)
-                    self._gridpoint_lookup[gp.id] = gp
-            
-            # 3.4 更新上层zones的gridpoint_ids
-            # 底面4个节点(0-3)使用复用ID,顶面4个节点(4-7)保持原ID
-            for zone in upper_grid['zones']:
-                new_gp_ids = []
-                for idx, old_id in enumerate(zone.gridpoint_ids):
-                    if idx < 4:  # 底面节点
-                        new_gp_ids.append(bottom_id_remap[old_id])
-                    else:  # 顶面节点
-                        new_gp_ids.append(old_id)
-                zone.gridpoint_ids = new_gp_ids
+        # 2. 层面Z坐标: 第0个层面为最下层底面, 第k+1个层面为第k层顶面
+        nlay = len(layer_grids)
+        self.node_x = layer_grids[0]['x']
+        self.node_y = layer_grids[0]['y']
+        self.node_z = np.empty((nlay + 1, ny0, nx0), dtype=float)
+        self.node_z[0] = layer_grids[0]['bottom_z']
+        key_x = np.round(self.node_x, 6)  # 坐标取整到微米级
+        key_y = np.round(self.node_y, 6)
+        for layer_idx, grid in enumerate(layer_grids):
+            self.node_z[layer_idx + 1] = grid['top_z']
+            if layer_idx == 0:
+                continue
             
-            # 3.5 添加上层zones和group
-            self.zones.extend(upper_grid['zones'])
-            self.groups.append(ZoneGroup(
-                name=upper_grid['name'],
-                zone_ids=[z.id for z in upper_grid['zones']]
-            ))
+            print(f"\n  Processing layer {layer_idx} '{grid['name']}'...")
+            mismatch = (np.round(grid['x'], 6) != key_x) | (np.round(grid['y'], 6) != key_y)
+            if mismatch.any():
+                j, i = np.argwhere(mismatch)[0]
+                raise ValueError(
+                    f"Layer {layer_idx} bottom node at ({grid['x'][j, i]}, {grid['y'][j, i]}) "
+                    f"has no matching lower layer top node"
+                )
             
-            print(f"    Added {len(upper_grid['zones'])} zones")
+            z_diff = np.abs(grid['bottom_z'] - self.node_z[layer_idx])
+            bad = z_diff > self.interface_tolerance
+            if bad.any():
+                j, i = np.argwhere(bad)[0]
+                raise ValueError(
+                    f"层间节点不连续: ({grid['x'][j, i]}, {grid['y'][j, i]}) diff={z_diff[j, i]:.6f}m "
+                    f"> tol {self.interface_tolerance:.6f}m"
+                )
+            z_diff_max = float(np.nanmax(z_diff)) if np.isfinite(z_diff).any() else 0.0
+            print(f"    Interface nodes: {z_diff.size} matched, max Z diff: {z_diff_max:.6f}m")
+        
+        # 3. 单元: 每层 (ny-1)*(nx-1) 个BRICK, 按层、行、列顺序编号
+        per_layer = max(ny0 - 1, 0) * max(nx0 - 1, 0)
+        id_dtype = np.int32 if max(self.node_z.size, nlay * per_layer) < np.iinfo(np.int32).max else np.int64
+        node_ids = np.arange(1, self.node_z.size + 1, dtype=id_dtype).reshape(self.node_z.shape)
+        self.zones = np.empty((nlay * per_layer, 8), dtype=id_dtype)
+        self.zone_ids = np.arange(1, nlay * per_layer + 1, dtype=id_dtype)
+        self.groups = []
+        for layer_idx, grid in enumerate(layer_grids):
+            rows = slice(layer_idx * per_layer, (layer_idx + 1) * per_layer)
+            self.zones[rows] = self._brick_connectivity(node_ids[layer_idx], node_ids[layer_idx + 1])
+            self.groups.append(ZoneGroup(name=grid['name'], zones=rows))
+            print(f"  Layer {layer_idx} '{grid['name']}': added {per_layer} zones")
         
-        print(f"\n--- Merge completed: {len(self.gridpoints)} nodes, {len(self.zones)} zones, {len(self.groups)} groups ---")
+        print(f"\n--- Merge completed: {self.gridpoint_count} nodes, {len(self.zones)} zones, {len(self.groups)} groups ---")
 
     def _filter_degenerate_zones(self, min_thickness: float) -> None:
         """剔除重复节点或厚度过薄的单元, 缓解FLAC3D几何警告。"""
-        if not self.zones:
+        if not len(self.zones):
             return
 
-        filtered: List[Zone] = []
-        removed = 0
-        for zone in self.zones:
-            gp_ids = zone.gridpoint_ids
-            if len(set(gp_ids)) < len(gp_ids):
-                removed += 1
-                continue
-
-            bottom_z = [self._gridpoint_lookup[gid].z for gid in gp_ids[:4]]
-            top_z = [self._gridpoint_lookup[gid].z for gid in gp_ids[4:]]
-            thickness = (sum(top_z) / 4.0) - (sum(bottom_z) / 4.0)
-            if thickness <= min_thickness:
-                removed += 1
-                continue
-            filtered.append(zone)
-
+        z = self.node_z.ravel()
+        keep = np.empty(len(self.zones), dtype=bool)
+        # 逐组计算, 临时数组只有单层大小
+        for group in self.groups:
+            zones = self.zones[group.zones]
+            ordered = np.sort(zones, axis=1)
+            unique = (ordered[:, 1:] != ordered[:, :-1]).all(axis=1)
+            del ordered
+            # 顶面4节点平均高度 - 底面4节点平均高度
+            bottom_sum = z[zones[:, 0] - 1] + z[zones[:, 1] - 1] + z[zones[:, 2] - 1] + z[zones[:, 3] - 1]
+            top_sum = z[zones[:, 4] - 1] + z[zones[:, 5] - 1] + z[zones[:, 6] - 1] + z[zones[:, 7] - 1]
+            keep[group.zones] = unique & ((top_sum / 4.0) - (bottom_sum / 4.0) > min_thickness)
+
+        removed = int(len(keep) - np.count_nonzero(keep))
         if removed:
             print(
                 f"[F3GRID Export] Removed {removed} degenerate zones (min thickness {min_thickness} m)"
             )
-            valid_zone_ids = {zone.id for zone in filtered}
+            # 单元ID保持不变, 各组的行范围按剩余单元数重新计算
+            start = 0
             for group in self.groups:
-                group.zone_ids = [zid for zid in group.zone_ids if zid in valid_zone_ids]
-
-        self.zones = filtered
+                count = int(np.count_nonzero(keep[group.zones]))
+                group.zones = slice(start, start + count)
+                start += count
+            self.zones = self.zones[keep]
+            self.zone_ids = self.zone_ids[keep]
     
     def _write_f3grid(self, output_path: str) -> None:
         """
@@ -556,44 +443,51 @@ class F3GridExporter(BaseExporter):
             f.write("* Generated by CoalSeam3D System\n")
             f.write("* ====================================\n")
             f.write(f"* Creation Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"* Total GridPoints: {len(self.gridpoints)}\n")
+            f.write(f"* Total GridPoints: {self.gridpoint_count}\n")
             f.write(f"* Total Zones: {len(self.zones)}\n")
             f.write(f"* Total Groups: {len(self.groups)}\n")
             f.write("* ====================================\n\n")
 
-            # 2. GRIDPOINTS: 以G开头
+            # 2. GRIDPOINTS: 以G开头, 逐层面分块格式化
             f.write("* GRIDPOINTS\n")
             f.write("*   G <id> <x> <y> <z>\n")
-            for gp in self.gridpoints:
-                f.write(f"G {gp.id:d} {gp.x:.6f} {gp.y:.6f} {gp.z:.6f}\n")
+            x = self.node_x.ravel()
+            y = self.node_y.ravel()
+            plane = x.size
+            for level, z in enumerate(self.node_z.reshape(len(self.node_z), -1)):
+                for start in range(0, plane, WRITE_BLOCK_ROWS):
+                    stop = min(start + WRITE_BLOCK_ROWS, plane)
+                    block = np.empty((stop - start, 4))
+                    block[:, 0] = np.arange(level * plane + start + 1, level * plane + stop + 1)
+                    block[:, 1] = x[start:stop]
+                    block[:, 2] = y[start:stop]
+                    block[:, 3] = z[start:stop]
+                    _write_rows(f, "G %d %.6f %.6f %.6f\n", block)
             f.write("\n")
 
             # 3. ZONES: 以Z B8开头
             f.write("* ZONES (brick)\n")
             f.write("*   Z B8 <id> <gp0> <gp1> <gp2> <gp3> <gp4> <gp5> <gp6> <gp7>\n")
-            for zone in self.zones:
-                gp_ids = ' '.join(str(gid) for gid in zone.gridpoint_ids)
-                f.write(f"Z B8 {zone.id:d} {gp_ids}\n")
+            for start in range(0, len(self.zones), WRITE_BLOCK_ROWS):
+                stop = start + WRITE_BLOCK_ROWS
+                block = np.column_stack((self.zone_ids[start:stop], self.zones[start:stop]))
+                _write_rows(f, "Z B8" + " %d" * 9 + "\n", block)
             f.write("\n")
 
-            # 4. GROUPS: 使用ZGROUP
+            # 4. GROUPS: 使用ZGROUP, 单元ID已按升序排列
             if self.groups:
                 f.write("* ZONE GROUPS\n")
                 f.write("*   ZGROUP 'name'\n")
                 f.write("*   <zone_id> <zone_id> ...\n")
+                line_format = " ".join(["%d"] * GROUP_IDS_PER_LINE) + "\n"
                 for group in self.groups:
                     safe_name = _sanitize_group_name(group.name)
                     f.write(f"ZGROUP '{safe_name}'\n")
-                    zone_ids = sorted(group.zone_ids)
-                    max_ids = 15
-                    line_ids: List[str] = []
-                    for zid in zone_ids:
-                        line_ids.append(str(zid))
-                        if len(line_ids) >= max_ids:
-                            f.write(' '.join(line_ids) + "\n")
-                            line_ids = []
-                    if line_ids:
-                        f.write(' '.join(line_ids) + "\n")
+                    zone_ids = self.zone_ids[group.zones]
+                    full = len(zone_ids) - len(zone_ids) % GROUP_IDS_PER_LINE
+                    _write_rows(f, line_format, zone_ids[:full].reshape(-1, GROUP_IDS_PER_LINE))
+                    if full < len(zone_ids):
+                        f.write(' '.join(map(str, zone_ids[full:].tolist())) + "\n")
                     f.write("\n")
 
             # 5. 文件尾注释
@@ -619,41 +513,25 @@ class F3GridExporter(BaseExporter):
             return grid
         return grid[::factor, ::factor]
     
-    def _create_brick_zone(self, gp_bottom: List[int], gp_top: List[int], layer_name: str) -> Zone:
+    def _brick_connectivity(self, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
         """
-        创建BRICK单元
+        由上下两个层面的节点ID生成BRICK单元连接
         
         Args:
-            gp_bottom: 底面4个节点ID [sw, se, ne, nw] (逆时针)
-            gp_top: 顶面4个节点ID [sw, se, ne, nw] (逆时针)
-            layer_name: 所属layer名称
+            lower: 底面节点ID [ny, nx]
+            upper: 顶面节点ID [ny, nx]
         
         Returns:
-            Zone对象
+            [(ny-1)*(nx-1), 8] 节点ID, 按行(j)、列(i)顺序
         """
-        if len(gp_bottom) != 4 or len(gp_top) != 4:
-            raise ValueError("BRICK requires 4 bottom + 4 top nodes")
-
-        zone_id = self._next_zone_id
-        self._next_zone_id += 1
-
+        # 格子 (j, i) 的4个角: sw=(j,i), se=(j,i+1), nw=(j+1,i), ne=(j+1,i+1)
         # FLAC3D B8 节点顺序(B方案): bottom[SW,SE,NW,NE] + top[SW,SE,NW,NE]
-        sw, se, ne, nw = gp_bottom
-        sw_t, se_t, ne_t, nw_t = gp_top
-        gridpoint_ids = [
-            sw,
-            se,
-            nw,
-            ne,
-            sw_t,
-            se_t,
-            nw_t,
-            ne_t,
-        ]
-
-        return Zone(
-            id=zone_id,
-            type="brick",
-            gridpoint_ids=gridpoint_ids,
-            group=layer_name
-        )
+        corners = []
+        for surface in (lower, upper):
+            corners.extend((
+                surface[:-1, :-1],  # sw
+                surface[:-1, 1:],   # se
+                surface[1:, :-1],   # nw
+                surface[1:, 1:],    # ne
+            ))
+        return np.stack(corners, axis=-1).reshape(-1, 8)
@@ -8,49 +8,51 @@ from __future__ import annotations
 
 import os
 import re
-from dataclasses import dataclass
-from math import fabs
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
 from coal_seam_blocks.modeling import BlockModel
 from .base_exporter import BaseExporter
-
-
-@dataclass
-class GridPoint:
-    gid: int
-    x: float
-    y: float
-    z: float
-
-
-@dataclass
-class TetZone:
-    zid: int
-    gp_ids: Tuple[int, int, int, int]
-    group: str
-
-
-def _signed_tet_volume(p0: np.ndarray, p1: np.ndarray,
-                       p2: np.ndarray, p3: np.ndarray) -> float:
-    """计算四面体有向体积 (>0 表示右手系)。"""
-    mat = np.column_stack((p1 - p0, p2 - p0, p3 - p0))
-    return float(np.linalg.det(mat) / 6.0)
+from .f3grid_exporter import _write_rows
+
+# hexa 节点顺序: 底面 0-1-2-3 (sw, se, ne, nw), 顶面 4-5-6-7 同样位置;
+# 6 个四面体共用对角线 0-6
+HEX_TET_PATTERNS = np.array([
+    (0, 1, 2, 6),
+    (0, 2, 3, 6),
+    (0, 3, 7, 6),
+    (0, 7, 4, 6),
+    (0, 4, 5, 6),
+    (0, 5, 1, 6),
+])
+# 每批计算体积的 hexa 数, 限制临时数组大小
+HEX_BLOCK = 32768
+# ZGROUP 段每行的单元ID个数
+GROUP_IDS_PER_LINE = 20
+
+
+def _signed_tet_volumes(p0: np.ndarray, p1: np.ndarray,
+                        p2: np.ndarray, p3: np.ndarray) -> np.ndarray:
+    """批量计算四面体有向体积 (>0 表示右手系), 各参数形状为 (n, 3)。"""
+    mats = np.stack((p1 - p0, p2 - p0, p3 - p0), axis=-1)
+    return np.linalg.det(mats) / 6.0
 
 
 class TetraF3GridExporter(BaseExporter):
     """将 BlockModel 栈导出为 FLAC3D 原生 T4 网格 (.f3grid)."""
 
     def __init__(self) -> None:
-        self.gridpoints: List[GridPoint] = []
-        self.tet_zones: List[TetZone] = []
-        self.layer_zone_ids: Dict[str, List[int]] = {}
-        self._coords: Dict[int, np.ndarray] = {}
+        self.node_xyz = np.empty((0, 3))  # 第 gid-1 行为节点 gid 的坐标
+        self.tet_zones = np.empty((0, 4), dtype=np.int64)  # 第 zid-1 行为单元 zid 的4个节点
+        self.layer_zone_ids: Dict[str, List[range]] = {}
         self._min_tet_volume: float = 1e-6
         self._offset: Tuple[float, float, float] = (0.0, 0.0, 0.0)
 
+    @property
+    def gridpoint_count(self) -> int:
+        return len(self.node_xyz)
+
     # ------------------------------------------------------------------
     # BaseExporter interface
     # ------------------------------------------------------------------
@@ -92,7 +94,7 @@ class TetraF3GridExporter(BaseExporter):
         self._build_tet_zones(block_models, interfaces, node_ids)
         self._write_f3grid(output_path)
 
-        print(f"[TetraF3GridExporter] GridPoints: {len(self.gridpoints)} | "
+        print(f"[TetraF3GridExporter] GridPoints: {self.gridpoint_count} | "
               f"Zones(T4): {len(self.tet_zones)} | Groups: {len(self.layer_zone_ids)}")
         print(f"[TetraF3GridExporter] 输出: {output_path}")
         return output_path
@@ -101,10 +103,9 @@ class TetraF3GridExporter(BaseExporter):
     # preparation helpers
     # ------------------------------------------------------------------
     def _reset(self) -> None:
-        self.gridpoints = []
-        self.tet_zones = []
+        self.node_xyz = np.empty((0, 3))
+        self.tet_zones = np.empty((0, 4), dtype=np.int64)
         self.layer_zone_ids = {}
-        self._coords = {}
 
     @staticmethod
     def _validate_offset(values: Sequence[float]) -> Tuple[float, float, float]:
@@ -137,82 +138,75 @@ class TetraF3GridExporter(BaseExporter):
 
     @staticmethod
     def _enforce_columnwise_monotonic(interfaces: np.ndarray, eps: float = 1e-3) -> None:
-        n_interfaces, ny, nx = interfaces.shape
-        for j in range(ny):
-            for i in range(nx):
-                for k in range(1, n_interfaces):
-                    if interfaces[k, j, i] < interfaces[k - 1, j, i] + eps:
-                        interfaces[k, j, i] = interfaces[k - 1, j, i] + eps
+        # 自下而上逐个层面处理, 每次对整张网格比较
+        for k in range(1, interfaces.shape[0]):
+            floor = interfaces[k - 1] + eps
+            np.copyto(interfaces[k], floor, where=interfaces[k] < floor)
 
     def _build_gridpoints(self, interfaces: np.ndarray,
                           XI: np.ndarray, YI: np.ndarray) -> np.ndarray:
+        """节点按 (层面, y, x) 排列, 节点ID = 1 + 扁平下标"""
         n_interfaces, ny, nx = interfaces.shape
-        node_ids = np.zeros((n_interfaces, ny, nx), dtype=int)
-        gid = 1
         x_off, y_off, z_off = self._offset
-        for k in range(n_interfaces):
-            z_layer = interfaces[k]
-            for j in range(ny):
-                for i in range(nx):
-                    x = float(XI[j, i]) - x_off
-                    y = float(YI[j, i]) - y_off
-                    z = float(z_layer[j, i]) - z_off
-                    self.gridpoints.append(GridPoint(gid, x, y, z))
-                    self._coords[gid] = np.array([x, y, z], dtype=float)
-                    node_ids[k, j, i] = gid
-                    gid += 1
-        return node_ids
+        xyz = np.empty((n_interfaces, ny, nx, 3), dtype=float)
+        xyz[..., 0] = XI - x_off
+        xyz[..., 1] = YI - y_off
+        xyz[..., 2] = interfaces - z_off
+        self.node_xyz = xyz.reshape(-1, 3)
+        id_dtype = np.int32 if interfaces.size < np.iinfo(np.int32).max else np.int64
+        return np.arange(1, interfaces.size + 1, dtype=id_dtype).reshape(interfaces.shape)
 
     def _build_tet_zones(self, block_models: List[BlockModel],
                          interfaces: np.ndarray, node_ids: np.ndarray) -> None:
         n_layers = len(block_models)
         _, ny, nx = interfaces.shape
+        rows_per_block = max(1, HEX_BLOCK // max(nx - 1, 1))
+        chunks: List[np.ndarray] = []
         zid = 1
         for layer_idx in range(n_layers):
             layer_name = block_models[layer_idx].name
-            if layer_name not in self.layer_zone_ids:
-                self.layer_zone_ids[layer_name] = []
-
-            for j in range(ny - 1):
-                for i in range(nx - 1):
-                    n0 = node_ids[layer_idx, j, i]
-                    n1 = node_ids[layer_idx, j, i + 1]
-                    n2 = node_ids[layer_idx, j + 1, i + 1]
-                    n3 = node_ids[layer_idx, j + 1, i]
-                    n4 = node_ids[layer_idx + 1, j, i]
-                    n5 = node_ids[layer_idx + 1, j, i + 1]
-                    n6 = node_ids[layer_idx + 1, j + 1, i + 1]
-                    n7 = node_ids[layer_idx + 1, j + 1, i]
-                    hex_nodes = (n0, n1, n2, n3, n4, n5, n6, n7)
-                    zid = self._add_tets_for_hex(hex_nodes, layer_name, zid)
-
-    def _add_tets_for_hex(self, hex_nodes: Tuple[int, int, int, int,
-                                                 int, int, int, int],
-                          layer_name: str, next_zone_id: int) -> int:
-        patterns = (
-            (0, 1, 2, 6),
-            (0, 2, 3, 6),
-            (0, 3, 7, 6),
-            (0, 7, 4, 6),
-            (0, 4, 5, 6),
-            (0, 5, 1, 6),
-        )
-        removed = 0
-        for a, b, c, d in patterns:
-            ga, gb, gc, gd = hex_nodes[a], hex_nodes[b], hex_nodes[c], hex_nodes[d]
-            p0, p1, p2, p3 = self._coords[ga], self._coords[gb], self._coords[gc], self._coords[gd]
-            vol = _signed_tet_volume(p0, p1, p2, p3)
-            if fabs(vol) < self._min_tet_volume:
-                removed += 1
-                continue
-            if vol < 0.0:
-                gb, gc = gc, gb  # 翻转顺序以保证正体积
-            self.tet_zones.append(TetZone(next_zone_id, (ga, gb, gc, gd), layer_name))
-            self.layer_zone_ids[layer_name].append(next_zone_id)
-            next_zone_id += 1
-        if removed:
-            print(f"[TetraF3GridExporter] skip {removed} degenerate tets in layer {layer_name}")
-        return next_zone_id
+            lower = node_ids[layer_idx]
+            upper = node_ids[layer_idx + 1]
+            first_zid = zid
+            removed = 0
+            for j0 in range(0, ny - 1, rows_per_block):
+                rows = slice(j0, min(j0 + rows_per_block, ny - 1) + 1)
+                lo, up = lower[rows], upper[rows]
+                hex_nodes = np.stack((
+                    lo[:-1, :-1], lo[:-1, 1:], lo[1:, 1:], lo[1:, :-1],
+                    up[:-1, :-1], up[:-1, 1:], up[1:, 1:], up[1:, :-1],
+                ), axis=-1).reshape(-1, 8)
+                tets, skipped = self._tets_for_hexes(hex_nodes)
+                chunks.append(tets)
+                zid += len(tets)
+                removed += skipped
+            # 同名岩层归入同一分组
+            self.layer_zone_ids.setdefault(layer_name, []).append(range(first_zid, zid))
+            if removed:
+                print(f"[TetraF3GridExporter] skip {removed} degenerate tets in layer {layer_name}")
+
+        if chunks:
+            self.tet_zones = np.concatenate(chunks)
+
+    def _tets_for_hexes(self, hex_nodes: np.ndarray) -> Tuple[np.ndarray, int]:
+        """按 6 种剖分模式拆分一批 hexa, 剔除退化四面体并翻转负体积单元
+
+        Args:
+            hex_nodes: (n, 8) hexa 节点ID
+
+        Returns:
+            (保留的四面体 (m, 4) 节点ID, 按 hexa、模式顺序排列; 剔除的个数)
+        """
+        tets = hex_nodes[:, HEX_TET_PATTERNS].reshape(-1, 4)
+        points = self.node_xyz[tets - 1]
+        volumes = _signed_tet_volumes(points[:, 0], points[:, 1], points[:, 2], points[:, 3])
+        del points
+        # NaN 体积不视为退化 (与逐个比较时的行为一致)
+        keep = ~(np.abs(volumes) < self._min_tet_volume)
+        tets = tets[keep]
+        flip = volumes[keep] < 0.0
+        tets[flip, 1:3] = tets[flip][:, 2:0:-1]  # 交换 b/c 以保证正体积
+        return tets, int(len(keep) - np.count_nonzero(keep))
 
     # ------------------------------------------------------------------
     # file writer
@@ -237,7 +231,7 @@ class TetraF3GridExporter(BaseExporter):
         return sanitized
 
     def _write_f3grid(self, output_path: str) -> None:
-        total_gp = len(self.gridpoints)
+        total_gp = self.gridpoint_count
         total_zones = len(self.tet_zones)
         total_groups = len(self.layer_zone_ids)
 
@@ -253,31 +247,34 @@ class TetraF3GridExporter(BaseExporter):
 
             f.write("* GRIDPOINTS\n")
             f.write("*   G <id> <x> <y> <z>\n")
-            for gp in self.gridpoints:
-                f.write(f"G {gp.gid} {gp.x:.6f} {gp.y:.6f} {gp.z:.6f}\n")
+            for start in range(0, total_gp, HEX_BLOCK):
+                stop = min(start + HEX_BLOCK, total_gp)
+                block = np.empty((stop - start, 4))
+                block[:, 0] = np.arange(start + 1, stop + 1)
+                block[:, 1:] = self.node_xyz[start:stop]
+                _write_rows(f, "G %d %.6f %.6f %.6f\n", block)
             f.write("\n")
 
             f.write("* ZONES (T4)\n")
             f.write("*   Z T4 <id> <gp0> <gp1> <gp2> <gp3>\n")
-            for zone in self.tet_zones:
-                g0, g1, g2, g3 = zone.gp_ids
-                f.write(f"Z T4 {zone.zid} {g0} {g1} {g2} {g3}\n")
+            for start in range(0, total_zones, HEX_BLOCK):
+                stop = min(start + HEX_BLOCK, total_zones)
+                block = np.column_stack((np.arange(start + 1, stop + 1), self.tet_zones[start:stop]))
+                _write_rows(f, "Z T4 %d %d %d %d %d\n", block)
             f.write("\n")
 
             f.write("* ZONE GROUPS\n")
             f.write("*   ZGROUP 'name'\n")
             f.write("*   <zone_id> <zone_id> ...\n")
-            for name, ids in self.layer_zone_ids.items():
+            line_format = " ".join(["%d"] * GROUP_IDS_PER_LINE) + "\n"
+            for name, ranges in self.layer_zone_ids.items():
                 safe_name = self._sanitize_group_name(name)
                 f.write(f"ZGROUP '{safe_name}'\n")
-                line: List[str] = []
-                for zid in ids:
-                    line.append(str(zid))
-                    if len(line) >= 20:
-                        f.write(" ".join(line) + "\n")
-                        line = []
-                if line:
-                    f.write(" ".join(line) + "\n")
+                ids = np.concatenate([np.arange(r.start, r.stop) for r in ranges])
+                full = len(ids) - len(ids) % GROUP_IDS_PER_LINE
+                _write_rows(f, line_format, ids[:full].reshape(-1, GROUP_IDS_PER_LINE))
+                if full < len(ids):
+                    f.write(" ".join(map(str, ids[full:].tolist())) + "\n")
                 f.write("\n")
 
             f.write("* ====================================\n")
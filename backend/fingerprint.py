@@ -0,0 +1,116 @@
+"""
+内容指纹
+为缓存键计算参数内容的快速哈希: 数组直接哈希底层缓冲区并带上 dtype 与形状,
+DataFrame/Series 额外哈希索引与列名, 避免 json.dumps(default=str) 把大数组
+截断成 "[1. 2. ... 9.]" 这类摘要而让不同数据得到相同的键。
+安装了 xxhash 时使用 xxh3_128 (非加密哈希, 速度更快), 否则使用 blake2b。
+"""
+import hashlib
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+    xxhash = None
+
+HASH_BACKEND = "xxh3_128" if XXHASH_AVAILABLE else "blake2b"
+
+
+def new_hasher():
+    """创建哈希对象 (update / hexdigest 接口)"""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def _update_tag(hasher, tag: str, text: str = "") -> None:
+    hasher.update(f"{tag}:{text}\0".encode("utf-8"))
+
+
+def _update_array(hasher, array: np.ndarray) -> None:
+    _update_tag(hasher, "ndarray", f"{array.dtype.str}{array.shape}")
+    if array.dtype.hasobject:
+        # 对象数组 (字符串等) 没有可直接哈希的缓冲区, 逐元素哈希
+        values = pd.util.hash_array(array.ravel().astype(object), categorize=False)
+        hasher.update(memoryview(values))
+        return
+    # 非连续数组 (切片、转置) 先整理成 C 连续, 再按字节读取缓冲区 (datetime64 等也适用)
+    hasher.update(memoryview(np.ascontiguousarray(array).view(np.uint8)))
+
+
+def _update_index(hasher, index: pd.Index) -> None:
+    _update_tag(hasher, "index", f"{type(index).__name__}{index.nlevels}")
+    _update(hasher, list(index.names))
+    if isinstance(index, pd.RangeIndex):
+        _update_tag(hasher, "range", f"{index.start},{index.stop},{index.step}")
+        return
+    _update_tag(hasher, "dtype", str(index.dtype))
+    hasher.update(memoryview(pd.util.hash_pandas_object(index, categorize=False).to_numpy()))
+
+
+def _update_series_values(hasher, series: pd.Series) -> None:
+    _update_tag(hasher, "dtype", str(series.dtype))
+    values = series.to_numpy(copy=False) if isinstance(series.dtype, np.dtype) else None
+    if values is not None and not values.dtype.hasobject:
+        _update_array(hasher, values)
+        return
+    # 扩展类型 (分类、可空整数、字符串) 用 pandas 的逐行哈希
+    hasher.update(memoryview(pd.util.hash_pandas_object(series, index=False, categorize=False).to_numpy()))
+
+
+def _update(hasher, value: Any) -> None:
+    if value is None or isinstance(value, (bool, int, float, complex, np.generic)):
+        _update_tag(hasher, type(value).__name__, repr(value))
+    elif isinstance(value, str):
+        _update_tag(hasher, "str", str(len(value)))
+        hasher.update(value.encode("utf-8", "surrogatepass"))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        _update_tag(hasher, "bytes", str(len(value)))
+        hasher.update(value)
+    elif isinstance(value, np.ndarray):
+        _update_array(hasher, value)
+    elif isinstance(value, pd.DataFrame):
+        _update_tag(hasher, "frame", str(value.shape))
+        _update_index(hasher, value.columns)
+        _update_index(hasher, value.index)
+        for position in range(value.shape[1]):
+            _update_series_values(hasher, value.iloc[:, position])
+    elif isinstance(value, pd.Series):
+        _update_tag(hasher, "series", str(len(value)))
+        _update(hasher, value.name)
+        _update_index(hasher, value.index)
+        _update_series_values(hasher, value)
+    elif isinstance(value, pd.Index):
+        _update_index(hasher, value)
+    elif isinstance(value, dict):
+        _update_tag(hasher, "dict", str(len(value)))
+        for key, item in sorted(value.items(), key=lambda pair: repr(pair[0])):
+            _update(hasher, key)
+            _update(hasher, item)
+    elif isinstance(value, (list, tuple)):
+        _update_tag(hasher, type(value).__name__, str(len(value)))
+        for item in value:
+            _update(hasher, item)
+    elif isinstance(value, (set, frozenset)):
+        _update_tag(hasher, "set", str(len(value)))
+        for item in sorted(value, key=repr):
+            _update(hasher, item)
+    elif hasattr(value, "model_dump") or hasattr(type(value), "__fields__"):
+        # pydantic 请求模型
+        _update_tag(hasher, type(value).__name__)
+        _update(hasher, value.model_dump() if hasattr(value, "model_dump") else value.dict())
+    else:
+        _update_tag(hasher, type(value).__name__, repr(value))
+
+
+def fingerprint(*args: Any, **kwargs: Any) -> str:
+    """计算参数内容的指纹 (关键字参数与顺序无关)"""
+    hasher = new_hasher()
+    _update(hasher, args)
+    _update(hasher, kwargs)
+    return hasher.hexdigest()
@@ -10,6 +10,8 @@ from scipy.interpolate import griddata, Rbf
 from functools import lru_cache
 import warnings
 
+from cache import cached
+
 
 class InterpolationValidator:
     """插值结果验证器"""
@@ -744,7 +746,17 @@ def interpolate(x: np.ndarray, y: np.ndarray, z: np.ndarray,
         method: 插值方法
 
     Returns:
-        插值结果
+        插值结果 (按输入内容指纹缓存, 返回的数组只读)
     """
+    return _interpolate_cached(x, y, z, xi, yi, method)
+
+
+@cached(key_prefix="interpolation")
+def _interpolate_cached(x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                        xi: np.ndarray, yi: np.ndarray, method: str) -> np.ndarray:
+    """同一批数据点、网格和方法的插值结果在多个请求间共享 (内存 + 磁盘两级缓存)"""
     interpolator = get_interpolator()
-    return interpolator.perform_interpolation(x, y, z, xi, yi, method)
+    result = np.asarray(interpolator.perform_interpolation(x, y, z, xi, yi, method))
+    # 缓存中的数组被多个调用方共享, 设为只读避免原地修改污染缓存 (磁盘缓存读出的数组同样只读)
+    result.flags.writeable = False
+    return result
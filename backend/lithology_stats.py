@@ -0,0 +1,252 @@
+"""
+岩性统计物化表
+在 SQLite 中维护 lithology_stats 表, 按规范化岩性和数值列保存
+样本数、均值、标准差、最值、分位数, 数据库写入时只重算受影响的岩性;
+填充参数时从进程内缓存直接读取, 不再每次全表分组聚合
+"""
+import time
+from typing import Any, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+
+from property_fill import normalize_lithology_keys, normalize_lithology_name
+
+STATS_TABLE = "lithology_stats"
+LITHOLOGY_COLUMN = "岩性"
+
+# 分位数列名 -> 分位点
+PERCENTILES = {"p10": 0.10, "p25": 0.25, "median": 0.50, "p75": 0.75, "p90": 0.90}
+STAT_COLUMNS = ["count", "mean", "std", "min", "p10", "p25", "median", "p75", "p90", "max"]
+
+# 非空取值中可转换为数值的比例达到该值才视为数值列
+NUMERIC_RATIO_THRESHOLD = 0.5
+
+_CACHE_KEY_PREFIX = "lithology_stats"
+
+_CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+    lithology TEXT NOT NULL,
+    property TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL,
+    std REAL,
+    min REAL,
+    p10 REAL,
+    p25 REAL,
+    median REAL,
+    p75 REAL,
+    p90 REAL,
+    max REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (lithology, property)
+)
+"""
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def ensure_stats_table(connection: Connection) -> None:
+    connection.exec_driver_sql(_CREATE_TABLE_SQL)
+
+
+def infer_numeric_columns(frame: pd.DataFrame, exclude: Iterable[str] = (LITHOLOGY_COLUMN,)) -> List[str]:
+    """非空取值大多可转换为数值的列"""
+    excluded = set(exclude)
+    columns = []
+    for column in frame.columns:
+        if column in excluded:
+            continue
+        present = frame[column].notna()
+        total = int(present.sum())
+        if not total:
+            continue
+        numeric = int(pd.to_numeric(frame[column], errors="coerce").notna().sum())
+        if numeric and numeric / total >= NUMERIC_RATIO_THRESHOLD:
+            columns.append(column)
+    return columns
+
+
+def compute_lithology_stats(
+    frame: pd.DataFrame,
+    numeric_columns: Iterable[str],
+    lithology_col: str = LITHOLOGY_COLUMN,
+) -> pd.DataFrame:
+    """计算长表格式的统计量: 每行一个 (规范化岩性, 数值列) 组合"""
+    numeric_columns = [column for column in numeric_columns if column in frame.columns]
+    empty = pd.DataFrame(columns=["lithology", "property"] + STAT_COLUMNS)
+    if frame.empty or lithology_col not in frame.columns or not numeric_columns:
+        return empty
+
+    keys = normalize_lithology_keys(frame[lithology_col])
+    values = frame[numeric_columns].apply(pd.to_numeric, errors="coerce")
+    values = values[keys.astype(bool).to_numpy()]
+    values.insert(0, "lithology", keys[keys.astype(bool)])
+    long = values.melt(id_vars="lithology", var_name="property", value_name="value").dropna(subset=["value"])
+    if long.empty:
+        return empty
+
+    grouped = long.groupby(["lithology", "property"], sort=True)["value"]
+    result = grouped.agg(["count", "mean", "min", "max"])
+    result["std"] = grouped.std(ddof=0).fillna(0.0)
+    quantiles = grouped.quantile(list(PERCENTILES.values())).unstack()
+    quantiles.columns = list(PERCENTILES.keys())
+    result = result.join(quantiles)
+    return result.reset_index()[["lithology", "property"] + STAT_COLUMNS]
+
+
+def _write_stats(connection: Connection, stats: pd.DataFrame) -> None:
+    if stats.empty:
+        return
+    now = time.time()
+    rows = [
+        {**record, "count": int(record["count"]), "updated_at": now}
+        for record in stats.replace({np.nan: None}).to_dict(orient="records")
+    ]
+    columns = ["lithology", "property"] + STAT_COLUMNS + ["updated_at"]
+    placeholders = ", ".join(f":{column}" for column in columns)
+    connection.execute(
+        text(f"INSERT OR REPLACE INTO {STATS_TABLE} ({', '.join(columns)}) VALUES ({placeholders})"),
+        rows,
+    )
+
+
+def _records_columns(connection: Connection) -> List[str]:
+    return [row[1] for row in connection.exec_driver_sql("PRAGMA table_info(records)")]
+
+
+def rebuild_lithology_stats(connection: Connection) -> int:
+    """全量重建统计表 (导入数据后调用), 返回写入的统计行数"""
+    ensure_stats_table(connection)
+    connection.exec_driver_sql(f"DELETE FROM {STATS_TABLE}")
+    if LITHOLOGY_COLUMN not in _records_columns(connection):
+        return 0
+    frame = pd.read_sql(text("SELECT * FROM records"), connection)
+    stats = compute_lithology_stats(frame, infer_numeric_columns(frame))
+    _write_stats(connection, stats)
+    print(f"[岩性统计] 全量重建: {stats['lithology'].nunique()} 种岩性, {len(stats)} 条统计")
+    return len(stats)
+
+
+def stored_properties(connection: Connection) -> List[str]:
+    """统计表中已有的数值列"""
+    ensure_stats_table(connection)
+    rows = connection.exec_driver_sql(f"SELECT DISTINCT property FROM {STATS_TABLE}")
+    return [row[0] for row in rows]
+
+
+def refresh_lithology_stats(connection: Connection, lithologies: Iterable[Any]) -> int:
+    """只重算指定岩性 (原始名称或规范化名称均可) 的统计量
+
+    应在与 records 写入相同的事务中调用; 统计表为空时退化为全量重建。
+    """
+    targets: Set[str] = {normalize_lithology_name(name) for name in lithologies}
+    targets.discard("")
+    ensure_stats_table(connection)
+    if not targets:
+        return 0
+    properties = stored_properties(connection)
+    if not properties:
+        return rebuild_lithology_stats(connection)
+    columns = _records_columns(connection)
+    if LITHOLOGY_COLUMN not in columns:
+        return 0
+    properties = [column for column in properties if column in columns]
+
+    # 规范化会把不同写法的煤层合并, 先找出映射到目标岩性的全部原始名称
+    raw_names = [
+        row[0]
+        for row in connection.exec_driver_sql(
+            f"SELECT DISTINCT {_quote(LITHOLOGY_COLUMN)} FROM records WHERE {_quote(LITHOLOGY_COLUMN)} IS NOT NULL"
+        )
+        if normalize_lithology_name(row[0]) in targets
+    ]
+
+    frames = []
+    select_list = ", ".join(_quote(column) for column in [LITHOLOGY_COLUMN] + properties)
+    for start in range(0, len(raw_names), 500):
+        chunk = raw_names[start:start + 500]
+        params = {f"n{index}": name for index, name in enumerate(chunk)}
+        placeholders = ", ".join(f":{key}" for key in params)
+        frames.append(pd.read_sql(
+            text(f"SELECT {select_list} FROM records WHERE {_quote(LITHOLOGY_COLUMN)} IN ({placeholders})"),
+            connection,
+            params=params,
+        ))
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[LITHOLOGY_COLUMN] + properties)
+
+    params = {f"t{index}": name for index, name in enumerate(sorted(targets))}
+    placeholders = ", ".join(f":{key}" for key in params)
+    connection.execute(text(f"DELETE FROM {STATS_TABLE} WHERE lithology IN ({placeholders})"), params)
+    stats = compute_lithology_stats(frame, properties)
+    _write_stats(connection, stats)
+    print(f"[岩性统计] 增量更新: {', '.join(sorted(targets))}")
+    return len(stats)
+
+
+def read_stats_table(connection: Connection) -> pd.DataFrame:
+    """读取长表格式的统计表, 表不存在或为空时先全量构建"""
+    ensure_stats_table(connection)
+    stats = pd.read_sql(text(f"SELECT * FROM {STATS_TABLE}"), connection)
+    if stats.empty and rebuild_lithology_stats(connection):
+        stats = pd.read_sql(text(f"SELECT * FROM {STATS_TABLE}"), connection)
+    return stats
+
+
+def pivot_stats(stats: pd.DataFrame, stat: str = "median", columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """长表转为以岩性为索引、数值列为列的宽表 (与 build_lithology_stats 结果格式一致)"""
+    if stat not in STAT_COLUMNS:
+        raise ValueError(f"不支持的统计量: {stat}")
+    if stats.empty:
+        return pd.DataFrame()
+    wide = stats.pivot(index="lithology", columns="property", values=stat)
+    wide.index.name = None
+    wide.columns.name = None
+    if columns is not None:
+        wide = wide[[column for column in columns if column in wide.columns]]
+    return wide.astype(float).dropna(how="all")
+
+
+# ============================================================================
+# 进程内缓存
+# ============================================================================
+
+def _load_long_stats() -> pd.DataFrame:
+    from db import get_engine, get_read_engine
+
+    try:
+        with get_read_engine().connect() as connection:
+            stats = pd.read_sql(text(f"SELECT * FROM {STATS_TABLE}"), connection)
+        if not stats.empty:
+            return stats
+    except OperationalError:
+        pass  # 统计表尚未创建
+    with get_engine().begin() as connection:
+        return read_stats_table(connection)
+
+
+def get_lithology_stats(stat: str = "median", columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """获取宽表格式的岩性统计 (进程内缓存, 写入数据库后失效)"""
+    from cache import cache_database_query
+
+    columns = list(columns) if columns is not None else None
+    key = f"{_CACHE_KEY_PREFIX}:{stat}:{','.join(columns) if columns is not None else '*'}"
+
+    def load() -> pd.DataFrame:
+        long_stats = cache_database_query(f"{_CACHE_KEY_PREFIX}:long", _load_long_stats, tables=(STATS_TABLE,))
+        return pivot_stats(long_stats, stat, columns)
+
+    return cache_database_query(key, load, tables=(STATS_TABLE,))
+
+
+def invalidate_lithology_stats_cache() -> None:
+    """统计表写入提交后递增数据版本, 并回收旧版本的缓存条目"""
+    from cache import bump_data_version, cache_clear_pattern
+
+    bump_data_version(STATS_TABLE)
+    cache_clear_pattern(f"db:{_CACHE_KEY_PREFIX}")
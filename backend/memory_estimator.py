@@ -0,0 +1,230 @@
+"""
+建模 / 导出请求的内存预估
+在分配任何网格之前, 按数据点数、插值方法、网格分辨率、岩层数和导出格式估算请求的峰值内存:
+预算之内直接执行; 超出时依次降为 float32 曲面、局部插值方法、较低分辨率
+(不低于 LOW_MEMORY_RESOLUTION); 仍然超出时拒绝请求。选择结果随响应返回。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+MB = 1024 * 1024
+FLOAT64_BYTES = 8
+FLOAT32_BYTES = 4
+
+# 全局插值方法: 需要 点数×点数 的系数矩阵以及 网格点×数据点 的距离矩阵,
+# 数据点数上限与 interpolation.py 中的降采样上限一致
+PAIRWISE_POINT_CAPS = {
+    "multiquadric": 800,
+    "inverse": 800,
+    "gaussian": 800,
+    "thin_plate": 800,
+    "radial_basis": 800,
+    "linear_rbf": 800,
+    "cubic_rbf": 800,
+    "quintic_rbf": 800,
+    "kriging": 500,
+    "ordinary_kriging": 500,
+    "universal_kriging": 500,
+}
+# 逐网格点循环计算的方法, 临时内存与网格规模无关
+POINTWISE_METHODS = {"idw", "modified_shepard"}
+# 降级时使用的局部插值方法 (Delaunay 三角网内的线性插值)
+LOCAL_METHOD = "linear"
+
+# 各导出格式每个网格单元 (每层) 额外占用的字节数, 包含导出前逐列排序时堆叠的层数组
+EXPORT_BYTES_PER_CELL = {
+    "contour": 64,
+    "block_model": 112,  # 响应中每层两张曲面转为 Python 列表并编码为 JSON
+    "dxf": 400,
+    "stl": 300,
+    "stl_single": 300,
+    "stl_layered": 300,
+    "obj": 300,
+    "flac3d": 260,
+    "f3grid": 560,  # 每个六面体剖分为四面体, 写出节点与单元文本
+}
+
+
+def _interpolation_bytes(points: int, method: str, cells: int) -> int:
+    """单个岩层插值时的临时内存"""
+    cap = PAIRWISE_POINT_CAPS.get(method)
+    if cap is not None:
+        n = min(points, cap)
+        return 3 * FLOAT64_BYTES * (n * n + cells * n)
+    if method in POINTWISE_METHODS:
+        return 4 * FLOAT64_BYTES * points + 2 * FLOAT64_BYTES * cells
+    if method == "nearest":
+        return 64 * points + 3 * FLOAT64_BYTES * cells
+    # griddata (linear / cubic) 及其他基于三角网的方法
+    return 256 * points + 6 * FLOAT64_BYTES * cells
+
+
+def estimate_peak_bytes(
+    points: int,
+    method: str,
+    resolution: int,
+    layers: int = 1,
+    exporter: Optional[str] = None,
+    itemsize: int = FLOAT64_BYTES,
+) -> int:
+    """估算一次建模 / 导出请求的峰值内存 (字节)
+
+    Args:
+        points: 单个岩层最多的数据点数
+        method: 插值方法
+        resolution: 网格分辨率 (每个方向的网格点数)
+        layers: 岩层数
+        exporter: 导出格式 (contour / block_model / dxf / f3grid ...), None 表示只建模
+        itemsize: 曲面数组每个元素的字节数
+    """
+    cells = int(resolution) ** 2
+    layers = max(int(layers), 1)
+    # XI / YI 以及展平后的坐标始终为 float64
+    grids = 4 * FLOAT64_BYTES * cells
+    # 每层保留顶面、底面、厚度三张曲面, 处理当前层时另有若干临时数组
+    surfaces = 3 * itemsize * cells * layers + 4 * FLOAT64_BYTES * cells
+    interpolation = _interpolation_bytes(int(points), str(method).lower(), cells)
+    export = EXPORT_BYTES_PER_CELL.get(exporter, 0) * cells * layers if exporter else 0
+    return int(grids + surfaces + interpolation + export)
+
+
+def memory_budget_bytes() -> Optional[int]:
+    """单个请求的内存预算, 未配置且无法获取可用内存时返回 None (不限制)"""
+    from memory_utils import get_available_memory_bytes
+    from performance_config import MODELING_MEMORY_BUDGET_MB, MODELING_MEMORY_FRACTION
+
+    if MODELING_MEMORY_BUDGET_MB > 0:
+        return MODELING_MEMORY_BUDGET_MB * MB
+    available = get_available_memory_bytes()
+    if available is None:
+        return None
+    return int(available * MODELING_MEMORY_FRACTION)
+
+
+@dataclass
+class MemoryPlan:
+    """内存预估结果与准入决定 (admit / degrade / reject)"""
+    decision: str
+    resolution: int
+    method: str
+    dtype: str
+    estimated_bytes: int
+    budget_bytes: Optional[int]
+    requested_resolution: int
+    requested_method: str
+    changes: List[str] = field(default_factory=list)
+
+    @property
+    def numpy_dtype(self) -> type:
+        import numpy as np
+
+        return np.float32 if self.dtype == "float32" else np.float64
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "decision": self.decision,
+            "resolution": self.resolution,
+            "method": self.method,
+            "dtype": self.dtype,
+            "estimated_mb": round(self.estimated_bytes / MB, 1),
+            "budget_mb": round(self.budget_bytes / MB, 1) if self.budget_bytes is not None else None,
+            "requested_resolution": self.requested_resolution,
+            "requested_method": self.requested_method,
+            "changes": list(self.changes),
+        }
+
+
+def plan_request(
+    points: int,
+    method: str,
+    resolution: int,
+    layers: int = 1,
+    exporter: Optional[str] = None,
+    allow_float32: bool = True,
+    budget_bytes: Optional[int] = None,
+) -> MemoryPlan:
+    """按内存预算决定请求以何种参数执行
+
+    budget_bytes 为 None 时使用 memory_budget_bytes(); 预估关闭或无法获得预算时总是 admit。
+    """
+    from performance_config import LOW_MEMORY_RESOLUTION, MEMORY_ESTIMATOR_ENABLED
+
+    method = str(method or LOCAL_METHOD).lower()
+    resolution = int(resolution)
+    if budget_bytes is None and MEMORY_ESTIMATOR_ENABLED:
+        budget_bytes = memory_budget_bytes()
+
+    plan = MemoryPlan(
+        decision="admit",
+        resolution=resolution,
+        method=method,
+        dtype="float64",
+        estimated_bytes=0,
+        budget_bytes=budget_bytes,
+        requested_resolution=resolution,
+        requested_method=method,
+    )
+
+    def estimate(res: int) -> int:
+        itemsize = FLOAT32_BYTES if plan.dtype == "float32" else FLOAT64_BYTES
+        return estimate_peak_bytes(points, plan.method, res, layers, exporter, itemsize)
+
+    plan.estimated_bytes = estimate(resolution)
+    if not MEMORY_ESTIMATOR_ENABLED or budget_bytes is None or plan.estimated_bytes <= budget_bytes:
+        return plan
+
+    plan.decision = "degrade"
+    if allow_float32:
+        plan.dtype = "float32"
+        plan.changes.append("曲面数组使用 float32")
+        plan.estimated_bytes = estimate(resolution)
+        if plan.estimated_bytes <= budget_bytes:
+            return plan
+
+    if method in PAIRWISE_POINT_CAPS:
+        plan.method = LOCAL_METHOD
+        plan.changes.append(f"插值方法 {method} 改为局部方法 {LOCAL_METHOD}")
+        plan.estimated_bytes = estimate(resolution)
+        if plan.estimated_bytes <= budget_bytes:
+            return plan
+
+    minimum = min(resolution, LOW_MEMORY_RESOLUTION)
+    if estimate(minimum) <= budget_bytes and minimum < resolution:
+        # 峰值内存随分辨率单调增加, 二分查找预算内的最高分辨率
+        low, high = minimum, resolution - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate(middle) <= budget_bytes:
+                low = middle
+            else:
+                high = middle - 1
+        plan.resolution = low
+        plan.changes.append(f"分辨率 {resolution} 降为 {low}")
+        plan.estimated_bytes = estimate(low)
+        return plan
+
+    plan.decision = "reject"
+    plan.resolution = minimum
+    plan.estimated_bytes = estimate(minimum)
+    return plan
+
+
+def require_plan(plan: MemoryPlan, label: str) -> MemoryPlan:
+    """记录预估结果; 拒绝时抛出 503, 此时尚未分配任何网格"""
+    if plan.decision == "admit":
+        return plan
+    summary = plan.to_dict()
+    if plan.decision == "degrade":
+        print(f"[内存预估] {label} 降级执行: {'; '.join(plan.changes)} (预计 {summary['estimated_mb']} MB, 预算 {summary['budget_mb']} MB)")
+        return plan
+    print(f"[内存预估] {label} 被拒绝: 降级后仍需 {summary['estimated_mb']} MB, 预算 {summary['budget_mb']} MB")
+    raise HTTPException(
+        status_code=503,
+        detail=(
+            f"服务器内存不足: {label}预计需要 {summary['estimated_mb']} MB, "
+            f"当前预算 {summary['budget_mb']} MB, 请减少岩层数或降低分辨率后重试"
+        ),
+        headers={"Retry-After": "30"},
+    )
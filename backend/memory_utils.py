@@ -3,6 +3,7 @@
 针对4GB服务器的DataFrame和文件处理优化
 """
 import gc
+import mmap
 import sys
 from typing import Iterator, Optional, Callable, Any
 from functools import wraps
@@ -11,14 +12,55 @@ import numpy as np
 from contextlib import contextmanager
 
 
+def _is_memory_mapped(arr: np.ndarray) -> bool:
+    """判断数组是否 (间接) 基于内存映射文件"""
+    current: Any = arr
+    while isinstance(current, np.ndarray):
+        if isinstance(current, np.memmap):
+            return True
+        current = current.base
+    return isinstance(current, mmap.mmap)
+
+
+def estimate_nbytes(obj: Any, _seen: Optional[set] = None, include_mapped: bool = False) -> int:
+    """估算对象占用的字节数 (识别 DataFrame / Series / ndarray)
+
+    递归统计 list/tuple/dict 容器以及普通对象的 __dict__,
+    同一对象只计一次, 适合统计建模状态这类嵌套结构。
+    include_mapped 为 True 时内存映射数组按逻辑大小计入 (用于缓存预算)。
+    """
+    if obj is None:
+        return 0
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True, index=True))
+    if isinstance(obj, np.ndarray):
+        # 内存映射数组由操作系统页缓存承担, 不计入进程内存
+        return 0 if not include_mapped and _is_memory_mapped(obj) else int(obj.nbytes)
+    if isinstance(obj, (str, bytes, int, float, bool)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            estimate_nbytes(k, _seen, include_mapped) + estimate_nbytes(v, _seen, include_mapped)
+            for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(item, _seen, include_mapped) for item in obj)
+    if hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + estimate_nbytes(vars(obj), _seen, include_mapped)
+    return sys.getsizeof(obj)
+
+
 def get_object_size_mb(obj: Any) -> float:
     """获取对象占用内存大小 (MB)"""
-    size_bytes = sys.getsizeof(obj)
-    if isinstance(obj, pd.DataFrame):
-        size_bytes = obj.memory_usage(deep=True).sum()
-    elif isinstance(obj, np.ndarray):
-        size_bytes = obj.nbytes
-    return round(size_bytes / (1024 * 1024), 2)
+    return round(estimate_nbytes(obj) / (1024 * 1024), 2)
 
 
 def optimize_dataframe_memory(df: pd.DataFrame) -> pd.DataFrame:
@@ -228,6 +270,23 @@ def check_memory_usage() -> dict:
         }
 
 
+def get_available_memory_bytes() -> Optional[int]:
+    """系统当前可用内存 (字节), 没有 psutil 时读取 /proc/meminfo, 都不可用时返回 None"""
+    try:
+        import psutil
+        return int(psutil.virtual_memory().available)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
 def limit_dataframe_size(df: pd.DataFrame, max_rows: int = 50000) -> pd.DataFrame:
     """限制DataFrame大小
 
@@ -121,6 +121,20 @@ def vacuum_database():
         conn.commit()
         print("  ✓ VACUUM 完成")
 
+        # VACUUM 可能重新分配 records 的 ROWID, 全文索引按 ROWID 关联, 需要重建
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'")
+        if cursor.fetchone():
+            cursor.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+            conn.commit()
+            print("  ✓ 全文索引重建完成")
+
+    # 按 ROWID 关联的规范化列与汇总表同样需要重建
+    from sqlalchemy import create_engine
+    from records_summary import rebuild_records_summary
+
+    with create_engine(f"sqlite:///{DB_PATH}", future=True).begin() as connection:
+        rebuild_records_summary(connection)
+
 
 def get_database_stats() -> Dict[str, Any]:
     """获取数据库统计信息"""
@@ -154,24 +168,10 @@ def get_database_stats() -> Dict[str, Any]:
 
 
 def optimize_sqlite_settings(conn: sqlite3.Connection):
-    """优化SQLite运行时设置"""
-    cursor = conn.cursor()
-
-    # 启用WAL模式 (提高并发性能)
-    cursor.execute("PRAGMA journal_mode=WAL")
-
-    # 设置缓存大小 (10MB)
-    cursor.execute("PRAGMA cache_size=-10000")  # 负数表示KB
-
-    # 同步模式设置为NORMAL (平衡性能和安全性)
-    cursor.execute("PRAGMA synchronous=NORMAL")
-
-    # 临时文件存储在内存中
-    cursor.execute("PRAGMA temp_store=MEMORY")
-
-    # 启用mmap (内存映射IO,提升读性能)
-    cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+    """优化SQLite运行时设置 (WAL、同步模式、缓存、mmap 等, 与应用连接使用同一组参数)"""
+    from db import apply_sqlite_pragmas
 
+    apply_sqlite_pragmas(conn)
     conn.commit()
 
 
@@ -21,6 +21,38 @@ MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
 # 建模状态内存限制 (MB) - 超过此值会自动清理旧数据
 MODELING_STATE_MEMORY_LIMIT_MB = int(os.getenv("MODELING_STATE_MEMORY_LIMIT_MB", "200"))
 
+# ============================================================================
+# 会话工作区配置
+# ============================================================================
+
+# 会话空闲超时 (秒) - 超时的工作区会被换出到磁盘快照
+WORKSPACE_IDLE_TIMEOUT_SECONDS = int(os.getenv("WORKSPACE_IDLE_TIMEOUT_SECONDS", "1800"))
+
+# 工作区快照目录 (留空使用 data/workspaces)
+WORKSPACE_SNAPSHOT_DIR = os.getenv("WORKSPACE_SNAPSHOT_DIR", "")
+
+# 磁盘快照保留时间 (秒) - 超过后快照被删除, 会话需重新上传数据
+WORKSPACE_SNAPSHOT_RETENTION_SECONDS = int(os.getenv("WORKSPACE_SNAPSHOT_RETENTION_SECONDS", "86400"))
+
+# 项目存储目录 (留空使用 data/projects)
+PROJECT_STORE_DIR = os.getenv("PROJECT_STORE_DIR", "")
+
+# ============================================================================
+# 多进程共享状态配置
+# ============================================================================
+
+# 工作进程数 (uvicorn/gunicorn 读取 WEB_CONCURRENCY, 兼容 .env 中的 BACKEND_WORKERS)
+WORKER_COUNT = int(os.getenv("WEB_CONCURRENCY") or os.getenv("BACKEND_WORKERS") or "1")
+
+# 共享状态启用标志 - 多个 uvicorn/gunicorn 工作进程共享会话快照、限流计数与缓存失效
+# 未显式设置时仅在多工作进程部署下启用, 单进程无需承担 SQLite 索引的开销
+SHARED_STATE_ENABLED = os.getenv(
+    "SHARED_STATE_ENABLED", "true" if WORKER_COUNT > 1 else "false"
+).lower() == "true"
+
+# 共享状态索引目录 (留空使用 data/shared)
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "")
+
 # ============================================================================
 # 缓存配置
 # ============================================================================
@@ -31,22 +63,78 @@ CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
 # 缓存TTL (秒)
 CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))  # 5分钟
 
-# 最大缓存条目数
-CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "100"))
+# 最大缓存条目数 (只限制大量小条目的字典开销, 淘汰主要按字节预算)
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+
+# 内存缓存总字节预算 (MB)
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "512"))
+
+# 各命名空间 (缓存键第一个冒号前的前缀) 的字节配额 (MB), 未列出的命名空间只受总预算限制
+CACHE_NAMESPACE_QUOTAS_MB = {
+    "db": int(os.getenv("CACHE_QUOTA_DB_MB", "64")),
+    "interpolation": int(os.getenv("CACHE_QUOTA_INTERPOLATION_MB", "192")),
+}
+
+# 磁盘二级缓存: 大体积结果 (插值网格) 落盘, 重启后仍可命中
+CACHE_L2_ENABLED = os.getenv("CACHE_L2_ENABLED", "true").lower() == "true"
+
+# 二级缓存目录 (留空使用 data/cache_l2)
+CACHE_L2_DIR = os.getenv("CACHE_L2_DIR", "")
+
+# 二级缓存磁盘上限 (MB)
+CACHE_L2_MAX_MB = int(os.getenv("CACHE_L2_MAX_MB", "2048"))
+
+# 二级缓存条目有效期 (秒), 与内存缓存 TTL 独立; 键由参数内容指纹构成, 默认保留 7 天
+CACHE_L2_TTL_SECONDS = int(os.getenv("CACHE_L2_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# 不小于该大小 (KB) 的条目才写入二级缓存
+CACHE_L2_MIN_KB = int(os.getenv("CACHE_L2_MIN_KB", "256"))
+
+# 使用二级缓存的命名空间
+CACHE_L2_NAMESPACES = tuple(
+    name.strip() for name in os.getenv("CACHE_L2_NAMESPACES", "interpolation").split(",") if name.strip()
+)
+
+# 建模数据集缓存启用标志 - 按上传内容指纹缓存解析合并后的数据集
+DATASET_CACHE_ENABLED = os.getenv("DATASET_CACHE_ENABLED", "true").lower() == "true"
+
+# 数据集缓存目录 (留空使用 data/dataset_cache)
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "")
+
+# 数据集缓存磁盘上限 (MB)
+DATASET_CACHE_MAX_MB = int(os.getenv("DATASET_CACHE_MAX_MB", "512"))
 
 # ============================================================================
 # 数据库优化配置
 # ============================================================================
 
-# SQLite连接池大小 (SQLite不支持真正的连接池,但可以控制并发)
+# SQLite只读连接池大小 (写入始终使用单独的一个写连接)
 DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
 
+# SQLite内存映射大小 (MB, 0 表示关闭)
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+
+# SQLite每个连接的页缓存大小 (MB)
+SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "10"))
+
 # 查询结果缓存时间 (秒)
 DB_QUERY_CACHE_TTL = int(os.getenv("DB_QUERY_CACHE_TTL", "180"))  # 3分钟
 
 # 数据库查询超时 (秒)
 DB_QUERY_TIMEOUT = int(os.getenv("DB_QUERY_TIMEOUT", "30"))
 
+# 无过滤条件时, 估算行数超过该值则返回近似总数, 不再执行 COUNT(*)
+DB_EXACT_COUNT_LIMIT = int(os.getenv("DB_EXACT_COUNT_LIMIT", "200000"))
+
+# 流式导出时每批从数据库游标读取并编码的行数
+DB_STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "2000"))
+
+# 导入汇总表 CSV 时每块读取的行数, 每块一次批量插入并提交
+RECORDS_IMPORT_CHUNK_SIZE = int(os.getenv("RECORDS_IMPORT_CHUNK_SIZE", "20000"))
+
+# 导入占用标记的租约 (秒): 每写入一块续期, 持有进程异常退出后超过该时长可被其他进程接管
+RECORDS_IMPORT_LEASE_SECONDS = int(os.getenv("RECORDS_IMPORT_LEASE_SECONDS", "600"))
+
 # ============================================================================
 # 插值计算优化配置
 # ============================================================================
@@ -60,6 +148,14 @@ LOW_MEMORY_RESOLUTION = int(os.getenv("LOW_MEMORY_RESOLUTION", "50"))
 # 大网格分块计算阈值 (网格点数)
 LARGE_GRID_THRESHOLD = int(os.getenv("LARGE_GRID_THRESHOLD", "10000"))
 
+# 建模 / 导出请求的内存预估: 超出预算时依次降为 float32、局部插值方法、较低分辨率
+# (不低于 LOW_MEMORY_RESOLUTION), 仍超出时拒绝请求
+MEMORY_ESTIMATOR_ENABLED = os.getenv("MEMORY_ESTIMATOR_ENABLED", "true").lower() == "true"
+
+# 单个请求的内存预算 (MB), 0 表示按当前可用内存的 MODELING_MEMORY_FRACTION 计算
+MODELING_MEMORY_BUDGET_MB = int(os.getenv("MODELING_MEMORY_BUDGET_MB", "0"))
+MODELING_MEMORY_FRACTION = float(os.getenv("MODELING_MEMORY_FRACTION", "0.5"))
+
 # 分块大小 (用于大网格计算)
 INTERPOLATION_CHUNK_SIZE = int(os.getenv("INTERPOLATION_CHUNK_SIZE", "2000"))
 
@@ -76,6 +172,24 @@ RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
 # 上传接口专用限流 (每小时)
 UPLOAD_RATE_LIMIT_PER_HOUR = int(os.getenv("UPLOAD_RATE_LIMIT_PER_HOUR", "100"))
 
+# ============================================================================
+# 计算准入控制
+# ============================================================================
+
+# 准入控制启用标志 (插值、建模、导出等计算密集接口按估算成本排队)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+
+# 单进程全局计算预算 (成本单位: 150×150 网格、线性插值、单个岩层记为 1)
+ADMISSION_BUDGET = float(os.getenv("ADMISSION_BUDGET", "24"))
+
+# 预算占满时最多排队的请求数, 以及单个请求最长排队时间 (秒)
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+# 每个客户端的令牌桶: 容量 (可突发的成本) 与每秒补充的成本
+ADMISSION_CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "48"))
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "0.5"))
+
 # ============================================================================
 # 临时文件清理配置
 # ============================================================================
@@ -119,12 +233,15 @@ def is_low_memory_system() -> bool:
 
 def adjust_for_low_memory():
     """自动调整配置以适应低内存环境"""
-    global MAX_RESOLUTION, CACHE_MAX_SIZE, DATAFRAME_CHUNK_SIZE
+    global MAX_RESOLUTION, CACHE_MAX_MB, DATAFRAME_CHUNK_SIZE, ADMISSION_BUDGET
 
     if is_low_memory_system():
         MAX_RESOLUTION = min(MAX_RESOLUTION, 100)
-        CACHE_MAX_SIZE = min(CACHE_MAX_SIZE, 50)
+        CACHE_MAX_MB = min(CACHE_MAX_MB, 256)
+        for namespace, quota_mb in CACHE_NAMESPACE_QUOTAS_MB.items():
+            CACHE_NAMESPACE_QUOTAS_MB[namespace] = min(quota_mb, CACHE_MAX_MB // 2)
         DATAFRAME_CHUNK_SIZE = min(DATAFRAME_CHUNK_SIZE, 3000)
+        ADMISSION_BUDGET = min(ADMISSION_BUDGET, 12)
         print("[性能优化] 检测到低内存系统，已自动调整配置")
 
 
@@ -145,8 +262,12 @@ def print_config_summary():
     print(f"低内存模式: {'是' if is_low_memory_system() else '否'}")
     print(f"最大上传大小: {MAX_UPLOAD_SIZE_MB} MB")
     print(f"最大分辨率: {MAX_RESOLUTION}")
+    print(f"建模状态内存上限: {MODELING_STATE_MEMORY_LIMIT_MB} MB")
+    print(f"多进程共享状态: {'是' if SHARED_STATE_ENABLED else '否'} (工作进程数 {WORKER_COUNT})")
     print(f"缓存启用: {'是' if CACHE_ENABLED else '否'}")
     print(f"缓存TTL: {CACHE_TTL_SECONDS} 秒")
+    print(f"缓存内存预算: {CACHE_MAX_MB} MB")
     print(f"限流启用: {'是' if RATE_LIMIT_ENABLED else '否'}")
     print(f"请求限流: {RATE_LIMIT_PER_MINUTE} 次/分钟")
+    print(f"计算准入: {'是' if ADMISSION_ENABLED else '否'} (预算 {ADMISSION_BUDGET:g}, 队列 {ADMISSION_MAX_QUEUE})")
     print("=" * 60 + "\n")
@@ -0,0 +1,130 @@
+"""
+项目持久化
+将合并后的建模数据集、岩层分组索引和已生成的块体模型层栈以列式二进制格式保存,
+重新打开时直接内存映射, 无需重新上传 CSV 或重新插值
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from columnar_store import atomic_write_dir, read_object_state, remove_dir, write_object_state
+
+APP_ROOT = Path(__file__).resolve().parent
+
+PROJECT_MANIFEST = "project.json"
+_PROJECT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+
+class ProjectStore:
+    """基于目录的项目存储, 每个项目一个子目录"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _project_dir(self, project_id: str) -> Path:
+        if not _PROJECT_ID_PATTERN.match(project_id or ""):
+            raise HTTPException(status_code=400, detail=f"非法的项目ID: {project_id}")
+        return self.root / project_id
+
+    def _read_manifest(self, directory: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with (directory / PROJECT_MANIFEST).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_meta(self, project_id: str) -> Dict[str, Any]:
+        meta = self._read_manifest(self._project_dir(project_id))
+        if meta is None:
+            raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+        return meta
+
+    def list_projects(self) -> List[Dict[str, Any]]:
+        if not self.root.exists():
+            return []
+        projects = []
+        for directory in self.root.iterdir():
+            if directory.is_dir() and not directory.name.startswith("."):
+                meta = self._read_manifest(directory)
+                if meta is not None:
+                    projects.append(meta)
+        return sorted(projects, key=lambda meta: meta.get("updated_at", 0), reverse=True)
+
+    def save(self, name: str, state: Any, project_id: Optional[str] = None) -> Dict[str, Any]:
+        """保存建模状态, 指定 project_id 时覆盖已有项目"""
+        state.ensure_loaded()
+        if state.last_selected_seam_column:
+            # 岩层索引随项目保存, 重新打开后岩层列表无需重新扫描数据
+            state.get_seam_index(state.last_selected_seam_column)
+
+        now = time.time()
+        created_at = now
+        if project_id:
+            existing = self._read_manifest(self._project_dir(project_id))
+            if existing is not None:
+                created_at = existing.get("created_at", now)
+        else:
+            project_id = uuid.uuid4().hex[:12]
+
+        merged_df = state.merged_df
+        meta = {
+            "id": project_id,
+            "name": name,
+            "created_at": created_at,
+            "updated_at": now,
+            "record_count": int(len(merged_df)),
+            "column_count": int(merged_df.shape[1]),
+            "borehole_file_count": int(state.borehole_file_count or 0),
+            "seam_column": state.last_selected_seam_column,
+            "indexed_columns": sorted(state.seam_indexes),
+            "model_layers": [model.name for model in (state.last_block_models or [])],
+        }
+
+        def writer(staging: Path) -> None:
+            write_object_state(state, staging / "state")
+            with (staging / PROJECT_MANIFEST).open("w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            atomic_write_dir(self._project_dir(project_id), writer)
+        print(f"[项目] 已保存项目 {name} ({project_id}), 记录数 {meta['record_count']}")
+        return meta
+
+    def open(self, project_id: str) -> Any:
+        """内存映射方式打开项目, 返回建模状态对象"""
+        directory = self._project_dir(project_id)
+        if self._read_manifest(directory) is None:
+            raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+        return read_object_state(directory / "state", mmap=True)
+
+    def delete(self, project_id: str) -> None:
+        directory = self._project_dir(project_id)
+        if not directory.exists():
+            raise HTTPException(status_code=404, detail=f"项目不存在: {project_id}")
+        with self._lock:
+            remove_dir(directory)
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_project_store: Optional[ProjectStore] = None
+
+
+def get_project_store() -> ProjectStore:
+    """获取全局项目存储"""
+    global _project_store
+    if _project_store is None:
+        from performance_config import PROJECT_STORE_DIR
+
+        root = Path(PROJECT_STORE_DIR) if PROJECT_STORE_DIR else APP_ROOT.parent / "data" / "projects"
+        _project_store = ProjectStore(root)
+    return _project_store
@@ -0,0 +1,136 @@
+"""
+岩性参数填充
+按规范化岩性名称对照岩性统计表, 以向量化方式填充缺失 (或为 0) 的力学参数,
+并记录被填充的单元格
+"""
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+COAL_ALIASES = {"煤"}
+COAL_NORMALIZED_NAME = "煤"
+
+_COAL_NOISE_PATTERN = re.compile(r"[0-9０-９一二三四五六七八九十百千万点·\-_/\\（）()\s]+")
+
+
+def normalize_lithology_name(name: Any) -> str:
+    """规范化岩性名称: 去除首尾空白, 各类煤层编号 (如 3-1煤、二煤层) 统一为 "煤" """
+    if name is None:
+        return ""
+    value = str(name).strip()
+    if not value:
+        return ""
+    candidate = value.replace("煤层", COAL_NORMALIZED_NAME)
+    simplified = _COAL_NOISE_PATTERN.sub("", candidate)
+    if simplified in COAL_ALIASES:
+        return COAL_NORMALIZED_NAME
+    return value
+
+
+def normalize_lithology_keys(series: pd.Series) -> pd.Series:
+    """对整列规范化岩性名称 (每个不同取值只计算一次), 缺失值记为空串"""
+    codes, uniques = pd.factorize(series, sort=False)
+    lookup = np.array([normalize_lithology_name(value) for value in uniques] + [""], dtype=object)
+    return pd.Series(lookup[codes], index=series.index)
+
+
+def build_lithology_stats(
+    rock_db: pd.DataFrame,
+    numeric_columns: Optional[Iterable[str]] = None,
+    stat: str = "median",
+    lithology_col: str = "岩性",
+) -> pd.DataFrame:
+    """按规范化岩性汇总数值列, 返回以岩性为索引的统计表"""
+    if rock_db is None or rock_db.empty or lithology_col not in rock_db.columns:
+        return pd.DataFrame()
+    if numeric_columns is None:
+        numeric_columns = [
+            column for column in rock_db.columns
+            if column != lithology_col and pd.api.types.is_numeric_dtype(rock_db[column])
+        ]
+    numeric_columns = [column for column in numeric_columns if column in rock_db.columns]
+    if not numeric_columns:
+        return pd.DataFrame()
+
+    keys = normalize_lithology_keys(rock_db[lithology_col])
+    values = rock_db[numeric_columns].apply(pd.to_numeric, errors="coerce")
+    grouped = values[keys.astype(bool).to_numpy()].groupby(keys[keys.astype(bool)])
+    stats = grouped.median() if stat != "mean" else grouped.mean()
+    return stats.dropna(how="all")
+
+
+def coal_fallback_key(stats: pd.DataFrame) -> Optional[str]:
+    """煤层在统计表中没有精确匹配时使用的岩性"""
+    if COAL_NORMALIZED_NAME in stats.index:
+        return COAL_NORMALIZED_NAME
+    coal_keys = [key for key in stats.index if COAL_NORMALIZED_NAME in str(key)]
+    return coal_keys[0] if coal_keys else None
+
+
+def match_lithology_keys(lithology: pd.Series, stats: pd.DataFrame, coal_fallback: bool = True) -> pd.Series:
+    """将每行岩性映射到统计表索引, 无法匹配时为 NaN"""
+    keys = normalize_lithology_keys(lithology)
+    matched = keys.where(keys.isin(stats.index))
+    if coal_fallback:
+        fallback = coal_fallback_key(stats)
+        if fallback is not None:
+            is_coal = keys.str.contains(COAL_NORMALIZED_NAME, regex=False)
+            matched = matched.mask(matched.isna() & is_coal, fallback)
+    return matched
+
+
+def fill_properties(
+    df: pd.DataFrame,
+    stats: pd.DataFrame,
+    lithology_col: str,
+    columns: Optional[Iterable[str]] = None,
+    coal_fallback: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """用统计表填充缺失或为 0 的参数
+
+    Args:
+        df: 待填充数据
+        stats: build_lithology_stats 的结果 (以规范化岩性为索引)
+        lithology_col: df 中的岩性列
+        columns: 需要填充的列, 默认为 df 与 stats 共有的列
+        coal_fallback: 煤层没有精确匹配时是否使用统计表中的煤
+
+    Returns:
+        (填充后的副本, 与副本同形状的布尔掩码, True 表示该单元格被填充)
+    """
+    filled = df.copy()
+    if columns is None:
+        columns = [column for column in stats.columns if column in df.columns]
+    columns = [column for column in columns if column in df.columns and column in stats.columns]
+    mask = pd.DataFrame(False, index=df.index, columns=columns)
+    if stats.empty or lithology_col not in df.columns or not columns:
+        return filled, mask
+
+    matched = match_lithology_keys(df[lithology_col], stats, coal_fallback)
+    lookup = stats.reindex(matched.to_numpy())[columns]
+
+    for column in columns:
+        current = filled[column]
+        needs_fill = current.isna() | (pd.to_numeric(current, errors="coerce") == 0)
+        values = lookup[column].to_numpy(dtype=float)
+        column_mask = needs_fill.to_numpy() & ~np.isnan(values)
+        if column_mask.any():
+            filled[column] = current.where(~column_mask, values)
+            mask[column] = column_mask
+    return filled, mask
+
+
+def summarize_fill(mask: pd.DataFrame) -> Dict[str, Any]:
+    """填充报告: 总数、各列数量及被填充的行号"""
+    counts = mask.sum()
+    filled_columns = [column for column in mask.columns if counts[column] > 0]
+    return {
+        "filled_count": int(counts.sum()),
+        "filled_columns": filled_columns,
+        "filled_cells": {
+            column: [int(position) for position in np.flatnonzero(mask[column].to_numpy())]
+            for column in filled_columns
+        },
+    }
@@ -11,6 +11,25 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
 
+def get_client_ip(request: Request) -> str:
+    """获取客户端IP"""
+    # 优先从X-Forwarded-For获取真实IP
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+
+    # 其次从X-Real-IP获取
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip
+
+    # 最后从连接信息获取
+    if request.client:
+        return request.client.host
+
+    return "unknown"
+
+
 class RateLimiter:
     """基于滑动窗口的请求限流器"""
 
@@ -101,6 +120,15 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             rate_per_minute: 每分钟最大请求数
         """
         super().__init__(app)
+        from shared_state import SharedRateLimiter, get_shared_store, is_shared_state_enabled
+
+        if is_shared_state_enabled():
+            # 多工作进程部署: 计数保存在共享 SQLite 中, 各进程合并计算
+            store = get_shared_store()
+            self.limiter = SharedRateLimiter(store, "requests", max_requests=rate_per_minute, window_seconds=60)
+            self.upload_limiter = SharedRateLimiter(store, "uploads", max_requests=20, window_seconds=3600)
+            return
+
         self.limiter = RateLimiter(
             max_requests=rate_per_minute,
             window_seconds=60
@@ -114,21 +142,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
     def _get_client_ip(self, request: Request) -> str:
         """获取客户端IP"""
-        # 优先从X-Forwarded-For获取真实IP
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return forwarded.split(",")[0].strip()
-
-        # 其次从X-Real-IP获取
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-
-        # 最后从连接信息获取
-        if request.client:
-            return request.client.host
-
-        return "unknown"
+        return get_client_ip(request)
 
     def _is_upload_endpoint(self, path: str) -> bool:
         """判断是否为上传接口"""
@@ -0,0 +1,118 @@
+"""
+records 全文索引
+为 records 表的文本列建立 FTS5 (trigram 分词) 外部内容索引, 由触发器随增删改同步,
+关键字搜索与计数都走索引, 不再对每个文本列做全表 LIKE 扫描
+"""
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+FTS_TABLE = "records_fts"
+
+# trigram 分词只能匹配不少于 3 个字符的关键字, 更短的关键字退回 LIKE 扫描
+MIN_FTS_KEYWORD_LENGTH = 3
+
+_TRIGGERS = ("records_fts_ai", "records_fts_ad", "records_fts_au")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def text_columns(connection: Connection) -> List[str]:
+    """records 表中具有文本亲和性的列 (与 LIKE 搜索覆盖的列一致)"""
+    columns = []
+    for row in connection.exec_driver_sql("PRAGMA table_info(records)"):
+        declared = (row[2] or "").upper()
+        if any(token in declared for token in ("CHAR", "CLOB", "TEXT")):
+            columns.append(row[1])
+    return columns
+
+
+def drop_records_fts(connection: Connection) -> None:
+    for trigger in _TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def rebuild_records_fts(connection: Connection) -> bool:
+    """按当前表结构重建全文索引和同步触发器 (导入或 VACUUM 后调用)
+
+    SQLite 未编译 FTS5 时返回 False, 搜索继续使用 LIKE。
+    """
+    drop_records_fts(connection)
+    columns = text_columns(connection)
+    if not columns:
+        return False
+
+    column_list = ", ".join(_quote(column) for column in columns)
+    new_values = ", ".join(f"new.{_quote(column)}" for column in columns)
+    old_values = ", ".join(f"old.{_quote(column)}" for column in columns)
+    try:
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({column_list}, "
+            f"content='records', content_rowid='rowid', tokenize='trigram')"
+        )
+    except DBAPIError as exc:
+        print(f"[全文索引] 当前 SQLite 不支持 FTS5 trigram, 搜索使用 LIKE: {exc}")
+        return False
+
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER records_fts_ai AFTER INSERT ON records BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {column_list}) VALUES (new.rowid, {new_values}); END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER records_fts_ad AFTER DELETE ON records BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values}); END"
+    )
+    connection.exec_driver_sql(
+        # 只在文本列被修改时才更新索引
+        f"CREATE TRIGGER records_fts_au AFTER UPDATE OF {column_list} ON records BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {column_list}) VALUES (new.rowid, {new_values}); END"
+    )
+    connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    print(f"[全文索引] 已重建 {FTS_TABLE}: {len(columns)} 个文本列")
+    return True
+
+
+def has_records_fts(connection: Connection) -> bool:
+    row = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first()
+    return row is not None
+
+
+def ensure_records_fts(connection: Connection) -> bool:
+    """索引不存在时创建 (启动检查数据库时调用)"""
+    if has_records_fts(connection):
+        return True
+    if not text_columns(connection):
+        return False
+    return rebuild_records_fts(connection)
+
+
+def fts_query(keyword: Optional[str]) -> Optional[str]:
+    """关键字转为 FTS5 短语查询, 关键字过短时返回 None"""
+    if not keyword:
+        return None
+    keyword = keyword.strip()
+    if len(keyword) < MIN_FTS_KEYWORD_LENGTH:
+        return None
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def fts_rowid_clause(query: str):
+    """匹配关键字的 records ROWID 条件"""
+    return text(
+        f"records.ROWID IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query)"
+    ).bindparams(fts_query=query)
+
+
+def count_fts_matches(connection: Connection, query: str) -> int:
+    return int(connection.execute(
+        text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query"),
+        {"fts_query": query},
+    ).scalar() or 0)
@@ -0,0 +1,278 @@
+"""
+岩石数据库批量导入
+分块读取汇总表 CSV, 每块一次 executemany 写入暂存表并提交; 全部写完后在同一事务中
+用暂存表替换 records, 再创建索引、全文索引、汇总表和岩性统计。
+导入期间原 records 表 (如有) 照常可读, 替换对读连接是原子的。
+多个工作进程共用同一数据库时, 通过库内的占用标记行保证同一时刻只有一个进程导入。
+"""
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine
+
+from csv_reader import SNIFF_SAMPLE_BYTES, sniff_encoding
+from lithology_stats import rebuild_lithology_stats
+from records_fts import drop_records_fts, rebuild_records_fts
+from records_summary import LITHOLOGY_COLUMN, MINE_COLUMN, PROVINCE_COLUMN_CANDIDATES, rebuild_records_summary
+
+RECORDS_TABLE = "records"
+STAGING_TABLE = "records_staging"
+LOCK_TABLE = "records_import_lock"
+
+# 索引名 -> 候选列 (取第一个存在的列)
+INDEX_COLUMNS = (
+    ("idx_province", tuple(PROVINCE_COLUMN_CANDIDATES)),
+    ("idx_mine", (MINE_COLUMN,)),
+    ("idx_lithology", (LITHOLOGY_COLUMN,)),
+)
+
+# 列类型宽度: 后续分块出现更宽的类型时需要放宽声明类型并重新导入
+_TYPE_RANK = {"BOOLEAN": 0, "BIGINT": 1, "FLOAT": 2, "TEXT": 3}
+
+# progress(已读取字节数, 文件总字节数, 说明)
+ProgressCallback = Callable[[int, int, str], None]
+
+
+class ImportSkipped(Exception):
+    """其他进程正在导入, 或 records 已有数据且未要求替换"""
+
+
+class _SchemaConflict(Exception):
+    """后续分块与按首块推断的列类型不一致"""
+
+    def __init__(self, overrides: Dict[str, str]):
+        super().__init__(", ".join(f"{column}->{kind}" for column, kind in overrides.items()))
+        self.overrides = overrides
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def create_import_engine(db_path: Path) -> Engine:
+    """导入专用引擎, 不占用应用写连接池, 连接参数与应用一致"""
+    from db import apply_sqlite_pragmas
+
+    engine = create_engine(f"sqlite:///{db_path}", future=True)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection)
+
+    return engine
+
+
+def _column_type(series: pd.Series) -> str:
+    """与 DataFrame.to_sql 经 SQLAlchemy 写入 SQLite 时声明的列类型一致"""
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(series):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(series):
+        return "FLOAT"
+    return "TEXT"
+
+
+def _reconcile(declared: Dict[str, str], chunk: pd.DataFrame) -> Dict[str, str]:
+    """返回需要放宽的列类型
+
+    按整文件解析时, 只要某列出现非数值, 整列都按原始文本读取; 因此声明为 TEXT 的列
+    在后续分块中被解析成数值, 同样需要以文本方式重新读取。
+    """
+    overrides = {}
+    for column in chunk.columns:
+        current = _column_type(chunk[column])
+        expected = declared[column]
+        if expected == "TEXT" and current != "TEXT":
+            overrides[column] = "TEXT"
+        elif _TYPE_RANK[current] > _TYPE_RANK[expected]:
+            overrides[column] = current
+    return overrides
+
+
+def _read_chunks(
+    csv_path: Path, encoding: str, chunk_size: int, text_columns: Tuple[str, ...]
+) -> Iterator[Tuple[pd.DataFrame, int]]:
+    with open(csv_path, "rb") as handle:
+        reader = pd.read_csv(
+            handle,
+            encoding=encoding,
+            chunksize=chunk_size,
+            dtype={column: str for column in text_columns} or None,
+        )
+        for chunk in reader:
+            yield chunk, handle.tell()
+
+
+def _claim_import(engine: Engine, owner: str, lease_seconds: int) -> bool:
+    """以 BEGIN IMMEDIATE 写入占用标记, 已被其他进程占用且租约未过期时返回 False"""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {LOCK_TABLE} "
+            "(id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT NOT NULL, heartbeat REAL NOT NULL)"
+        )
+        row = connection.exec_driver_sql(f"SELECT owner, heartbeat FROM {LOCK_TABLE}").fetchone()
+        if row is not None and row[0] != owner and row[1] > time.time() - lease_seconds:
+            connection.rollback()
+            return False
+        connection.exec_driver_sql(
+            f"INSERT OR REPLACE INTO {LOCK_TABLE} (id, owner, heartbeat) VALUES (1, ?, ?)", (owner, time.time())
+        )
+        connection.commit()
+    return True
+
+
+def _renew_claim(connection: Connection, owner: str) -> None:
+    connection.exec_driver_sql(f"UPDATE {LOCK_TABLE} SET heartbeat = ? WHERE owner = ?", (time.time(), owner))
+
+
+def _release_claim(engine: Engine, owner: str) -> None:
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DELETE FROM {LOCK_TABLE} WHERE owner = ?", (owner,))
+
+
+def _records_loaded(connection: Connection) -> bool:
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (RECORDS_TABLE,)
+    ).fetchone()
+    return bool(exists) and connection.exec_driver_sql(f"SELECT 1 FROM {RECORDS_TABLE} LIMIT 1").fetchone() is not None
+
+
+def _load_staging(
+    connection: Connection,
+    csv_path: Path,
+    encoding: str,
+    overrides: Dict[str, str],
+    chunk_size: int,
+    progress: Optional[ProgressCallback],
+    owner: str,
+) -> int:
+    total_bytes = csv_path.stat().st_size
+    text_columns = tuple(column for column, kind in overrides.items() if kind == "TEXT")
+    declared: Optional[Dict[str, str]] = None
+    insert_sql = ""
+    rows = 0
+
+    for chunk, position in _read_chunks(csv_path, encoding, chunk_size, text_columns):
+        if declared is None:
+            declared = {column: overrides.get(column) or _column_type(chunk[column]) for column in chunk.columns}
+            column_defs = ", ".join(f"{_quote(column)} {kind}" for column, kind in declared.items())
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            connection.exec_driver_sql(f"CREATE TABLE {STAGING_TABLE} ({column_defs})")
+            placeholders = ", ".join("?" for _ in declared)
+            insert_sql = f"INSERT INTO {STAGING_TABLE} VALUES ({placeholders})"
+        else:
+            conflicts = _reconcile(declared, chunk)
+            if conflicts:
+                raise _SchemaConflict(conflicts)
+
+        values = chunk.astype(object).where(chunk.notna(), None)
+        connection.exec_driver_sql(insert_sql, list(values.itertuples(index=False, name=None)))
+        _renew_claim(connection, owner)
+        connection.commit()
+        rows += len(chunk)
+        if progress is not None:
+            progress(min(position, total_bytes), total_bytes, f"已写入 {rows} 条记录")
+
+    if declared is None:
+        raise ValueError(f"CSV 文件为空: {csv_path}")
+    return rows
+
+
+def _create_indexes(connection: Connection) -> None:
+    columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({RECORDS_TABLE})")}
+    for index_name, candidates in INDEX_COLUMNS:
+        column = next((name for name in candidates if name in columns), None)
+        if column is not None:
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {RECORDS_TABLE} ({_quote(column)})"
+            )
+
+
+def _swap_staging(connection: Connection) -> None:
+    """在一个事务内替换 records 并构建所有派生结构"""
+    drop_records_fts(connection)
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {RECORDS_TABLE}")
+    connection.exec_driver_sql(f"ALTER TABLE {STAGING_TABLE} RENAME TO {RECORDS_TABLE}")
+    _create_indexes(connection)
+    rebuild_records_fts(connection)
+    rebuild_records_summary(connection)
+    rebuild_lithology_stats(connection)
+
+
+def bulk_load_records(
+    engine: Engine,
+    csv_path: Path,
+    chunk_size: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    replace: bool = True,
+) -> int:
+    """分块导入 CSV 并原子替换 records 表, 返回导入的记录数
+
+    其他进程持有导入占用时抛出 ImportSkipped; ``replace=False`` 时若占用后发现
+    records 已有数据 (其他进程刚导入完成) 同样跳过。
+    """
+    from performance_config import RECORDS_IMPORT_CHUNK_SIZE, RECORDS_IMPORT_LEASE_SECONDS
+
+    csv_path = Path(csv_path)
+    chunk_size = chunk_size or RECORDS_IMPORT_CHUNK_SIZE
+    owner = uuid.uuid4().hex
+    if not _claim_import(engine, owner, RECORDS_IMPORT_LEASE_SECONDS):
+        raise ImportSkipped("其他进程正在导入岩石数据库")
+    try:
+        if not replace:
+            with engine.connect() as connection:
+                if _records_loaded(connection):
+                    raise ImportSkipped("records 表已有数据")
+        rows = _bulk_load_claimed(engine, csv_path, chunk_size, progress, owner)
+    finally:
+        _release_claim(engine, owner)
+    return rows
+
+
+def _bulk_load_claimed(
+    engine: Engine,
+    csv_path: Path,
+    chunk_size: int,
+    progress: Optional[ProgressCallback],
+    owner: str,
+) -> int:
+    with open(csv_path, "rb") as handle:
+        encoding = sniff_encoding(handle.read(SNIFF_SAMPLE_BYTES))
+    tried_encodings = (encoding,)
+    overrides: Dict[str, str] = {}
+
+    try:
+        while True:
+            try:
+                with engine.connect() as connection:
+                    rows = _load_staging(connection, csv_path, encoding, overrides, chunk_size, progress, owner)
+                break
+            except _SchemaConflict as conflict:
+                # 每次重试至少放宽一列的类型, 重试次数有上限
+                print(f"[数据导入] 列类型与首块推断不一致, 放宽后重新导入: {conflict}")
+                overrides.update(conflict.overrides)
+            except UnicodeDecodeError:
+                if len(tried_encodings) > 1:
+                    raise
+                # 非法字节出现在探测样本之后, 用完整内容重新判定
+                encoding = sniff_encoding(csv_path.read_bytes(), final=True, exclude=tried_encodings)
+                tried_encodings += (encoding,)
+                print(f"[数据导入] 编码 {tried_encodings[0]} 解码失败, 改用 {encoding}")
+
+        if progress is not None:
+            progress(csv_path.stat().st_size, csv_path.stat().st_size, "正在替换数据表并构建索引")
+        with engine.begin() as connection:
+            _swap_staging(connection)
+    except Exception:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        raise
+
+    print(f"[数据导入] 已导入 {rows} 条记录 ({csv_path.name}, 编码 {encoding})")
+    return rows
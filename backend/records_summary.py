@@ -0,0 +1,311 @@
+"""
+records 规范化列与汇总表
+records_normalized 按 ROWID 保存每条记录规范化后的省份和岩性 (带索引),
+records_summary 保存各省份、矿名、岩性取值的记录数; 二者在导入时全量构建、
+保存时按增删改的记录增量维护, 概览类接口只需读取小表
+"""
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from property_fill import COAL_NORMALIZED_NAME, normalize_lithology_name
+
+SIDE_TABLE = "records_normalized"
+SUMMARY_TABLE = "records_summary"
+
+PROVINCE_COLUMN_CANDIDATES = [
+    "省份",
+    "省份名称",
+    "所在省份",
+    "所属省份",
+    "省",
+    "省市",
+    "省份/地区",
+    "省份(地区)",
+    "行政区",
+    "份",
+]
+MINE_COLUMN = "矿名"
+LITHOLOGY_COLUMN = "岩性"
+
+# 汇总表中的 kind 取值; total 只有一行, 记录总行数
+SUMMARY_KINDS = ("province", "mine", "lithology")
+
+_PROVINCE_REPLACEMENTS = {
+    "内蒙古自治区": "内蒙古",
+    "广西壮族自治区": "广西",
+    "宁夏回族自治区": "宁夏",
+    "新疆维吾尔自治区": "新疆",
+    "西藏自治区": "西藏",
+    "香港特别行政区": "香港",
+    "澳门特别行政区": "澳门",
+    "黑龙江省": "黑龙江",
+}
+_PROVINCE_SUFFIXES = ["省", "市", "地区", "自治区", "特别行政区"]
+
+
+def normalize_province_name(name: Any) -> str:
+    """规范化省份名称: 去除首尾空白及 省/市/自治区 等后缀"""
+    if name is None:
+        return ""
+    value = str(name).strip()
+    if not value:
+        return ""
+    if value in _PROVINCE_REPLACEMENTS:
+        return _PROVINCE_REPLACEMENTS[value]
+    for suffix in _PROVINCE_SUFFIXES:
+        if value.endswith(suffix):
+            value = value[: -len(suffix)]
+            break
+    return value.strip()
+
+
+_NORMALIZERS = {
+    "province": normalize_province_name,
+    "mine": lambda value: str(value),
+    "lithology": normalize_lithology_name,
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def resolve_summary_columns(columns: Iterable[str]) -> Dict[str, str]:
+    """records 中参与汇总的列: kind -> 列名"""
+    available = set(columns)
+    resolved = {}
+    province = next((name for name in PROVINCE_COLUMN_CANDIDATES if name in available), None)
+    if province is not None:
+        resolved["province"] = province
+    if MINE_COLUMN in available:
+        resolved["mine"] = MINE_COLUMN
+    if LITHOLOGY_COLUMN in available:
+        resolved["lithology"] = LITHOLOGY_COLUMN
+    return resolved
+
+
+def _records_columns(connection: Connection) -> List[str]:
+    return [row[1] for row in connection.exec_driver_sql("PRAGMA table_info(records)")]
+
+
+def _create_tables(connection: Connection) -> None:
+    connection.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {SIDE_TABLE} ("
+        "rowid INTEGER PRIMARY KEY, province TEXT NOT NULL, lithology TEXT NOT NULL)"
+    )
+    connection.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS idx_{SIDE_TABLE}_province ON {SIDE_TABLE} (province)"
+    )
+    connection.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS idx_{SIDE_TABLE}_lithology ON {SIDE_TABLE} (lithology)"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} ("
+        "kind TEXT NOT NULL, key TEXT NOT NULL, normalized TEXT NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (kind, key))"
+    )
+
+
+def has_records_summary(connection: Connection) -> bool:
+    row = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SUMMARY_TABLE,)
+    ).first()
+    return row is not None
+
+
+def read_summary_rows(connection: Connection, rowids: Optional[List[int]] = None) -> pd.DataFrame:
+    """读取参与汇总的原始列 (rowid 及各 kind 一列), rowids 为 None 时读取全表"""
+    resolved = resolve_summary_columns(_records_columns(connection))
+    select_list = ", ".join(["ROWID AS rowid"] + [f"{_quote(column)} AS {kind}" for kind, column in resolved.items()])
+    if rowids is None:
+        frame = pd.read_sql(text(f"SELECT {select_list} FROM records"), connection)
+    else:
+        frames = []
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start:start + 500]
+            params = {f"r{index}": int(rowid) for index, rowid in enumerate(chunk)}
+            placeholders = ", ".join(f":{key}" for key in params)
+            frames.append(pd.read_sql(
+                text(f"SELECT {select_list} FROM records WHERE ROWID IN ({placeholders})"), connection, params=params
+            ))
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["rowid"] + list(resolved))
+    for kind in SUMMARY_KINDS:
+        if kind not in frame.columns:
+            frame[kind] = None
+    return frame
+
+
+def _normalized_frame(rows: pd.DataFrame) -> pd.DataFrame:
+    def normalize(kind: str) -> List[str]:
+        cache: Dict[Any, str] = {}
+        normalizer = _NORMALIZERS[kind]
+        result = []
+        for value in rows[kind].tolist():
+            if value is None or (isinstance(value, float) and pd.isna(value)):
+                result.append("")
+                continue
+            if value not in cache:
+                cache[value] = normalizer(value)
+            result.append(cache[value])
+        return result
+
+    return pd.DataFrame({
+        "rowid": rows["rowid"].astype("int64").tolist(),
+        "province": normalize("province"),
+        "lithology": normalize("lithology"),
+    })
+
+
+def _summary_counts(rows: pd.DataFrame) -> Counter:
+    """(kind, 原始取值, 规范化取值) -> 记录数, 空值不计入"""
+    counts: Counter = Counter()
+    for kind in SUMMARY_KINDS:
+        normalizer = _NORMALIZERS[kind]
+        values = rows[kind].dropna()
+        for value, count in values.astype(str).value_counts(sort=False).items():
+            counts[(kind, value, normalizer(value))] += int(count)
+    counts[("total", "", "")] += len(rows)
+    return counts
+
+
+def _upsert_side_rows(connection: Connection, rows: pd.DataFrame) -> None:
+    if rows.empty:
+        return
+    connection.execute(
+        text(f"INSERT OR REPLACE INTO {SIDE_TABLE} (rowid, province, lithology) VALUES (:rowid, :province, :lithology)"),
+        _normalized_frame(rows).to_dict(orient="records"),
+    )
+
+
+def _apply_counts(connection: Connection, counts: Counter) -> None:
+    payload = [
+        {"kind": kind, "key": key, "normalized": normalized, "count": count}
+        for (kind, key, normalized), count in counts.items()
+        if count
+    ]
+    if not payload:
+        return
+    connection.execute(
+        text(
+            f"INSERT INTO {SUMMARY_TABLE} (kind, key, normalized, count) VALUES (:kind, :key, :normalized, :count) "
+            "ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count"
+        ),
+        payload,
+    )
+
+
+def rebuild_records_summary(connection: Connection) -> None:
+    """全量重建规范化列和汇总表 (导入数据或 VACUUM 后调用)"""
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SIDE_TABLE}")
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SUMMARY_TABLE}")
+    _create_tables(connection)
+    if not _records_columns(connection):
+        return
+    rows = read_summary_rows(connection)
+    _upsert_side_rows(connection, rows)
+    counts = _summary_counts(rows)
+    _apply_counts(connection, counts)
+    print(f"[记录汇总] 全量重建: {len(rows)} 条记录, {len(counts)} 个汇总项")
+
+
+def ensure_records_summary(connection: Connection) -> None:
+    if not has_records_summary(connection):
+        rebuild_records_summary(connection)
+
+
+def apply_records_changes(
+    connection: Connection,
+    before: pd.DataFrame,
+    after_rowids: Iterable[int],
+    deleted_rowids: Iterable[int] = (),
+) -> None:
+    """按一次保存的增删改增量维护 (与 records 写入在同一事务中调用)
+
+    汇总表须在写入前已存在 (先调用 ensure_records_summary), 否则会重复计数。
+
+    Args:
+        before: 写入前读取的被修改/删除记录 (read_summary_rows 的结果)
+        after_rowids: 写入后仍存在且需要重新规范化的记录 (修改和新增)
+        deleted_rowids: 已删除的记录
+    """
+    after = read_summary_rows(connection, sorted(set(int(rowid) for rowid in after_rowids)))
+    deleted = [int(rowid) for rowid in deleted_rowids]
+    for start in range(0, len(deleted), 500):
+        chunk = deleted[start:start + 500]
+        params = {f"r{index}": rowid for index, rowid in enumerate(chunk)}
+        placeholders = ", ".join(f":{key}" for key in params)
+        connection.execute(text(f"DELETE FROM {SIDE_TABLE} WHERE rowid IN ({placeholders})"), params)
+    _upsert_side_rows(connection, after)
+
+    delta = _summary_counts(after)
+    delta.subtract(_summary_counts(before))
+    _apply_counts(connection, delta)
+    connection.exec_driver_sql(f"DELETE FROM {SUMMARY_TABLE} WHERE count <= 0 AND kind != 'total'")
+
+
+# ============================================================================
+# 查询
+# ============================================================================
+
+def read_overview(connection: Connection, limit: int) -> Dict[str, Any]:
+    """概览统计与省份分布 (与原先逐条规范化的结果一致)"""
+    def scalar(sql: str) -> int:
+        return int(connection.exec_driver_sql(sql).scalar() or 0)
+
+    stats = {
+        "records": scalar(f"SELECT count FROM {SUMMARY_TABLE} WHERE kind = 'total'"),
+        "provinces": scalar(
+            f"SELECT count(DISTINCT normalized) FROM {SUMMARY_TABLE} "
+            "WHERE kind = 'province' AND normalized NOT IN ('', '未知')"
+        ),
+        "mines": scalar(f"SELECT count(*) FROM {SUMMARY_TABLE} WHERE kind = 'mine'"),
+        "lithologies": scalar(
+            f"SELECT count(DISTINCT normalized) FROM {SUMMARY_TABLE} WHERE kind = 'lithology' AND normalized != ''"
+        ),
+    }
+    rows = connection.exec_driver_sql(
+        f"SELECT key, normalized, count FROM {SUMMARY_TABLE} WHERE kind = 'province' ORDER BY count DESC LIMIT ?",
+        (limit,),
+    )
+    distribution = [
+        {"name": normalized or "未知", "label": key.strip() or normalized or "未知", "value": int(count)}
+        for key, normalized, count in rows
+    ]
+    return {"stats": stats, "distribution": distribution}
+
+
+def read_lithology_counts(connection: Connection) -> Dict[str, int]:
+    """规范化岩性 -> 记录数, 按记录数降序"""
+    rows = connection.exec_driver_sql(
+        f"SELECT normalized, sum(count) AS total FROM {SUMMARY_TABLE} "
+        "WHERE kind = 'lithology' AND normalized != '' GROUP BY normalized ORDER BY total DESC, normalized"
+    )
+    return {name: int(total) for name, total in rows}
+
+
+def count_province(connection: Connection, province: str) -> int:
+    return int(connection.exec_driver_sql(
+        f"SELECT coalesce(sum(count), 0) FROM {SUMMARY_TABLE} WHERE kind = 'province' AND normalized = ?",
+        (normalize_province_name(province),),
+    ).scalar() or 0)
+
+
+def province_rowid_clause(province: str):
+    """规范化省份等于给定值的 records ROWID 条件"""
+    return text(
+        f"records.ROWID IN (SELECT rowid FROM {SIDE_TABLE} WHERE province = :normalized_province)"
+    ).bindparams(normalized_province=normalize_province_name(province))
+
+
+def lithology_rowid_clause(lithology: str):
+    """规范化岩性等于给定值的 records ROWID 条件 (煤匹配所有含 "煤" 的岩性)"""
+    normalized = normalize_lithology_name(lithology)
+    if normalized == COAL_NORMALIZED_NAME:
+        return text(f"records.ROWID IN (SELECT rowid FROM {SIDE_TABLE} WHERE lithology LIKE '%煤%')")
+    return text(
+        f"records.ROWID IN (SELECT rowid FROM {SIDE_TABLE} WHERE lithology = :normalized_lithology)"
+    ).bindparams(normalized_lithology=normalized)
@@ -1,17 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import io
 import json
-import re
-import tempfile
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import quote
 
 import numpy as np
 import pandas as pd
 from fastapi import Depends, FastAPI, File, HTTPException, UploadFile, Query, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -21,10 +21,52 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sqlalchemy import String, cast, func, or_, select, text
 from sqlalchemy.orm import Session
 
-from coal_seam_blocks.aggregator import aggregate_boreholes, unify_columns
+from coal_seam_blocks.aggregator import aggregate_borehole_sources, parse_borehole_sources, unify_columns
 from api import calculate_key_strata_details, process_single_borehole_file
 from coal_seam_blocks.modeling import build_block_models
-from db import get_engine, get_records_table, get_session, reset_table_cache
+from csv_reader import read_csv
+from dataset_cache import DATASET_FORMAT_VERSION, fingerprint_sources, get_dataset_cache
+from db import get_engine, get_read_engine, get_read_session, get_records_table, get_session, reset_table_cache
+from lithology_stats import (
+    get_lithology_stats,
+    invalidate_lithology_stats_cache,
+    refresh_lithology_stats,
+    stored_properties,
+)
+from property_fill import (
+    COAL_NORMALIZED_NAME,
+    fill_properties,
+    normalize_lithology_name,
+    summarize_fill,
+)
+from records_fts import (
+    FTS_TABLE,
+    count_fts_matches,
+    ensure_records_fts,
+    fts_query,
+    fts_rowid_clause,
+    has_records_fts,
+    text_columns,
+)
+from progress_tracker_ws import tracker as progress_tracker
+from records_import import ImportSkipped, bulk_load_records, create_import_engine
+from fingerprint import fingerprint
+from single_flight import get_single_flight
+from records_summary import (
+    PROVINCE_COLUMN_CANDIDATES,
+    SUMMARY_TABLE,
+    apply_records_changes,
+    count_province,
+    ensure_records_summary,
+    has_records_summary,
+    lithology_rowid_clause,
+    normalize_province_name,
+    province_rowid_clause,
+    read_lithology_counts,
+    read_overview,
+    read_summary_rows,
+    resolve_summary_columns,
+)
 from tunnel_support import TunnelSupportCalculator, batch_calculate_tunnel_support
 from statistical_analysis import (
     analyze_descriptive_stats, analyze_correlation, analyze_regression,
@@ -33,14 +75,32 @@ from statistical_analysis import (
 
 # 性能优化模块
 from performance_config import (
-    MAX_UPLOAD_SIZE_MB, MAX_RESOLUTION, CACHE_ENABLED,
+    MAX_UPLOAD_SIZE_MB, MAX_RESOLUTION, CACHE_ENABLED, DB_EXACT_COUNT_LIMIT, DB_QUERY_CACHE_TTL,
+    DB_STREAM_BATCH_SIZE,
     print_config_summary
 )
-from cache import cached, get_cache_stats, start_cache_cleanup_task, cache_database_query
+from cache import (
+    bump_data_version,
+    cached,
+    get_cache,
+    get_cache_stats,
+    start_cache_cleanup_task,
+    cache_clear_pattern,
+    cache_database_query,
+    data_version_tag,
+)
 from rate_limiter import RateLimitMiddleware, start_rate_limit_cleanup_task
+from admission import admission_control, get_admission_controller
+from memory_estimator import MemoryPlan, plan_request, require_plan
 from memory_utils import (
     optimize_dataframe_memory, check_memory_usage,
-    memory_efficient_operation, clear_dataframe_cache, limit_dataframe_size
+    memory_efficient_operation, limit_dataframe_size
+)
+from project_store import get_project_store
+from coal_seam_blocks.seam_index import SeamIndex
+from workspace import (
+    SessionMiddleware, Workspace, get_workspace, get_workspace_manager,
+    start_workspace_cleanup_task
 )
 
 # 算法优化模块
@@ -57,49 +117,6 @@ CHINA_JSON_CANDIDATES = [
 SEAM_COLUMN_CANDIDATES = ["煤层", "煤层名称", "层位", "岩层", "岩层名称", "煤层名"]
 
 
-class ModelingState:
-    """In-memory storage for the geological modeling workflow."""
-
-    def __init__(self) -> None:
-        self.merged_df: Optional[pd.DataFrame] = None
-        self.coords_df: Optional[pd.DataFrame] = None
-        self.numeric_columns: List[str] = []
-        self.text_columns: List[str] = []
-        self.last_selected_seam_column: Optional[str] = None
-        self.borehole_file_count: int = 0
-        # 新增: 存储最近一次建模的结果
-        self.last_block_models = None
-        self.last_grid_x = None
-        self.last_grid_y = None
-
-    def ensure_loaded(self) -> None:
-        if self.merged_df is None:
-            raise HTTPException(status_code=400, detail="请先上传并合并钻孔与坐标数据")
-    
-    def ensure_models_ready(self):
-        """确保已经生成了块体模型"""
-        if self.last_block_models is None or self.last_grid_x is None or self.last_grid_y is None:
-            raise HTTPException(status_code=400, detail="请先调用 /api/modeling/block_model 生成3D模型")
-
-
-modeling_state = ModelingState()
-
-
-class KeyStratumState:
-    def __init__(self) -> None:
-        self.files: Dict[str, pd.DataFrame] = {}
-        self.filled: bool = False
-        self.last_result: Optional[pd.DataFrame] = None
-
-    def reset(self) -> None:
-        self.files = {}
-        self.filled = False
-        self.last_result = None
-
-
-key_stratum_state = KeyStratumState()
-
-
 def _get_numeric_and_text_columns(df: pd.DataFrame) -> Dict[str, List[str]]:
     numeric_cols: List[str] = []
     text_cols: List[str] = []
@@ -144,12 +161,48 @@ def _serialize_row(row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
     return payload
 
 
-def _build_optional_filters(table, search: Optional[str]):
+def _count_all_records(db_session: Session) -> Tuple[int, bool]:
+    """records 总行数, 返回 (行数, 是否为近似值)
+
+    大表用最大 ROWID 估算 (删除留下的空洞会使其偏大), 避免全表 COUNT(*)。
+    """
+    estimate = int(db_session.execute(text("SELECT max(ROWID) FROM records")).scalar() or 0)
+    if estimate <= DB_EXACT_COUNT_LIMIT:
+        return int(db_session.execute(text("SELECT count(*) FROM records")).scalar() or 0), False
+    return estimate, True
+
+
+def _invalidate_records_cache(*derived_tables: str) -> None:
+    """records (及其派生表) 写入提交后递增数据版本, 依赖这些表的计数和分页游标缓存不再命中"""
+    bump_data_version("records", *derived_tables)
+
+
+def _ensure_records_summary(db_session: Session) -> None:
+    """汇总表缺失时 (旧数据库) 用写连接构建一次"""
+    if not has_records_summary(db_session.connection()):
+        with get_engine().begin() as connection:
+            ensure_records_summary(connection)
+
+
+def _records_fts_query(db_session: Optional[Session], search: Optional[str]) -> Optional[str]:
+    """可以使用全文索引时返回 FTS5 查询串, 否则返回 None (关键字过短或索引不存在)"""
+    if db_session is None:
+        return None
+    query = fts_query(search)
+    if query is None or not has_records_fts(db_session.connection()):
+        return None
+    return query
+
+
+def _build_optional_filters(table, search: Optional[str], db_session: Optional[Session] = None):
     if not search:
         return None
     keyword = search.strip()
     if not keyword:
         return None
+    query = _records_fts_query(db_session, keyword)
+    if query is not None:
+        return fts_rowid_clause(query)
     pattern = f"%{keyword}%"
     conditions = []
     for column in table.columns:
@@ -163,20 +216,6 @@ def _build_optional_filters(table, search: Optional[str]):
     return or_(*conditions)
 
 
-PROVINCE_COLUMN_CANDIDATES = [
-    "省份",
-    "省份名称",
-    "所在省份",
-    "所属省份",
-    "省",
-    "省市",
-    "省份/地区",
-    "省份(地区)",
-    "行政区",
-    "份",
-]
-
-
 DEFAULT_NUMERIC_COLUMNS = [
     "弹性模量/GPa",
     "容重/kN·m-3",
@@ -195,49 +234,8 @@ def _resolve_column(column_map: Dict[str, Any], candidates: List[str]):
     return None, None
 
 
-def _normalize_province_name(name: str) -> str:
-    if name is None:
-        return ""
-    value = str(name).strip()
-    if not value:
-        return ""
-
-    replacements = {
-        "内蒙古自治区": "内蒙古",
-        "广西壮族自治区": "广西",
-        "宁夏回族自治区": "宁夏",
-        "新疆维吾尔自治区": "新疆",
-        "西藏自治区": "西藏",
-        "香港特别行政区": "香港",
-        "澳门特别行政区": "澳门",
-        "黑龙江省": "黑龙江",
-    }
-    if value in replacements:
-        return replacements[value]
-
-    suffixes = ["省", "市", "地区", "自治区", "特别行政区"]
-    for suffix in suffixes:
-        if value.endswith(suffix):
-            value = value[: -len(suffix)]
-            break
-    return value.strip()
-
-
-COAL_ALIASES = {"煤"}
-COAL_NORMALIZED_NAME = "煤"
-
-
-def _normalize_lithology_name(name: str) -> str:
-    if name is None:
-        return ""
-    value = str(name).strip()
-    if not value:
-        return ""
-    candidate = value.replace("煤层", COAL_NORMALIZED_NAME)
-    simplified = re.sub(r"[0-9０-９一二三四五六七八九十百千万点·\-_/\\（）()\s]+", "", candidate)
-    if simplified in COAL_ALIASES:
-        return COAL_NORMALIZED_NAME
-    return value
+_normalize_province_name = normalize_province_name
+_normalize_lithology_name = normalize_lithology_name
 
 
 def _infer_numeric_columns(
@@ -285,15 +283,10 @@ def _load_china_geojson() -> Dict:
 
 
 def _read_csv_bytes(data: bytes) -> pd.DataFrame:
-    encodings = ["utf-8-sig", "utf-8", "gbk"]
-    last_error: Optional[Exception] = None
-    for enc in encodings:
-        try:
-            return pd.read_csv(io.BytesIO(data), encoding=enc)
-        except Exception as exc:
-            last_error = exc
-            continue
-    raise HTTPException(status_code=400, detail=f"CSV读取失败: {last_error}")
+    try:
+        return read_csv(data)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"CSV读取失败: {exc}")
 
 
 def _ensure_seam_column(df: pd.DataFrame) -> pd.DataFrame:
@@ -318,26 +311,10 @@ def _prepare_preview(dfs: Dict[str, pd.DataFrame], limit: int = 200) -> Dict[str
     return {"columns": columns, "rows": rows}
 
 
-def _fill_from_database(df: pd.DataFrame, stats_map: pd.DataFrame) -> pd.DataFrame:
-    if stats_map.empty:
-        return df
-    df = df.copy()
-    lithology_series = df.get("岩层名称")
-    if lithology_series is None:
-        return df
-    numeric_cols = DEFAULT_NUMERIC_COLUMNS
-    for idx, lith in lithology_series.items():
-        key = str(lith).strip()
-        if not key or key not in stats_map.index:
-            continue
-        stats_row = stats_map.loc[key]
-        for col in numeric_cols:
-            if col not in df.columns or col not in stats_row:
-                continue
-            current_value = df.at[idx, col]
-            if pd.isna(current_value) or (isinstance(current_value, (int, float)) and float(current_value) == 0.0):
-                df.at[idx, col] = stats_row[col]
-    return df
+def _fill_from_database(df: pd.DataFrame, stats_map: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """按岩层名称用数据库统计值填充缺失参数, 返回 (填充结果, 填充报告)"""
+    filled, mask = fill_properties(df, stats_map, "岩层名称", DEFAULT_NUMERIC_COLUMNS)
+    return filled, summarize_fill(mask)
 
 
 def _normalize_key_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -410,6 +387,12 @@ class ZSectionRequest(BaseModel):
     # 注意: 需要先调用 block_model API 生成模型,结果存储在 modeling_state 中
 
 
+class ProjectSaveRequest(BaseModel):
+    """保存项目请求"""
+    name: str
+    project_id: Optional[str] = None  # 指定时覆盖已有项目
+
+
 app = FastAPI(title="Mining System API", version="0.1.0")
 
 # CORS中间件
@@ -419,12 +402,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition", "X-Memory-Plan"],
 )
 
 # 性能优化: 请求限流中间件
 rate_limit_middleware = RateLimitMiddleware(app, rate_per_minute=60)
 app.add_middleware(RateLimitMiddleware, rate_per_minute=60)
 
+# 会话工作区: 为每个客户端分配会话令牌, 隔离建模状态
+app.add_middleware(SessionMiddleware)
+
 
 # 启动事件: 初始化性能优化组件
 @app.on_event("startup")
@@ -443,6 +430,9 @@ async def startup_event():
     # 启动限流清理任务
     start_rate_limit_cleanup_task(rate_limit_middleware)
 
+    # 启动会话工作区清理任务
+    start_workspace_cleanup_task()
+
     # 显示内存状态
     mem_usage = check_memory_usage()
     if "error" not in mem_usage:
@@ -490,6 +480,10 @@ async def check_and_init_database():
                 await auto_import_csv()
             else:
                 print(f"✓ 数据库已加载 ({count} 条记录)")
+        if count:
+            with engine.begin() as conn:
+                ensure_records_fts(conn)
+                ensure_records_summary(conn)
                 
     except Exception as e:
         print(f"⚠️  数据库检查失败: {e}")
@@ -498,7 +492,7 @@ async def check_and_init_database():
 
 
 async def auto_import_csv():
-    """自动导入 CSV 数据到数据库"""
+    """自动导入 CSV 数据到数据库 (后台执行, 进度见 /api/database/import-status)"""
     try:
         csv_path = APP_ROOT / "data" / "input" / "汇总表.csv"
         
@@ -520,225 +514,251 @@ async def auto_import_csv():
                 return
         
         print(f"📂 找到 CSV 文件: {csv_path}")
-        print("📊 开始导入数据...")
-        
-        # 读取 CSV
-        df = pd.read_csv(csv_path, encoding='utf-8-sig')
-        print(f"   读取 {len(df)} 条记录")
-        print(f"   列名: {list(df.columns)}")
-        
-        # 导入到数据库
-        from sqlalchemy import create_engine
-        from db import DB_PATH
-        
-        # 确保目录存在
+        start_records_import(csv_path)
+
+    except Exception as e:
+        print(f"❌ 数据库初始化失败: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+RECORDS_IMPORT_TASK_ID = "records_import"
+_records_import_task: Optional[asyncio.Task] = None
+
+
+def _run_records_import(csv_path: Path) -> None:
+    from db import DB_PATH
+
+    task = progress_tracker.create_task(RECORDS_IMPORT_TASK_ID, "导入岩石数据库", total_steps=100)
+    task.start()
+
+    def report(done_bytes: int, total_bytes: int, message: str) -> None:
+        # 读取阶段占 90%, 剩余为替换数据表和构建索引
+        task.update(int(90 * done_bytes / max(total_bytes, 1)), message)
+
+    try:
         DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        
-        # 创建引擎并导入
-        engine = create_engine(f'sqlite:///{DB_PATH}')
-        df.to_sql('records', engine, if_exists='replace', index=False)
-        
-        print(f"✅ 数据库初始化完成！导入 {len(df)} 条记录到 {DB_PATH}")
-        
-        # 创建索引（尝试多个可能的列名）
+        engine = create_import_engine(DB_PATH)
         try:
-            with engine.connect() as conn:
-                # 获取实际的列名
-                actual_columns = df.columns.tolist()
-                
-                # 为常见列创建索引
-                province_cols = ['省份', 'Province', 'province', '省', 'sheng']
-                mine_cols = ['矿名', 'Mine', 'mine', '矿', 'kuang']
-                lithology_cols = ['岩性', 'Lithology', 'lithology', '岩', 'yan']
-                
-                for col_list, idx_name in [
-                    (province_cols, 'idx_province'),
-                    (mine_cols, 'idx_mine'),
-                    (lithology_cols, 'idx_lithology')
-                ]:
-                    for col in col_list:
-                        if col in actual_columns:
-                            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {idx_name} ON records ("{col}")'))
-                            print(f"   创建索引: {idx_name} on {col}")
-                            break
-                
-                conn.commit()
-        except Exception as idx_err:
-            print(f"⚠️  创建索引失败（不影响使用）: {idx_err}")
-        
-        # 重置表缓存
+            # 仅在 records 为空时导入; 其他工作进程已在导入或刚导入完成时跳过
+            rows = bulk_load_records(engine, csv_path, progress=report, replace=False)
+        finally:
+            engine.dispose()
+    except ImportSkipped as exc:
         reset_table_cache()
-        
-    except Exception as e:
-        print(f"❌ 数据库初始化失败: {e}")
+        task.complete({"skipped": str(exc)})
+        print(f"[数据导入] 跳过: {exc}")
+        return
+    except Exception as exc:
+        task.fail(str(exc))
+        print(f"❌ 数据库导入失败: {exc}")
         import traceback
         traceback.print_exc()
+        return
+
+    # 表结构可能变化, 重置反射缓存; 所有表的数据版本递增, 旧的数据库查询缓存全部回收
+    reset_table_cache()
+    invalidate_lithology_stats_cache()
+    _invalidate_records_cache(FTS_TABLE, SUMMARY_TABLE)
+    cache_clear_pattern("db:")
+    task.complete({"rows": rows})
+    print(f"✅ 数据库初始化完成！导入 {rows} 条记录到 {DB_PATH}")
+
+
+def start_records_import(csv_path: Path) -> None:
+    """在后台线程中导入 CSV, 启动流程和接口不等待导入完成"""
+    global _records_import_task
+    if _records_import_task is not None and not _records_import_task.done():
+        print("[数据导入] 已有导入任务在运行, 跳过")
+        return
+    print("📊 开始后台导入数据...")
+    _records_import_task = asyncio.create_task(asyncio.to_thread(_run_records_import, csv_path))
+
+
+@app.get("/api/database/import-status")
+async def get_records_import_status():
+    """后台导入进度"""
+    task = progress_tracker.get_task(RECORDS_IMPORT_TASK_ID)
+    if task is None:
+        return {"status": "idle"}
+    return task.to_dict()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时的清理"""
     print("\n[系统] 正在关闭，清理资源...")
-    clear_dataframe_cache([modeling_state, key_stratum_state])
+    get_workspace_manager().clear()
     print("[系统] 资源清理完成\n")
 
 
+def _upload_size(upload: UploadFile) -> int:
+    """上传文件大小 (字节), 不读取内容"""
+    if upload.size is not None:
+        return upload.size
+    position = upload.file.tell()
+    upload.file.seek(0, 2)
+    size = upload.file.tell()
+    upload.file.seek(position)
+    return size
+
+
 @app.post("/api/modeling/columns")
 async def load_modeling_columns(
     borehole_files: List[UploadFile] = File(..., description="多个钻孔CSV"),
     coords_file: UploadFile = File(None, description="坐标CSV（可选，若数据已包含坐标）"),
     use_merged_data: bool = Form(False, description="是否使用已合并的数据"),
+    workspace: Workspace = Depends(get_workspace),
 ):
+    modeling_state = workspace.modeling
     if not borehole_files:
         raise HTTPException(status_code=400, detail="请至少上传一个钻孔文件")
 
     try:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir)
-            borehole_paths: List[str] = []
-            
-            # 保存钻孔文件
-            for idx, file in enumerate(borehole_files):
-                try:
-                    data = await file.read()
-                    if not data:
-                        raise ValueError(f"文件 {file.filename} 为空")
-                    
-                    # 使用索引避免文件名冲突
-                    filename = file.filename or f"borehole_{idx}.csv"
-                    target = tmp_path / filename
-                    target.write_bytes(data)
-                    borehole_paths.append(str(target))
-                    print(f"[DEBUG] 保存钻孔文件: {filename}, 大小: {len(data)} bytes")
-                except Exception as e:
-                    print(f"[ERROR] 保存钻孔文件失败: {file.filename}, 错误: {e}")
-                    raise HTTPException(status_code=400, detail=f"保存钻孔文件失败: {file.filename} - {str(e)}")
+        # 直接从上传流 (SpooledTemporaryFile) 解析, 不落地临时文件, 每个文件只解析一次
+        borehole_sources = []
+        for idx, file in enumerate(borehole_files):
+            filename = file.filename or f"borehole_{idx}.csv"
+            if _upload_size(file) == 0:
+                raise HTTPException(status_code=400, detail=f"文件 {filename} 为空")
+            borehole_sources.append((filename, file.file))
+            print(f"[DEBUG] 接收钻孔文件: {filename}, 大小: {_upload_size(file)} bytes")
+
+        if not use_merged_data and not coords_file:
+            raise HTTPException(status_code=400, detail="未使用已合并数据时，必须提供坐标文件")
+
+        def load_dataset():
+            """指纹计算、缓存查找、解析合并与写缓存都在线程池中执行, 不阻塞事件循环"""
+            join_stats: Optional[Dict[str, Any]] = None
+            # 按上传内容指纹查找已解析的数据集, 重复上传同一批文件时跳过解析与合并
+            dataset_cache = get_dataset_cache()
+            cache_key: Optional[str] = None
+            cached_dataset = None
+            if dataset_cache is not None:
+                fingerprint_inputs = list(borehole_sources)
+                if not use_merged_data:
+                    fingerprint_inputs.append(("coords:" + (coords_file.filename or ""), coords_file.file))
+                cache_key = fingerprint_sources(
+                    fingerprint_inputs, DATASET_FORMAT_VERSION, "merged" if use_merged_data else "traditional"
+                )
+                cached_dataset = dataset_cache.get(cache_key)
 
             # 根据是否使用已合并数据决定处理方式
-            if use_merged_data:
+            if cached_dataset is not None:
+                merged_df, coords_df, cached_meta = cached_dataset
+                join_stats = cached_meta.get("join_stats")
+                print(f"[DEBUG] 命中数据集缓存 {cache_key[:12]}，记录数: {len(merged_df)}")
+
+            elif use_merged_data:
                 # 全局数据模式：数据已包含坐标信息和钻孔名，直接加载即可
                 print(f"[DEBUG] ========== 全局数据模式 ==========")
-                
-                # 加载所有钻孔文件并合并
-                from coal_seam_blocks.aggregator import load_borehole_csv, unify_columns
-                merged_frames = []
-                for file_path in borehole_paths:
-                    df = load_borehole_csv(file_path)
-                    df = unify_columns(df)
-                    merged_frames.append(df)
-                
+            
+                try:
+                    merged_frames = parse_borehole_sources(borehole_sources, insert_borehole_name=False)
+                except Exception as e:
+                    print(f"[ERROR] 解析钻孔文件失败: {e}")
+                    raise HTTPException(status_code=400, detail=f"解析钻孔文件失败: {str(e)}")
+            
                 merged_df = pd.concat(merged_frames, ignore_index=True)
                 print(f"[DEBUG] 全局数据加载成功，记录数: {len(merged_df)}")
                 print(f"[DEBUG] 数据列: {list(merged_df.columns)}")
-                
+            
                 # 检查钻孔名分布
                 if "钻孔名" in merged_df.columns:
                     unique_boreholes = merged_df["钻孔名"].nunique()
                     print(f"[DEBUG] 包含 {unique_boreholes} 个不同的钻孔")
                     sample_boreholes = merged_df["钻孔名"].unique()[:5].tolist()
                     print(f"[DEBUG] 钻孔名样本: {sample_boreholes}")
-                
+            
                 # 验证数据中是否包含坐标列
                 coord_candidates = ['X', 'x', 'X坐标', 'x坐标', 'Y', 'y', 'Y坐标', 'y坐标']
                 found_coords = [col for col in merged_df.columns if any(cand in col for cand in coord_candidates)]
-                
+            
                 if len(found_coords) < 2:
                     raise HTTPException(
                         status_code=400, 
                         detail=f"数据中未找到足够的坐标列。找到: {found_coords}，需要至少2个坐标列（X和Y）"
                     )
-                
+            
                 coords_df = None  # 已合并数据不需要单独的坐标文件
-                
+            
             else:
                 # 传统模式：需要坐标文件进行合并
-                if not coords_file:
-                    raise HTTPException(status_code=400, detail="未使用已合并数据时，必须提供坐标文件")
-                
-                # 保存坐标文件
-                try:
-                    coords_data = await coords_file.read()
-                    if not coords_data:
-                        raise ValueError("坐标文件为空")
-                    coords_path = tmp_path / (coords_file.filename or "coordinates.csv")
-                    coords_path.write_bytes(coords_data)
-                    print(f"[DEBUG] 保存坐标文件: {coords_file.filename}, 大小: {len(coords_data)} bytes")
-                except Exception as e:
-                    print(f"[ERROR] 保存坐标文件失败: {e}")
-                    raise HTTPException(status_code=400, detail=f"保存坐标文件失败: {str(e)}")
+                coords_name = coords_file.filename or "coordinates.csv"
+                if _upload_size(coords_file) == 0:
+                    raise HTTPException(status_code=400, detail="保存坐标文件失败: 坐标文件为空")
 
                 # 聚合数据
                 try:
-                    print(f"[DEBUG] 开始聚合数据（传统模式），钻孔文件数: {len(borehole_paths)}")
-                    
-                    # 先加载钻孔数据统计
-                    from coal_seam_blocks.aggregator import load_borehole_csv, unify_columns
-                    total_borehole_records = 0
-                    for path in borehole_paths:
-                        df_temp = load_borehole_csv(path)
-                        total_borehole_records += len(df_temp)
-                    print(f"[DEBUG] 钻孔文件总记录数: {total_borehole_records}")
-                    
-                    # 加载坐标文件统计
-                    coords_temp = load_borehole_csv(str(coords_path))
-                    print(f"[DEBUG] 坐标文件记录数: {len(coords_temp)}")
-                    print(f"[DEBUG] 坐标文件列: {list(coords_temp.columns)}")
-                    
-                    # 执行聚合
-                    merged_df, coords_df = aggregate_boreholes(borehole_paths, str(coords_path))
+                    print(f"[DEBUG] 开始聚合数据（传统模式），钻孔文件数: {len(borehole_sources)}")
+                    merged_df, coords_df, join_stats = aggregate_borehole_sources(
+                        borehole_sources, (coords_name, coords_file.file)
+                    )
+                    print(f"[DEBUG] 钻孔文件总记录数: {join_stats['borehole_records']}")
+                    print(f"[DEBUG] 坐标文件记录数: {join_stats['coordinate_records']}")
+                    print(f"[DEBUG] 坐标文件列: {list(coords_df.columns)}")
                     print(f"[DEBUG] 数据聚合成功，合并后记录数: {len(merged_df)}")
-                    
-                    # 计算数据损失
-                    if total_borehole_records > len(merged_df):
-                        lost_records = total_borehole_records - len(merged_df)
-                        loss_percent = (lost_records / total_borehole_records) * 100
+                
+                    # 数据损失 (同一次解析中统计)
+                    lost_records = join_stats["lost_records"]
+                    if lost_records > 0:
+                        loss_percent = (lost_records / join_stats["borehole_records"]) * 100
                         print(f"[WARNING] inner join 导致数据丢失: {lost_records} 条 ({loss_percent:.1f}%)")
-                        print(f"[WARNING] 这可能是因为钻孔文件和坐标文件的钻孔名不匹配")
-                    
+                        print(f"[WARNING] 未匹配的钻孔: {join_stats['unmatched_boreholes'][:10]}")
+                
                 except Exception as e:
                     print(f"[ERROR] 数据聚合失败: {e}")
                     raise HTTPException(status_code=400, detail=f"数据聚合失败: {str(e)}")
 
-        # 数据一致性验证和统计
-        print(f"[DEBUG] ========== 数据加载摘要 ==========")
-        print(f"[DEBUG] 数据模式: {'全局数据（已合并）' if use_merged_data else '上传文件（需合并）'}")
-        print(f"[DEBUG] 最终记录数: {len(merged_df)}")
-        print(f"[DEBUG] 最终列数: {len(merged_df.columns)}")
-        
-        # 检查关键列
-        required_cols = ["钻孔名"]
-        missing_cols = [col for col in required_cols if col not in merged_df.columns]
-        if missing_cols:
-            print(f"[WARNING] 数据缺少关键列: {missing_cols}")
-        
-        # 检查钻孔分布（用于对比两种模式）
-        if "钻孔名" in merged_df.columns:
-            unique_boreholes = merged_df["钻孔名"].nunique()
-            print(f"[DEBUG] 最终数据包含 {unique_boreholes} 个不同的钻孔")
-        
-        modeling_state.merged_df = merged_df
-        modeling_state.coords_df = coords_df
-        modeling_state.borehole_file_count = len(borehole_files)
-        columns_info = _get_numeric_and_text_columns(merged_df)
-        modeling_state.numeric_columns = columns_info["numeric"]
-        modeling_state.text_columns = columns_info["text"]
-        
-        print(f"[DEBUG] 数值列 ({len(modeling_state.numeric_columns)}): {modeling_state.numeric_columns[:5]}...")
-        print(f"[DEBUG] 文本列 ({len(modeling_state.text_columns)}): {modeling_state.text_columns[:5]}...")
-        print(f"[DEBUG] ====================================")
-        
-        # 如果缺少关键列，给出警告但不阻止
-        if missing_cols:
-            print(f"[WARNING] 数据结构可能不完整，建模结果可能受影响")
-        
-        # 输出数据样本
-        if len(merged_df) > 0:
-            sample_cols = ['钻孔名'] + [col for col in merged_df.columns if 'X' in col or 'x' in col or 'Y' in col or 'y' in col][:4]
-            sample_cols = [col for col in sample_cols if col in merged_df.columns]
-            if sample_cols:
-                print(f"[DEBUG] 数据样本 (前3行):")
-                print(merged_df[sample_cols].head(3).to_string())
-        print(f"[DEBUG] ====================================")
+            # 数据一致性验证和统计
+            print(f"[DEBUG] ========== 数据加载摘要 ==========")
+            print(f"[DEBUG] 数据模式: {'全局数据（已合并）' if use_merged_data else '上传文件（需合并）'}")
+            print(f"[DEBUG] 最终记录数: {len(merged_df)}")
+            print(f"[DEBUG] 最终列数: {len(merged_df.columns)}")
+        
+            # 检查关键列
+            required_cols = ["钻孔名"]
+            missing_cols = [col for col in required_cols if col not in merged_df.columns]
+            if missing_cols:
+                print(f"[WARNING] 数据缺少关键列: {missing_cols}")
+        
+            # 检查钻孔分布（用于对比两种模式）
+            if "钻孔名" in merged_df.columns:
+                unique_boreholes = merged_df["钻孔名"].nunique()
+                print(f"[DEBUG] 最终数据包含 {unique_boreholes} 个不同的钻孔")
+        
+            modeling_state.set_dataset(merged_df, coords_df, cache_key)
+            modeling_state.borehole_file_count = len(borehole_files)
+            if cached_dataset is not None:
+                columns_info = cached_dataset[2]["columns"]
+            else:
+                columns_info = _get_numeric_and_text_columns(merged_df)
+                if dataset_cache is not None:
+                    dataset_cache.put(cache_key, merged_df, coords_df, {"columns": columns_info, "join_stats": join_stats})
+            modeling_state.numeric_columns = columns_info["numeric"]
+            modeling_state.text_columns = columns_info["text"]
+            modeling_state.build_seam_indexes(modeling_state.text_columns)
+        
+            print(f"[DEBUG] 数值列 ({len(modeling_state.numeric_columns)}): {modeling_state.numeric_columns[:5]}...")
+            print(f"[DEBUG] 文本列 ({len(modeling_state.text_columns)}): {modeling_state.text_columns[:5]}...")
+            print(f"[DEBUG] ====================================")
+        
+            # 如果缺少关键列，给出警告但不阻止
+            if missing_cols:
+                print(f"[WARNING] 数据结构可能不完整，建模结果可能受影响")
+        
+            # 输出数据样本
+            if len(merged_df) > 0:
+                sample_cols = ['钻孔名'] + [col for col in merged_df.columns if 'X' in col or 'x' in col or 'Y' in col or 'y' in col][:4]
+                sample_cols = [col for col in sample_cols if col in merged_df.columns]
+                if sample_cols:
+                    print(f"[DEBUG] 数据样本 (前3行):")
+                    print(merged_df[sample_cols].head(3).to_string())
+            print(f"[DEBUG] ====================================")
+
+            return merged_df, join_stats
+
+        merged_df, join_stats = await run_in_threadpool(load_dataset)
 
         return {
             "status": "success",
@@ -746,6 +766,7 @@ async def load_modeling_columns(
             "text_columns": modeling_state.text_columns,
             "record_count": int(len(merged_df)),
             "data_mode": "merged" if use_merged_data else "traditional",
+            "join_stats": join_stats,
         }
     except HTTPException:
         raise
@@ -757,74 +778,49 @@ async def load_modeling_columns(
 
 
 @app.get("/api/modeling/seams")
-async def get_unique_seams(column: str = Query(..., description="岩层列名")):
+async def get_unique_seams(
+    column: str = Query(..., description="岩层列名"),
+    workspace: Workspace = Depends(get_workspace),
+):
+    modeling_state = workspace.modeling
     modeling_state.ensure_loaded()
     if column not in modeling_state.merged_df.columns:
         raise HTTPException(status_code=404, detail=f"在合并数据中未找到列: {column}")
     
-    df = modeling_state.merged_df
-    
-    # 检查是否有序号列（用于确定地层顺序）
-    sequence_col = None
-    for possible_col in ['序号', '序号(从下到上)', '层序', '编号', 'sequence', 'order']:
-        if possible_col in df.columns:
-            sequence_col = possible_col
-            break
-    
-    # 获取唯一的岩层名称
-    values = (
-        df[column]
-        .dropna()
-        .astype(str)
-        .map(str.strip)
-        .replace({"nan": ""})
-    )
-    unique_values = [v for v in values.unique() if v]
-    
-    # 如果有序号列，按序号排序（从小到大，即从下到上）
-    if sequence_col:
-        try:
-            # 为每个岩层找到最小的序号（代表该岩层最底部的位置）
-            seam_order = {}
-            for seam in unique_values:
-                seam_data = df[df[column].astype(str).str.strip() == seam]
-                if not seam_data.empty and sequence_col in seam_data.columns:
-                    # 使用最小序号（最底层）作为该岩层的排序依据
-                    min_seq = pd.to_numeric(seam_data[sequence_col], errors='coerce').min()
-                    if pd.notna(min_seq):
-                        seam_order[seam] = min_seq
-            
-            # 按序号排序
-            if seam_order:
-                unique_values = sorted(unique_values, key=lambda x: seam_order.get(x, float('inf')))
-                print(f"[DEBUG] 按序号列'{sequence_col}'排序岩层: {unique_values}")
-            else:
-                # 如果无法提取有效序号，回退到字母排序
-                unique_values = sorted(unique_values)
-                print(f"[DEBUG] 序号列'{sequence_col}'无有效数据，使用字母排序")
-        except Exception as e:
-            print(f"[WARNING] 按序号排序失败: {e}，使用字母排序")
-            unique_values = sorted(unique_values)
+    # 分组索引记录了每个岩层的最小序号（代表该岩层最底部的位置）
+    seam_index = modeling_state.get_seam_index(column)
+    unique_values = seam_index.ordered_values()
+    if seam_index.sequence_column:
+        print(f"[DEBUG] 按序号列'{seam_index.sequence_column}'排序岩层: {unique_values}")
     else:
-        # 没有序号列，使用字母排序
-        unique_values = sorted(unique_values)
         print(f"[DEBUG] 未找到序号列，使用字母排序: {unique_values}")
     
     modeling_state.last_selected_seam_column = column
     return {"status": "success", "values": unique_values}
 
 
-def _filter_dataframe_by_seams(df: pd.DataFrame, seams: Optional[List[str]], seam_column: Optional[str]) -> pd.DataFrame:
+def _filter_dataframe_by_seams(
+    df: pd.DataFrame,
+    seams: Optional[List[str]],
+    seam_column: Optional[str],
+    seam_index: Optional[SeamIndex] = None,
+) -> pd.DataFrame:
     if not seams or not seam_column or seam_column not in df.columns:
         return df
-    seam_set = {str(s) for s in seams}
-    return df[df[seam_column].astype(str).isin(seam_set)]
+    if seam_index is None or len(seam_index) != len(df):
+        seam_index = SeamIndex.build(df, seam_column)
+    return df.iloc[seam_index.rows_for(seams)]
 
 
 @app.post("/api/modeling/contour")
-async def generate_contour(data: ContourRequest):
+async def generate_contour(
+    data: ContourRequest,
+    workspace: Workspace = Depends(get_workspace),
+    _admission: Any = Depends(admission_control("contour")),
+):
+    modeling_state = workspace.modeling
     modeling_state.ensure_loaded()
-    df = modeling_state.merged_df.copy()
+    df = modeling_state.merged_df
     
     print(f"[CONTOUR] ========== 等值线生成开始 ==========")
     print(f"[CONTOUR] 原始数据: {len(df)} 条记录")
@@ -832,7 +828,8 @@ async def generate_contour(data: ContourRequest):
     print(f"[CONTOUR] 岩层过滤: {data.seams}")
 
     seam_col = modeling_state.last_selected_seam_column
-    df = _filter_dataframe_by_seams(df, data.seams, seam_col)
+    if data.seams and seam_col in df.columns:
+        df = _filter_dataframe_by_seams(df, data.seams, seam_col, modeling_state.get_seam_index(seam_col))
     print(f"[CONTOUR] 过滤后数据: {len(df)} 条记录")
 
     if df.empty:
@@ -868,23 +865,34 @@ async def generate_contour(data: ContourRequest):
 
     # 分辨率限制: 最小30,最大300,默认150
     resolution = max(min(int(data.resolution or 150), 300), 30)
+    # 等值线网格直接转为 JSON, 不使用 float32; 内存不足时降为局部方法或降低分辨率
+    plan = require_plan(
+        plan_request(valid_length, data.method, resolution, exporter="contour", allow_float32=False),
+        "等值线生成",
+    )
+    resolution = plan.resolution
     xi = np.linspace(x.min(), x.max(), resolution)
     yi = np.linspace(y.min(), y.max(), resolution)
-    XI, YI = np.meshgrid(xi, yi)
-    
-    # 使用增强的插值模块
-    try:
-        from interpolation import interpolate
-        method = data.method.lower()
-        zi = interpolate(x.values, y.values, z.values, XI, YI, method)
-    except Exception as e:
-        print(f"[WARNING] 插值失败: {e}, 使用线性插值")
+
+    def compute_grid():
+        XI, YI = np.meshgrid(xi, yi)
+
+        # 使用增强的插值模块
         try:
-            zi = griddata((x, y), z, (XI, YI), method="linear")
-        except Exception:
-            zi = griddata((x, y), z, (XI, YI), method="nearest")
+            from interpolation import interpolate
+            method = plan.method
+            zi = interpolate(x.values, y.values, z.values, XI, YI, method)
+        except Exception as e:
+            print(f"[WARNING] 插值失败: {e}, 使用线性插值")
+            try:
+                zi = griddata((x, y), z, (XI, YI), method="linear")
+            except Exception:
+                zi = griddata((x, y), z, (XI, YI), method="nearest")
+
+        return np.nan_to_num(zi, nan=float(np.nanmean(z)))
 
-    zi = np.nan_to_num(zi, nan=float(np.nanmean(z)))
+    # 插值在线程池中执行, 不阻塞事件循环
+    zi = await run_in_threadpool(compute_grid)
 
     return {
         "status": "success",
@@ -898,11 +906,17 @@ async def generate_contour(data: ContourRequest):
             "y": y.tolist(),
             "z": z.tolist(),
         },
+        "memory_plan": plan.to_dict(),
     }
 
 
 @app.post("/api/modeling/block_model")
-async def generate_block_model(payload: BlockModelRequest):
+async def generate_block_model(
+    payload: BlockModelRequest,
+    workspace: Workspace = Depends(get_workspace),
+    _admission: Any = Depends(admission_control("block_model")),
+):
+    modeling_state = workspace.modeling
     modeling_state.ensure_loaded()
     df = modeling_state.merged_df
     
@@ -924,16 +938,29 @@ async def generate_block_model(payload: BlockModelRequest):
             raise HTTPException(status_code=404, detail=f"数据集中缺少列: {col}")
     
     # 输出每个选择岩层的数据点数
+    seam_index = modeling_state.get_seam_index(payload.seam_col)
+    seam_counts = seam_index.counts()
     for seam in payload.selected_seams:
-        seam_data = df[df[payload.seam_col].astype(str) == str(seam)]
-        print(f"[3D_MODEL] 岩层 '{seam}': {len(seam_data)} 条记录")
+        print(f"[3D_MODEL] 岩层 '{seam}': {seam_counts.get(str(seam).strip(), 0)} 条记录")
+
+    # 分配网格前按数据点数 / 方法 / 分辨率 / 岩层数预估峰值内存
+    plan = require_plan(
+        plan_request(
+            max((seam_counts.get(str(seam).strip(), 0) for seam in payload.selected_seams), default=0),
+            payload.method,
+            int(payload.resolution or 150),
+            layers=len(payload.selected_seams),
+            exporter="block_model",
+        ),
+        "三维建模",
+    )
 
     def interpolation_wrapper(x, y, z, xi_flat, yi_flat):
         """智能插值包装函数,使用增强的interpolation模块"""
         from interpolation import interpolate
         
         num_points = len(x)
-        original_method = payload.method.lower()
+        original_method = plan.method
         method_key = original_method
         
         print(f"[INTERP] 🔧 插值调用: 数据点={num_points}, 请求方法={original_method}")
@@ -995,86 +1022,99 @@ async def generate_block_model(payload: BlockModelRequest):
                 # 返回零数组作为最后的回退
                 return np.zeros_like(xi_flat)
 
-    try:
-        block_models, skipped, (XI, YI) = build_block_models(
-            merged_df=df,
-            seam_column=payload.seam_col,
-            x_col=payload.x_col,
-            y_col=payload.y_col,
-            thickness_col=payload.thickness_col,
-            selected_seams=payload.selected_seams,
-            method_callable=interpolation_wrapper,
-            resolution=int(payload.resolution or 150),
-            base_level=float(payload.base_level or 0.0),
-            gap_value=float(payload.gap or 0.0),
-        )
-        
-        # 保存建模结果到 modeling_state (用于后续 z 剖面提取)
-        modeling_state.last_block_models = block_models
-        modeling_state.last_grid_x = XI[0, :].flatten()  # 提取一维 x 坐标
-        modeling_state.last_grid_y = YI[:, 0].flatten()  # 提取一维 y 坐标
-        
-        print(f"[DEBUG] 块体建模完成: 成功 {len(block_models)} 个, 跳过 {len(skipped)} 个")
-        print(f"[DEBUG] 网格尺寸: XI.shape={XI.shape}, YI.shape={YI.shape}")
-        if skipped:
-            print(f"[DEBUG] 跳过的岩层: {skipped}")
-    except Exception as exc:
-        print(f"[ERROR] 块体建模失败: {exc}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=400, detail=str(exc))
+    def build_models():
+        """插值建模并转换为前端数据 (并发的相同请求共享同一次计算)"""
+        try:
+            block_models, skipped, (XI, YI) = build_block_models(
+                merged_df=df,
+                seam_column=payload.seam_col,
+                x_col=payload.x_col,
+                y_col=payload.y_col,
+                thickness_col=payload.thickness_col,
+                selected_seams=payload.selected_seams,
+                method_callable=interpolation_wrapper,
+                resolution=plan.resolution,
+                base_level=float(payload.base_level or 0.0),
+                gap_value=float(payload.gap or 0.0),
+                seam_index=seam_index,
+                dtype=plan.numpy_dtype,
+            )
 
-    models_payload = []
-    print(f"[DEBUG] 准备转换 {len(block_models)} 个模型数据...")
-    print(f"[DEBUG] 网格维度: {XI.shape[0]} x {XI.shape[1]} = {XI.shape[0] * XI.shape[1]} 个点")
+            print(f"[DEBUG] 块体建模完成: 成功 {len(block_models)} 个, 跳过 {len(skipped)} 个")
+            print(f"[DEBUG] 网格尺寸: XI.shape={XI.shape}, YI.shape={YI.shape}")
+            if skipped:
+                print(f"[DEBUG] 跳过的岩层: {skipped}")
+        except Exception as exc:
+            print(f"[ERROR] 块体建模失败: {exc}")
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        models_payload = []
+        print(f"[DEBUG] 准备转换 {len(block_models)} 个模型数据...")
+        print(f"[DEBUG] 网格维度: {XI.shape[0]} x {XI.shape[1]} = {XI.shape[0] * XI.shape[1]} 个点")
     
-    for model in block_models:
-        # 方案1: 使用二维数组格式 (parametric surface)
-        # echarts-gl 的 surface 可以接受 data: { type: 'xyz', value: [x_arr, y_arr, z_arr] }
-        # 或者 data: [[x,y,z], ...] 格式
-        
-        # 提取网格的 x, y 坐标(只需要一次)
-        x_grid = XI[0, :].tolist()  # X 坐标数组 (第一行)
-        y_grid = YI[:, 0].tolist()  # Y 坐标数组 (第一列)
-        
-        # Z 值以二维数组形式提供
-        z_top = model.top_surface.tolist()
-        z_bottom = model.bottom_surface.tolist()
-        
-        print(f"[DEBUG] 岩层 '{model.name}': x维度={len(x_grid)}, y维度={len(y_grid)}, z维度={len(z_top)}x{len(z_top[0]) if z_top else 0}")
-        
-        models_payload.append(
-            {
-                "name": model.name,
-                "points": int(model.points),
-                # 使用 parametric 格式: 分别提供 x, y, z 数组
-                "grid_x": x_grid,
-                "grid_y": y_grid,
-                "top_surface_z": z_top,
-                "bottom_surface_z": z_bottom,
-                "avg_thickness": float(model.avg_thickness),
-                "max_thickness": float(model.max_thickness),
-                "avg_height": float(model.avg_height),
-            }
-        )
+        for model in block_models:
+            # 方案1: 使用二维数组格式 (parametric surface)
+            # echarts-gl 的 surface 可以接受 data: { type: 'xyz', value: [x_arr, y_arr, z_arr] }
+            # 或者 data: [[x,y,z], ...] 格式
+        
+            # 提取网格的 x, y 坐标(只需要一次)
+            x_grid = XI[0, :].tolist()  # X 坐标数组 (第一行)
+            y_grid = YI[:, 0].tolist()  # Y 坐标数组 (第一列)
+        
+            # Z 值以二维数组形式提供
+            z_top = model.top_surface.tolist()
+            z_bottom = model.bottom_surface.tolist()
+        
+            print(f"[DEBUG] 岩层 '{model.name}': x维度={len(x_grid)}, y维度={len(y_grid)}, z维度={len(z_top)}x{len(z_top[0]) if z_top else 0}")
+        
+            models_payload.append(
+                {
+                    "name": model.name,
+                    "points": int(model.points),
+                    # 使用 parametric 格式: 分别提供 x, y, z 数组
+                    "grid_x": x_grid,
+                    "grid_y": y_grid,
+                    "top_surface_z": z_top,
+                    "bottom_surface_z": z_bottom,
+                    "avg_thickness": float(model.avg_thickness),
+                    "max_thickness": float(model.max_thickness),
+                    "avg_height": float(model.avg_height),
+                }
+            )
         
-        # 打印第一个模型的数据样本用于调试
-        if len(models_payload) == 1:
-            print(f"[DEBUG] 第一个模型数据样本:")
-            print(f"  - x_grid前3个值: {x_grid[:3]}")
-            print(f"  - y_grid前3个值: {y_grid[:3]}")
-            print(f"  - z_top[0]前3个值: {z_top[0][:3] if z_top and z_top[0] else 'N/A'}")
+            # 打印第一个模型的数据样本用于调试
+            if len(models_payload) == 1:
+                print(f"[DEBUG] 第一个模型数据样本:")
+                print(f"  - x_grid前3个值: {x_grid[:3]}")
+                print(f"  - y_grid前3个值: {y_grid[:3]}")
+                print(f"  - z_top[0]前3个值: {z_top[0][:3] if z_top and z_top[0] else 'N/A'}")
+
+        return block_models, skipped, XI, YI, models_payload
+
+    flight_key = (
+        f"block_model:{modeling_state.get_dataset_key()}:"
+        f"{fingerprint(payload, plan.resolution, plan.method, plan.dtype)}"
+    )
+    block_models, skipped, XI, YI, models_payload = await get_single_flight().run_async(flight_key, build_models)
+
+    # 保存建模结果到 modeling_state (用于后续 z 剖面提取)
+    modeling_state.last_block_models = block_models
+    modeling_state.last_grid_x = XI[0, :].flatten()  # 提取一维 x 坐标
+    modeling_state.last_grid_y = YI[:, 0].flatten()  # 提取一维 y 坐标
 
     return {
         "status": "success",
         "grid": {"x": XI[0].tolist(), "y": YI[:, 0].tolist()},
         "models": models_payload,
         "skipped": skipped,
+        "memory_plan": plan.to_dict(),
     }
 
 
 @app.post("/api/modeling/z_section")
-async def extract_z_section_api(payload: ZSectionRequest):
+async def extract_z_section_api(payload: ZSectionRequest, workspace: Workspace = Depends(get_workspace)):
     """
     提取 z 轴剖面
     
@@ -1085,6 +1125,7 @@ async def extract_z_section_api(payload: ZSectionRequest):
         from z_section_slicer import extract_z_section, get_z_range_from_models
         
         # 确保已经生成了模型
+        modeling_state = workspace.modeling
         modeling_state.ensure_models_ready()
         
         block_models = modeling_state.last_block_models
@@ -1136,12 +1177,70 @@ async def extract_z_section_api(payload: ZSectionRequest):
         raise HTTPException(status_code=500, detail=f"Z剖面提取失败: {str(exc)}")
 
 
+@app.get("/api/projects")
+async def list_projects():
+    """列出已保存的建模项目"""
+    return {"status": "success", "projects": get_project_store().list_projects()}
+
+
+@app.post("/api/projects")
+async def save_project(payload: ProjectSaveRequest, workspace: Workspace = Depends(get_workspace)):
+    """将当前会话的数据集、岩层索引和块体模型保存为项目"""
+    name = payload.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="项目名称不能为空")
+    # 列式写入可能达数百 MB, 在线程池中执行, 不阻塞事件循环
+    meta = await run_in_threadpool(get_project_store().save, name, workspace.modeling, payload.project_id)
+    return {"status": "success", "project": meta}
+
+
+@app.post("/api/projects/{project_id}/open")
+async def open_project(project_id: str, workspace: Workspace = Depends(get_workspace)):
+    """内存映射方式打开项目, 替换当前会话的建模状态"""
+    start = time.perf_counter()
+    store = get_project_store()
+    meta = store.get_meta(project_id)
+    try:
+        state = store.open(project_id)
+    except Exception as exc:
+        print(f"[项目] 打开项目失败: {project_id} -> {exc}")
+        raise HTTPException(status_code=500, detail=f"项目数据损坏或版本不兼容: {exc}")
+    workspace.modeling = state
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"[项目] 已打开项目 {meta['name']} ({project_id}), 耗时 {elapsed_ms:.1f}ms")
+
+    seam_column = state.last_selected_seam_column
+    return {
+        "status": "success",
+        "project": meta,
+        "numeric_columns": state.numeric_columns,
+        "text_columns": state.text_columns,
+        "record_count": int(len(state.merged_df)),
+        "seam_column": seam_column,
+        "seams": state.get_seam_index(seam_column).ordered_values() if seam_column else [],
+        "has_models": state.last_block_models is not None,
+        "elapsed_ms": round(elapsed_ms, 1),
+    }
+
+
+@app.delete("/api/projects/{project_id}")
+async def delete_project(project_id: str):
+    await run_in_threadpool(get_project_store().delete, project_id)
+    return {"status": "success", "project_id": project_id}
+
+
 @app.post("/api/modeling/comparison")
-async def compare_interpolation(payload: ComparisonRequest):
+async def compare_interpolation(
+    payload: ComparisonRequest,
+    workspace: Workspace = Depends(get_workspace),
+    _admission: Any = Depends(admission_control("comparison")),
+):
+    modeling_state = workspace.modeling
     modeling_state.ensure_loaded()
-    df = modeling_state.merged_df.copy()
+    df = modeling_state.merged_df
     seam_col = modeling_state.last_selected_seam_column
-    df = _filter_dataframe_by_seams(df, payload.seams, seam_col)
+    if payload.seams and seam_col in df.columns:
+        df = _filter_dataframe_by_seams(df, payload.seams, seam_col, modeling_state.get_seam_index(seam_col))
 
     required_cols = [payload.x_col, payload.y_col, payload.z_col]
     if not all(col in df.columns for col in required_cols):
@@ -1176,30 +1275,35 @@ async def compare_interpolation(payload: ComparisonRequest):
         "thin_plate": "薄板样条 (Thin Plate)",
     }
 
-    results = []
-    for key, label in methods.items():
-        try:
-            if key in {"linear", "cubic", "nearest"}:
-                preds = griddata(
-                    (X_train[:, 0], X_train[:, 1]),
-                    y_train,
-                    (X_test[:, 0], X_test[:, 1]),
-                    method=key,
-                )
-            else:
-                rbf = Rbf(X_train[:, 0], X_train[:, 1], y_train, function=key)
-                preds = rbf(X_test[:, 0], X_test[:, 1])
-            if preds is None:
-                continue
-            mask = ~np.isnan(preds)
-            if not np.any(mask):
+    def evaluate_methods():
+        results = []
+        for key, label in methods.items():
+            try:
+                if key in {"linear", "cubic", "nearest"}:
+                    preds = griddata(
+                        (X_train[:, 0], X_train[:, 1]),
+                        y_train,
+                        (X_test[:, 0], X_test[:, 1]),
+                        method=key,
+                    )
+                else:
+                    rbf = Rbf(X_train[:, 0], X_train[:, 1], y_train, function=key)
+                    preds = rbf(X_test[:, 0], X_test[:, 1])
+                if preds is None:
+                    continue
+                mask = ~np.isnan(preds)
+                if not np.any(mask):
+                    continue
+                mae = float(mean_absolute_error(y_test[mask], preds[mask]))
+                rmse = float(np.sqrt(mean_squared_error(y_test[mask], preds[mask])))
+                r2 = float(r2_score(y_test[mask], preds[mask]))
+                results.append({"method": label, "mae": round(mae, 4), "rmse": round(rmse, 4), "r2": round(r2, 4)})
+            except Exception:
                 continue
-            mae = float(mean_absolute_error(y_test[mask], preds[mask]))
-            rmse = float(np.sqrt(mean_squared_error(y_test[mask], preds[mask])))
-            r2 = float(r2_score(y_test[mask], preds[mask]))
-            results.append({"method": label, "mae": round(mae, 4), "rmse": round(rmse, 4), "r2": round(r2, 4)})
-        except Exception:
-            continue
+        return results
+
+    # 各方法的训练与评估在线程池中执行, 不阻塞事件循环
+    results = await run_in_threadpool(evaluate_methods)
 
     if not results:
         raise HTTPException(status_code=400, detail="所有插值方法都计算失败")
@@ -1211,13 +1315,12 @@ async def compare_interpolation(payload: ComparisonRequest):
 @app.get("/api/database/overview")
 async def get_database_overview(
     limit: int = Query(40, ge=1, le=200),
-    db: Session = Depends(get_session),
 ):
     """获取数据库概览 (带错误处理)"""
     try:
         # 尝试获取数据库表
         try:
-            table = get_records_table()
+            get_records_table()
         except RuntimeError as e:
             # 数据库未初始化，返回空数据
             print(f"[WARNING] 数据库未初始化: {e}")
@@ -1233,63 +1336,20 @@ async def get_database_overview(
                 "message": "数据库尚未初始化，请先导入数据"
             }
         
-        column_map = {column.name: column for column in table.columns}
-
-        stats = {
-            "records": int(db.execute(select(func.count()).select_from(table)).scalar() or 0),
-            "provinces": 0,
-            "mines": 0,
-            "lithologies": 0,
-        }
-
-        province_column, _ = _resolve_column(column_map, PROVINCE_COLUMN_CANDIDATES)
-        if "矿名" in column_map:
-            stats["mines"] = int(
-                db.execute(select(func.count(func.distinct(column_map["矿名"])))).scalar() or 0
-            )
-        if "岩性" in column_map:
-            distinct_stmt = (
-                select(column_map["岩性"])
-                .where(column_map["岩性"].is_not(None))
-                .distinct()
-            )
-            normalized_set: set[str] = set()
-            for row in db.execute(distinct_stmt):
-                raw_value = row[0]
-                normalized_value = _normalize_lithology_name(raw_value)
-                if normalized_value:
-                    normalized_set.add(normalized_value)
-            stats["lithologies"] = len(normalized_set)
-
-        distribution: List[Dict[str, Any]] = []
-        if province_column is not None:
-            province_stmt = (
-                select(
-                    province_column.label("raw_name"),
-                    func.count().label("value"),
-                )
-                .where(province_column.is_not(None))
-                .group_by(province_column)
-                .order_by(func.count().desc())
-            )
-            province_rows = db.execute(province_stmt).all()
-            unique_normalized: set[str] = set()
-            for row in province_rows:
-                raw_name = str(row.raw_name).strip() if row.raw_name is not None else ""
-                normalized = _normalize_province_name(raw_name) or "未知"
-                unique_normalized.add(normalized if normalized != "未知" else "")
-                if len(distribution) < limit:
-                    distribution.append(
-                        {
-                            "name": normalized,
-                            "label": raw_name or normalized,
-                            "value": int(row.value or 0),
-                        }
-                    )
-
-            stats["provinces"] = len({name for name in unique_normalized if name})
-
-        return {"status": "success", "stats": stats, "distribution": distribution}
+        def load_overview():
+            # 在线程池中执行, 请求会话不跨线程使用; 与流式导出一样打开独立的只读连接
+            with get_read_engine().connect() as connection:
+                if has_records_summary(connection):
+                    return read_overview(connection, limit)
+            # 汇总表缺失时 (旧数据库) 用写连接构建一次
+            with get_engine().begin() as connection:
+                ensure_records_summary(connection)
+            with get_read_engine().connect() as connection:
+                return read_overview(connection, limit)
+
+        # 多个用户同时打开概览时只查询一次
+        overview = await get_single_flight().run_async(f"database_overview:{limit}", load_overview)
+        return {"status": "success", "stats": overview["stats"], "distribution": overview["distribution"]}
     
     except Exception as e:
         print(f"[ERROR] get_database_overview 发生错误: {e}")
@@ -1315,9 +1375,14 @@ async def get_database_records(
     page_size: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None, description="模糊搜索关键字"),
     province: Optional[str] = Query(None, description="按省份过滤"),
-    db: Session = Depends(get_session),
+    after: Optional[int] = Query(None, ge=0, description="游标: 上一页最后一条记录的 __rowid__"),
+    db: Session = Depends(get_read_session),
 ):
-    """获取数据库记录列表 (带错误处理)"""
+    """获取数据库记录列表 (带错误处理)
+
+    按 ROWID 游标分页: 传入 after 时直接从该 ROWID 之后读取; 只传 page 时,
+    若已缓存上一页的结束游标同样按游标读取, 否则退回 OFFSET。
+    """
     try:
         table = _get_records_table_safe()
         if table is None:
@@ -1347,27 +1412,12 @@ async def get_database_records(
 
     province_column, _ = _resolve_column({column.name: column for column in table.columns}, PROVINCE_COLUMN_CANDIDATES)
     province_clause = None
-    if province and province_column is not None:
-        raw_value = province.strip()
-        normalized_value = _normalize_province_name(raw_value)
-        candidates: List[str] = []
-        if normalized_value:
-            candidates.append(normalized_value)
-        if raw_value and raw_value not in candidates:
-            candidates.append(raw_value)
-        suffixes = ["省", "市", "自治区", "特别行政区", "地区"]
-        expanded_candidates: List[str] = []
-        for base in candidates:
-            expanded_candidates.append(base)
-            for suffix in suffixes:
-                expanded_candidates.append(f"{base}{suffix}")
-        patterns = [item for item in expanded_candidates if item]
-        if patterns:
-            province_clause = or_(
-                *[province_column.ilike(f"%{pattern}%") for pattern in patterns]
-            )
+    if province and province.strip() and province_column is not None:
+        _ensure_records_summary(db)
+        province_clause = province_rowid_clause(province.strip())
 
-    filters = _build_optional_filters(table, search)
+    search_query = _records_fts_query(db, search)
+    filters = _build_optional_filters(table, search, db)
 
     base_select = select(*[table.c[column] for column in columns], text("ROWID as __rowid__"))
     if filters is not None:
@@ -1381,16 +1431,52 @@ async def get_database_records(
     if province_clause is not None:
         count_query = count_query.where(province_clause)
 
-    total = int(db.execute(count_query).scalar() or 0)
-    offset = (page - 1) * page_size
-
-    rows = (
-        db.execute(
-            base_select.order_by(text("ROWID")).offset(offset).limit(page_size)
+    filter_key = json.dumps([(search or "").strip(), (province or "").strip()], ensure_ascii=False)
+    total_approximate = False
+    if filters is None and province_clause is None:
+        total, total_approximate = cache_database_query(
+            f"records_count:{filter_key}", lambda: _count_all_records(db), ttl=DB_QUERY_CACHE_TTL, tables=("records",)
         )
-        .mappings()
-        .all()
-    )
+    elif filters is None:
+        total = cache_database_query(
+            f"records_count:{filter_key}",
+            lambda: count_province(db.connection(), province.strip()),
+            ttl=DB_QUERY_CACHE_TTL,
+            tables=(SUMMARY_TABLE,),
+        )
+    elif search_query is not None and province_clause is None:
+        total = cache_database_query(
+            f"records_count:{filter_key}",
+            lambda: count_fts_matches(db.connection(), search_query),
+            ttl=DB_QUERY_CACHE_TTL,
+            tables=(FTS_TABLE,),
+        )
+    else:
+        total = cache_database_query(
+            f"records_count:{filter_key}",
+            lambda: int(db.execute(count_query).scalar() or 0),
+            ttl=DB_QUERY_CACHE_TTL,
+            tables=("records",),
+        )
+
+    cursor_key = f"db:records_cursor:{filter_key}:{page_size}@{data_version_tag(['records'])}"
+    cursor = after
+    if cursor is None and page > 1 and CACHE_ENABLED:
+        cursor = get_cache().get(f"{cursor_key}:{page}")
+
+    page_select = base_select.order_by(text("ROWID")).limit(page_size + 1)
+    if cursor is not None:
+        page_select = page_select.where(text("records.ROWID > :after_rowid").bindparams(after_rowid=cursor))
+    else:
+        page_select = page_select.offset((page - 1) * page_size)
+    rows = db.execute(page_select).mappings().all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = rows[-1]["__rowid__"] if has_more else None
+    # 页码翻页时记录下一页的起始游标, 顺序翻页不再依赖 OFFSET
+    if next_cursor is not None and after is None and CACHE_ENABLED:
+        get_cache().set(f"{cursor_key}:{page + 1}", next_cursor, ttl=DB_QUERY_CACHE_TTL)
 
     records = []
     for row in rows:
@@ -1404,6 +1490,9 @@ async def get_database_records(
         "page": page,
         "page_size": page_size,
         "total": total,
+        "total_approximate": total_approximate,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
     }
 
 
@@ -1413,45 +1502,181 @@ class SaveDatabaseRequest(BaseModel):
     deleted: List[int] = []
 
 
+# SQLite 单条语句的绑定参数上限为 999, ROWID 列表按块拼接 IN
+_SAVE_CHUNK_SIZE = 500
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _same_cell_value(old: Any, new: Any) -> bool:
+    """表格中 NULL 显示为空字符串, 数值列可能以字符串回传"""
+    if old in (None, "") and new in (None, ""):
+        return True
+    if old == new:
+        return True
+    if old is None or new is None:
+        return False
+    return str(old) == str(new)
+
+
+def _cell_payload(row: Dict[str, Any], column: str, text_column_set: set) -> Any:
+    """数值列的空单元格写回 NULL"""
+    value = row.get(column)
+    if value == "" and column not in text_column_set:
+        return None
+    return value
+
+
+def _read_current_rows(connection, columns: List[str], rowids: List[int]) -> Dict[int, Dict[str, Any]]:
+    column_list = ", ".join(_quote_identifier(column) for column in columns)
+    current: Dict[int, Dict[str, Any]] = {}
+    for start in range(0, len(rowids), _SAVE_CHUNK_SIZE):
+        chunk = rowids[start:start + _SAVE_CHUNK_SIZE]
+        placeholders = ", ".join("?" for _ in chunk)
+        result = connection.exec_driver_sql(
+            f"SELECT ROWID, {column_list} FROM records WHERE ROWID IN ({placeholders})", tuple(chunk)
+        )
+        for row in result:
+            current[int(row[0])] = dict(zip(columns, row[1:]))
+    return current
+
+
+def _group_row_updates(
+    updated: List[Dict[str, Any]],
+    columns: List[str],
+    current: Dict[int, Dict[str, Any]],
+    text_column_set: set,
+) -> Dict[tuple, List[Dict[str, Any]]]:
+    """按实际修改的列集合分组, 同组的行共用一条 UPDATE 语句批量执行
+
+    只比较请求中出现的列, 未提交的列保持原值。
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in updated:
+        rowid = row.get("__rowid__")
+        if rowid is None or int(rowid) not in current:
+            continue
+        existing = current[int(rowid)]
+        changed = tuple(
+            column for column in columns
+            if column in row and not _same_cell_value(existing[column], row[column])
+        )
+        if not changed:
+            continue
+        params = {f"p{index}": _cell_payload(row, column, text_column_set) for index, column in enumerate(changed)}
+        params["rowid"] = int(rowid)
+        groups.setdefault(changed, []).append(params)
+    return groups
+
+
 @app.post("/api/database/save")
 async def save_database(request: SaveDatabaseRequest, db: Session = Depends(get_session)):
+    """保存表格编辑, 新增/修改/删除在同一事务中完成
+
+    - 修改的行只写入与库中取值不同的列, 请求中未出现的列保持原值;
+    - 同一请求中既修改又删除的行只删除, 不计入 updated;
+    - 非文本列的空字符串在新增和修改时均写为 NULL (此前原样写入 ""), 文本列保留空字符串。
+    """
     table = _get_records_table_or_500()
     columns = [column.name for column in table.columns]
 
     try:
+        connection = db.connection()
+        ensure_records_summary(connection)
+        summary_columns = set(resolve_summary_columns(columns).values())
+        text_column_set = set(text_columns(connection))
+        stats_columns = set(stored_properties(connection)) | {"岩性"}
+
+        deleted_rowids = sorted({int(rowid) for rowid in request.deleted})
+        deleted_set = set(deleted_rowids)
+        update_rowids = list({
+            int(row["__rowid__"]) for row in request.updated
+            if row.get("__rowid__") is not None and int(row["__rowid__"]) not in deleted_set
+        })
+        current = _read_current_rows(connection, columns, update_rowids)
+        update_groups = _group_row_updates(request.updated, columns, current, text_column_set)
+        changed_columns = set().union(*update_groups) if update_groups else set()
+
+        # 只有汇总列被修改的行才需要重算省份/矿名/岩性汇总, 岩性统计同理
+        summary_rowids = [
+            params["rowid"] for changed, group in update_groups.items()
+            if summary_columns.intersection(changed) for params in group
+        ]
+        stats_rowids = {
+            params["rowid"] for changed, group in update_groups.items()
+            if stats_columns.intersection(changed) for params in group
+        }
+        before = read_summary_rows(connection, summary_rowids + deleted_rowids)
+        affected_lithologies = {current[rowid].get("岩性") for rowid in stats_rowids}
+        affected_lithologies.update(
+            params[f"p{changed.index('岩性')}"]
+            for changed, group in update_groups.items() if "岩性" in changed for params in group
+        )
+        affected_lithologies.update(before.loc[before["rowid"].isin(deleted_rowids), "lithology"].dropna().tolist())
+        affected_lithologies.update(row.get("岩性") for row in request.inserted)
+        max_rowid = int(connection.execute(text("SELECT coalesce(max(ROWID), 0) FROM records")).scalar() or 0)
+
         if request.inserted:
-            payloads = []
-            for row in request.inserted:
-                payload = {column: row.get(column) for column in columns}
-                payloads.append(payload)
-            if payloads:
-                db.execute(table.insert(), payloads)
-
-        if request.updated:
-            for row in request.updated:
-                rowid = row.get("__rowid__")
-                if rowid is None:
-                    continue
-                values = {column: row.get(column) for column in columns}
-                stmt = table.update().where(text("ROWID = :rowid")).values(**values)
-                params = {"rowid": rowid, **values}
-                db.execute(stmt, params)
+            payloads = [
+                {column: _cell_payload(row, column, text_column_set) for column in columns}
+                for row in request.inserted
+            ]
+            db.execute(table.insert(), payloads)
 
-        if request.deleted:
-            for rowid in request.deleted:
-                db.execute(text("DELETE FROM records WHERE ROWID = :rowid"), {"rowid": rowid})
+        updated_count = 0
+        for changed, group in update_groups.items():
+            assignments = ", ".join(
+                f"{_quote_identifier(column)} = :p{index}" for index, column in enumerate(changed)
+            )
+            db.execute(text(f"UPDATE records SET {assignments} WHERE ROWID = :rowid"), group)
+            updated_count += len(group)
+
+        for start in range(0, len(deleted_rowids), _SAVE_CHUNK_SIZE):
+            chunk = deleted_rowids[start:start + _SAVE_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            connection.exec_driver_sql(f"DELETE FROM records WHERE ROWID IN ({placeholders})", tuple(chunk))
+
+        inserted_rowids = connection.execute(
+            text("SELECT ROWID FROM records WHERE ROWID > :max_rowid"), {"max_rowid": max_rowid}
+        ).scalars().all()
+        if summary_rowids or inserted_rowids or deleted_rowids:
+            apply_records_changes(connection, before, summary_rowids + list(inserted_rowids), deleted_rowids)
+        refresh_stats = "岩性" in columns and bool(stats_rowids or inserted_rowids or deleted_rowids)
+        if refresh_stats:
+            refresh_lithology_stats(connection, affected_lithologies)
 
         db.commit()
-        reset_table_cache()
     except Exception as exc:  # pragma: no cover - database failure fallback
         db.rollback()
         raise HTTPException(status_code=500, detail=f"数据库保存失败: {exc}") from exc
 
-    return {"status": "success", "message": "数据库已更新"}
+    # 表结构未变, 不再重置反射缓存; 只递增本次实际写入的表的数据版本
+    rows_changed = bool(inserted_rowids or deleted_rowids)
+    if refresh_stats:
+        invalidate_lithology_stats_cache()
+    if rows_changed or updated_count:
+        derived_tables = []
+        if rows_changed or changed_columns & text_column_set:
+            derived_tables.append(FTS_TABLE)
+        if rows_changed or changed_columns & summary_columns:
+            derived_tables.append(SUMMARY_TABLE)
+        _invalidate_records_cache(*derived_tables)
+    if rows_changed:
+        cache_clear_pattern("db:rock_count")
+
+    return {
+        "status": "success",
+        "message": "数据库已更新",
+        "inserted": len(inserted_rowids),
+        "updated": updated_count,
+        "deleted": len(deleted_rowids),
+    }
 
 
 @app.get("/api/database/lithologies")
-async def get_lithology_summary(db: Session = Depends(get_session)):
+async def get_lithology_summary(db: Session = Depends(get_read_session)):
     """获取岩性摘要 (带错误处理)"""
     try:
         table = _get_records_table_safe()
@@ -1489,29 +1714,9 @@ async def get_lithology_summary(db: Session = Depends(get_session)):
         col for col in DEFAULT_NUMERIC_COLUMNS if col in column_map
     ]
 
-    stmt = (
-        select(
-            column_map[lithology_col_name].label("name"),
-            func.count().label("count"),
-        )
-        .where(column_map[lithology_col_name].is_not(None))
-        .group_by(column_map[lithology_col_name])
-        .order_by(func.count().desc())
-    )
-
-    aggregated_counts: Dict[str, int] = {}
-    for row in db.execute(stmt):
-        raw_name = str(row.name).strip() if row.name is not None else ""
-        if not raw_name:
-            continue
-        normalized_name = _normalize_lithology_name(raw_name)
-        if not normalized_name:
-            continue
-        aggregated_counts[normalized_name] = aggregated_counts.get(normalized_name, 0) + int(row.count or 0)
-
-    sorted_items = sorted(aggregated_counts.items(), key=lambda item: item[1], reverse=True)
-    lithologies = [name for name, _ in sorted_items]
-    counts = {name: count for name, count in sorted_items}
+    _ensure_records_summary(db)
+    counts = read_lithology_counts(db.connection())
+    lithologies = list(counts)
 
     return {
         "status": "success",
@@ -1525,7 +1730,7 @@ async def get_lithology_summary(db: Session = Depends(get_session)):
 async def get_lithology_data(
     lithology: str = Query(..., description="岩性名称"),
     search: Optional[str] = Query(None, description="可选模糊搜索"),
-    db: Session = Depends(get_session),
+    db: Session = Depends(get_read_session),
 ):
     """获取指定岩性的数据 (带错误处理)"""
     try:
@@ -1564,14 +1769,11 @@ async def get_lithology_data(
         if not available_numeric:
             return {"status": "success", "values": {}, "count": 0, "stats": {}}
 
-        comparator = column_map[lithology_col_name]
-        if normalized_name == COAL_NORMALIZED_NAME:
-            base_condition = comparator.like("%煤%")
-        else:
-            base_condition = comparator == normalized_name
+        _ensure_records_summary(db)
+        base_condition = lithology_rowid_clause(normalized_name)
 
         stmt = select(*[column_map[col] for col in available_numeric]).where(base_condition)
-        filters = _build_optional_filters(table, search)
+        filters = _build_optional_filters(table, search, db)
         if filters is not None:
             stmt = stmt.where(filters)
         rows = db.execute(stmt).all()
@@ -1627,11 +1829,16 @@ async def get_performance_stats():
     """获取性能统计信息"""
     mem_usage = check_memory_usage()
     cache_stats = get_cache_stats()
+    dataset_cache = get_dataset_cache()
 
     return {
         "status": "success",
         "memory": mem_usage,
         "cache": cache_stats,
+        "workspaces": get_workspace_manager().get_stats(),
+        "single_flight": get_single_flight().get_stats(),
+        "admission": get_admission_controller().get_stats(),
+        "dataset_cache": dataset_cache.get_stats() if dataset_cache is not None else None,
         "config": {
             "max_upload_mb": MAX_UPLOAD_SIZE_MB,
             "max_resolution": MAX_RESOLUTION,
@@ -1641,7 +1848,10 @@ async def get_performance_stats():
 
 
 @app.get("/api/dashboard/stats")
-async def get_dashboard_stats(db: Session = Depends(get_session)):
+async def get_dashboard_stats(
+    db: Session = Depends(get_read_session),
+    workspace: Workspace = Depends(get_workspace),
+):
     """获取仪表板统计信息 (带错误处理)"""
     try:
         def query_rock_db_count():
@@ -1653,8 +1863,9 @@ async def get_dashboard_stats(db: Session = Depends(get_session)):
                 return 0
 
         # 使用数据库查询缓存
-        rock_db_count = cache_database_query("rock_count", query_rock_db_count, ttl=180)
+        rock_db_count = cache_database_query("rock_count", query_rock_db_count, ttl=180, tables=("records",))
 
+        modeling_state = workspace.modeling
         modeling_record_count = 0
         if modeling_state.merged_df is not None:
             modeling_record_count = int(len(modeling_state.merged_df))
@@ -1684,25 +1895,114 @@ async def get_dashboard_stats(db: Session = Depends(get_session)):
         }
 
 
+_EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/x-ndjson",
+}
+
+
+def _project_columns(table, columns: Optional[str]) -> List[str]:
+    """解析逗号分隔的列投影, 未指定时返回全部列"""
+    available = [column.name for column in table.columns]
+    if not columns:
+        return available
+    requested = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知列: {', '.join(unknown)}")
+    return requested
+
+
+def _encode_json(value: Any) -> str:
+    """与 FastAPI JSONResponse 相同的紧凑编码, json 格式的流式输出与原接口逐字节一致"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _iter_record_batches(stmt, columns: List[str], fmt: str, batch_size: int):
+    """从数据库游标分批读取并编码, 内存占用与表大小无关
+
+    json: 与原接口相同的 JSON 数组 (逐批写出);
+    ndjson: 每行一条记录;
+    columnar: 首行为 {"columns": [...]}, 之后每行一批 {"offset", "count", "data": {列: 值数组}}。
+    """
+    # 依赖注入的会话在响应发送前就会关闭, 流式读取使用独立的只读连接
+    with get_read_engine().connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(stmt)
+        if fmt == "json":
+            yield "["
+        elif fmt == "columnar":
+            yield _encode_json({"columns": columns}) + "\n"
+        offset = 0
+        for batch in result.partitions(batch_size):
+            if fmt == "columnar":
+                data = {
+                    column: ["" if row[index] is None else row[index] for row in batch]
+                    for index, column in enumerate(columns)
+                }
+                yield _encode_json({"offset": offset, "count": len(batch), "data": data}) + "\n"
+            else:
+                encoded = [_encode_json(_serialize_row(dict(zip(columns, row)), columns)) for row in batch]
+                if fmt == "json":
+                    yield ("," if offset else "") + ",".join(encoded)
+                else:
+                    yield "\n".join(encoded) + "\n"
+            offset += len(batch)
+        if fmt == "json":
+            yield "]"
+
+
+def _stream_records(
+    db: Session,
+    table,
+    columns: Optional[str],
+    fmt: str,
+    search: Optional[str] = None,
+    province: Optional[str] = None,
+    lithology: Optional[str] = None,
+    limit: Optional[int] = None,
+    base_condition=None,
+) -> StreamingResponse:
+    """按投影列和过滤条件流式输出 records"""
+    projected = _project_columns(table, columns)
+    stmt = select(*[table.c[column] for column in projected])
+    if base_condition is not None:
+        stmt = stmt.where(base_condition)
+    filters = _build_optional_filters(table, search, db)
+    if filters is not None:
+        stmt = stmt.where(filters)
+    if (province and province.strip()) or (lithology and lithology.strip()):
+        _ensure_records_summary(db)
+    if province and province.strip():
+        stmt = stmt.where(province_rowid_clause(province.strip()))
+    if lithology and lithology.strip():
+        stmt = stmt.where(lithology_rowid_clause(lithology.strip()))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return StreamingResponse(
+        _iter_record_batches(stmt, projected, fmt, DB_STREAM_BATCH_SIZE),
+        media_type=_EXPORT_MEDIA_TYPES[fmt],
+    )
+
+
 @app.get("/api/borehole-data")
-async def get_borehole_data(db: Session = Depends(get_session)):
-    """获取钻孔数据 (从数据库中读取所有记录)"""
+async def get_borehole_data(
+    columns: Optional[str] = Query(None, description="逗号分隔的返回列, 默认全部"),
+    format: str = Query("json", regex="^(json|ndjson|columnar)$", description="json / ndjson / columnar"),
+    search: Optional[str] = Query(None, description="模糊搜索关键字"),
+    province: Optional[str] = Query(None, description="按省份过滤"),
+    lithology: Optional[str] = Query(None, description="按岩性过滤"),
+    limit: Optional[int] = Query(None, ge=1, description="最多返回的记录数"),
+    db: Session = Depends(get_read_session),
+):
+    """获取钻孔数据 (从数据库流式读取, 支持列投影和过滤)"""
     try:
         table = _get_records_table_safe()
         if table is None:
             return []
-        
-        # 获取所有记录
-        columns = [column.name for column in table.columns]
-        stmt = select(*[table.c[col] for col in columns])
-        rows = db.execute(stmt).mappings().all()
-        
-        records = []
-        for row in rows:
-            row_dict = dict(row)
-            records.append(_serialize_row(row_dict, columns))
-        
-        return records
+        return _stream_records(db, table, columns, format, search, province, lithology, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] get_borehole_data 发生错误: {e}")
         import traceback
@@ -1711,7 +2011,7 @@ async def get_borehole_data(db: Session = Depends(get_session)):
 
 
 @app.get("/api/summary-data")
-async def get_summary_data(db: Session = Depends(get_session)):
+async def get_summary_data(db: Session = Depends(get_read_session)):
     """获取汇总数据 (从数据库中读取并按矿名分组)"""
     try:
         table = _get_records_table_safe()
@@ -1750,45 +2050,35 @@ async def get_summary_data(db: Session = Depends(get_session)):
 
 
 @app.get("/api/coal-seam-data")
-async def get_coal_seam_data(db: Session = Depends(get_session)):
-    """获取煤层数据 (从数据库中筛选包含"煤"的岩性记录)"""
+async def get_coal_seam_data(
+    columns: Optional[str] = Query(None, description="逗号分隔的返回列, 默认全部"),
+    format: str = Query("json", regex="^(json|ndjson|columnar)$", description="json / ndjson / columnar"),
+    search: Optional[str] = Query(None, description="模糊搜索关键字"),
+    province: Optional[str] = Query(None, description="按省份过滤"),
+    limit: Optional[int] = Query(None, ge=1, description="最多返回的记录数"),
+    db: Session = Depends(get_read_session),
+):
+    """获取煤层数据 (从数据库流式读取包含"煤"的岩性记录)"""
     try:
         table = _get_records_table_safe()
         if table is None:
             return []
-        
+
         column_map = {column.name: column for column in table.columns}
-        columns = [column.name for column in table.columns]
-        
-        # 如果有岩性列，筛选包含"煤"的记录
+
+        # 有岩性列时走规范化岩性索引, 否则对岩层名称列做 LIKE 筛选
         if "岩性" in column_map:
-            stmt = (
-                select(*[table.c[col] for col in columns])
-                .where(column_map["岩性"].like("%煤%"))
-            )
-            rows = db.execute(stmt).mappings().all()
-            
-            records = []
-            for row in rows:
-                row_dict = dict(row)
-                records.append(_serialize_row(row_dict, columns))
-            return records
+            _ensure_records_summary(db)
+            base_condition = lithology_rowid_clause(COAL_NORMALIZED_NAME)
+        elif "岩层名称" in column_map:
+            base_condition = column_map["岩层名称"].like("%煤%")
         else:
-            # 如果没有岩性列，尝试岩层名称列
-            if "岩层名称" in column_map:
-                stmt = (
-                    select(*[table.c[col] for col in columns])
-                    .where(column_map["岩层名称"].like("%煤%"))
-                )
-                rows = db.execute(stmt).mappings().all()
-                
-                records = []
-                for row in rows:
-                    row_dict = dict(row)
-                    records.append(_serialize_row(row_dict, columns))
-                return records
-            else:
-                return []
+            return []
+        return _stream_records(
+            db, table, columns, format, search, province, limit=limit, base_condition=base_condition
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] get_coal_seam_data 发生错误: {e}")
         import traceback
@@ -2098,7 +2388,11 @@ async def analyze_borehole_files(files: List[UploadFile] = File(...)):
 
 
 @app.post("/api/keystratum/files")
-async def upload_keystratum_files(files: List[UploadFile] = File(...)):
+async def upload_keystratum_files(
+    files: List[UploadFile] = File(...),
+    workspace: Workspace = Depends(get_workspace),
+):
+    key_stratum_state = workspace.key_stratum
     if not files:
         raise HTTPException(status_code=400, detail="请上传至少一个岩层数据文件")
 
@@ -2155,7 +2449,8 @@ async def upload_keystratum_files(files: List[UploadFile] = File(...)):
 
 
 @app.post("/api/keystratum/fill")
-async def fill_keystratum_from_database():
+async def fill_keystratum_from_database(workspace: Workspace = Depends(get_workspace)):
+    key_stratum_state = workspace.key_stratum
     if not key_stratum_state.files:
         raise HTTPException(status_code=400, detail="请先上传岩层数据文件")
 
@@ -2173,26 +2468,14 @@ async def fill_keystratum_from_database():
     if not available_numeric:
         raise HTTPException(status_code=400, detail="数据库缺少可用于填充的数值列")
 
-    query_columns = [table.c[lithology_col]] + [table.c[col] for col in available_numeric]
-    with get_engine().connect() as connection:
-        db_df = pd.read_sql(select(*query_columns), connection)
-
-    if db_df.empty:
+    stats_map = get_lithology_stats("median", available_numeric)
+    if stats_map.empty:
         raise HTTPException(status_code=400, detail="数据库中没有可用于填充的岩性记录")
 
-    db_df[lithology_col] = db_df[lithology_col].astype(str).str.strip()
-    db_df[lithology_col] = db_df[lithology_col].map(_normalize_lithology_name)
-    db_df = db_df[db_df[lithology_col].astype(bool)]
-    stats_map = (
-        db_df.groupby(lithology_col)[available_numeric]
-        .median(numeric_only=True)
-        .dropna(how="all")
-    )
-    stats_map = stats_map.reindex(columns=numeric_cols, fill_value=np.nan)
-
     updated: Dict[str, pd.DataFrame] = {}
+    fill_report: Dict[str, Dict[str, Any]] = {}
     for filename, df in key_stratum_state.files.items():
-        updated[filename] = _fill_from_database(df, stats_map)
+        updated[filename], fill_report[filename] = _fill_from_database(df, stats_map)
 
     key_stratum_state.files = updated
     key_stratum_state.filled = True
@@ -2202,11 +2485,14 @@ async def fill_keystratum_from_database():
         "status": "success",
         "message": "已根据数据库填充缺失参数",
         "preview": preview,
+        "filled_count": sum(report["filled_count"] for report in fill_report.values()),
+        "fill_report": fill_report,
     }
 
 
 @app.get("/api/keystratum/coals")
-async def get_keystratum_coals():
+async def get_keystratum_coals(workspace: Workspace = Depends(get_workspace)):
+    key_stratum_state = workspace.key_stratum
     if not key_stratum_state.files:
         raise HTTPException(status_code=400, detail="请先上传岩层数据文件")
 
@@ -2230,7 +2516,8 @@ class KeyStratumRequest(BaseModel):
 
 
 @app.post("/api/keystratum/process")
-async def process_keystratum(request: KeyStratumRequest):
+async def process_keystratum(request: KeyStratumRequest, workspace: Workspace = Depends(get_workspace)):
+    key_stratum_state = workspace.key_stratum
     if not key_stratum_state.files:
         raise HTTPException(status_code=400, detail="请先上传岩层数据文件")
     coal_name = request.coal.strip() if request.coal else ""
@@ -2354,8 +2641,11 @@ async def process_keystratum(request: KeyStratumRequest):
 
 
 @app.get("/api/keystratum/export")
-async def export_keystratum_results(format: str = Query("xlsx", regex="^(xlsx|csv)$")):
-    df = key_stratum_state.last_result
+async def export_keystratum_results(
+    format: str = Query("xlsx", regex="^(xlsx|csv)$"),
+    workspace: Workspace = Depends(get_workspace),
+):
+    df = workspace.key_stratum.last_result
     if df is None or df.empty:
         raise HTTPException(status_code=400, detail="当前没有可导出的关键层计算结果")
 
@@ -2842,11 +3132,15 @@ async def get_statistical_methods():
     }
 
 @app.post("/api/modeling/validate")
-async def validate_modeling_endpoint(payload: ModelingValidationRequest):
+async def validate_modeling_endpoint(
+    payload: ModelingValidationRequest,
+    workspace: Workspace = Depends(get_workspace),
+):
     """
     验证建模可行性：检查数据是否满足建模要求。
     返回详细的验证结果，包括数据点数、坐标唯一值、各煤层点数等。
     """
+    modeling_state = workspace.modeling
     try:
         modeling_state.ensure_loaded()
     except HTTPException as e:
@@ -2875,7 +3169,8 @@ async def validate_modeling_endpoint(payload: ModelingValidationRequest):
     
     # 检查有效数据点
     required_cols = [payload.x_col, payload.y_col, payload.thickness_col, payload.seam_col]
-    valid_data = df.dropna(subset=required_cols).copy()
+    valid_rows = df[required_cols].notna().all(axis=1).to_numpy()
+    valid_data = df[valid_rows]
     total_valid_points = len(valid_data)
     
     if total_valid_points < 8:
@@ -2890,7 +3185,6 @@ async def validate_modeling_endpoint(payload: ModelingValidationRequest):
         }
     
     # 检查坐标唯一值
-    valid_data[payload.seam_col] = valid_data[payload.seam_col].astype(str)
     x_vals = valid_data[payload.x_col].astype(float)
     y_vals = valid_data[payload.y_col].astype(float)
     
@@ -2912,8 +3206,10 @@ async def validate_modeling_endpoint(payload: ModelingValidationRequest):
     seam_stats = {}
     has_valid_seam = False
     
+    seam_index = modeling_state.get_seam_index(payload.seam_col)
     for seam_name in payload.selected_seams:
-        seam_df = valid_data[valid_data[payload.seam_col] == str(seam_name)]
+        rows = seam_index.rows_for([seam_name])
+        seam_df = df.iloc[rows[valid_rows[rows]]]
         if seam_df.empty:
             seam_stats[seam_name] = {
                 "points": 0,
@@ -2961,26 +3257,20 @@ async def validate_modeling_endpoint(payload: ModelingValidationRequest):
         }
     }
 
-@app.post("/api/export")
-async def export_model_endpoint(payload: ExportRequest):
-    """
-    通用导出接口：生成 DXF 或 FLAC3D 文件并作为附件返回。
-    前端可以直接 POST JSON 到此接口以下载文件（适用于 web 页面）。
-    """
-    modeling_state.ensure_loaded()
-    df = modeling_state.merged_df
-
-    # 参数验证
-    for col in [payload.x_col, payload.y_col, payload.thickness_col, payload.seam_col]:
-        if col not in df.columns:
-            raise HTTPException(status_code=404, detail=f"数据集中缺少列: {col}")
-
+def _build_and_export_model(
+    payload: ExportRequest,
+    df: pd.DataFrame,
+    plan: MemoryPlan,
+    seam_index: SeamIndex,
+    export_type: str,
+) -> str:
+    """插值建模并写出导出文件, 返回文件路径 (同步执行, 由导出接口放入线程池)"""
     # 构造插值包装器
     def interpolation_wrapper(x, y, z, xi_flat, yi_flat):
         from interpolation import interpolate
 
         num_points = len(x)
-        method_key = payload.method.lower()
+        method_key = plan.method
         if num_points <= 3:
             method_key = 'nearest'
         
@@ -2993,7 +3283,6 @@ async def export_model_endpoint(payload: ExportRequest):
             print(f"[Export] 插值失败,回退到nearest: {e}")
             return griddata((x, y), z, (xi_flat, yi_flat), method='nearest')
 
-    export_type = (payload.export_type or 'dxf').lower()
     is_grid_export = export_type in ('flac3d', 'f3grid')
     requested_gap = None
     if payload.gap is not None:
@@ -3020,9 +3309,11 @@ async def export_model_endpoint(payload: ExportRequest):
             thickness_col=payload.thickness_col,
             selected_seams=payload.selected_seams,
             method_callable=interpolation_wrapper,
-            resolution=payload.resolution or 150,
+            resolution=plan.resolution,
             base_level=payload.base_level or 0,
             gap_value=gap_for_modeling,
+            seam_index=seam_index,
+            dtype=plan.numpy_dtype,
         )
     except ValueError as e:
         # 常见的建模输入错误（例如数据点不足、网格不匹配等）用 400 返回，并将原始错误消息暴露给前端
@@ -3257,6 +3548,46 @@ async def export_model_endpoint(payload: ExportRequest):
             pass
         raise HTTPException(status_code=500, detail=f"导出失败: {error_msg}")
 
+    return final_path
+
+
+@app.post("/api/export")
+async def export_model_endpoint(
+    payload: ExportRequest,
+    workspace: Workspace = Depends(get_workspace),
+    _admission: Any = Depends(admission_control("export")),
+):
+    """
+    通用导出接口：生成 DXF 或 FLAC3D 文件并作为附件返回。
+    前端可以直接 POST JSON 到此接口以下载文件（适用于 web 页面）。
+    """
+    modeling_state = workspace.modeling
+    modeling_state.ensure_loaded()
+    df = modeling_state.merged_df
+
+    # 参数验证
+    for col in [payload.x_col, payload.y_col, payload.thickness_col, payload.seam_col]:
+        if col not in df.columns:
+            raise HTTPException(status_code=404, detail=f"数据集中缺少列: {col}")
+
+    export_type = (payload.export_type or 'dxf').lower()
+    seam_index = modeling_state.get_seam_index(payload.seam_col)
+    seam_counts = seam_index.counts()
+    # 分配网格前预估建模与导出的峰值内存, 结果通过 X-Memory-Plan 响应头返回
+    plan = require_plan(
+        plan_request(
+            max((seam_counts.get(str(seam).strip(), 0) for seam in payload.selected_seams), default=0),
+            payload.method,
+            int(payload.resolution or 150),
+            layers=len(payload.selected_seams),
+            exporter=export_type,
+        ),
+        "模型导出",
+    )
+
+    # 建模与写文件在线程池中执行, 不阻塞事件循环 (准入预算在整个过程中保持占用)
+    final_path = await run_in_threadpool(_build_and_export_model, payload, df, plan, seam_index, export_type)
+
     # 返回文件流
     try:
         file_like = open(final_path, 'rb')
@@ -3271,7 +3602,8 @@ async def export_model_endpoint(payload: ExportRequest):
     from urllib.parse import quote
     filename_encoded = quote(Path(final_path).name)
     headers = {
-        'Content-Disposition': f'attachment; filename="{filename_encoded}"; filename*=UTF-8\'\'{filename_encoded}'
+        'Content-Disposition': f'attachment; filename="{filename_encoded}"; filename*=UTF-8\'\'{filename_encoded}',
+        'X-Memory-Plan': json.dumps(plan.to_dict(), ensure_ascii=True),
     }
 
     return StreamingResponse(file_like, media_type=media_type, headers=headers)
@@ -0,0 +1,215 @@
+"""
+跨进程共享状态
+基于本机 SQLite (WAL) 的小型索引与计数器, 让多个 uvicorn/gunicorn 工作进程
+共享会话工作区快照位置、限流计数和缓存失效代数
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+APP_ROOT = Path(__file__).resolve().parent
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workspaces (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires_at REAL
+);
+"""
+
+
+class SharedStateStore:
+    """多进程共享的 SQLite 状态索引
+
+    每个线程持有独立连接; 写操作使用 BEGIN IMMEDIATE 串行化。
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # 工作区索引
+    # ------------------------------------------------------------------
+    def lookup_workspace(self, session_id: str) -> Optional[Tuple[int, str]]:
+        row = self._connect().execute(
+            "SELECT version, path FROM workspaces WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return (int(row[0]), row[1]) if row else None
+
+    def publish_workspace(self, session_id: str, path: str, size_bytes: int) -> Tuple[int, Optional[str]]:
+        """登记新的工作区快照, 返回 (新版本号, 被替换的旧快照路径)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT version, path FROM workspaces WHERE session_id = ?", (session_id,)).fetchone()
+            version = (int(row[0]) if row else 0) + 1
+            conn.execute(
+                "INSERT INTO workspaces (session_id, version, path, size_bytes, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET version = excluded.version, path = excluded.path, "
+                "size_bytes = excluded.size_bytes, updated_at = excluded.updated_at",
+                (session_id, version, path, int(size_bytes), time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return version, (row[1] if row else None)
+
+    def remove_workspace(self, session_id: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT path FROM workspaces WHERE session_id = ?", (session_id,)).fetchone()
+        conn.execute("DELETE FROM workspaces WHERE session_id = ?", (session_id,))
+        return row[0] if row else None
+
+    def expired_workspaces(self, older_than: float) -> Dict[str, str]:
+        rows = self._connect().execute(
+            "SELECT session_id, path FROM workspaces WHERE updated_at < ?", (older_than,)
+        ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def workspace_paths(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT path FROM workspaces").fetchall()]
+
+    def workspace_count(self) -> int:
+        return int(self._connect().execute("SELECT COUNT(*) FROM workspaces").fetchone()[0])
+
+    # ------------------------------------------------------------------
+    # 计数器
+    # ------------------------------------------------------------------
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """原子递增计数器并返回新值, ttl 秒后计数器过期"""
+        expires_at = time.time() + ttl if ttl else None
+        row = self._connect().execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value "
+            "RETURNING value",
+            (key, amount, expires_at),
+        ).fetchone()
+        return int(row[0])
+
+    def get_counter(self, key: str) -> int:
+        row = self._connect().execute(
+            "SELECT value FROM counters WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def get_counters(self, *keys: str) -> Dict[str, int]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" for _ in keys)
+        rows = self._connect().execute(
+            f"SELECT key, value FROM counters WHERE key IN ({placeholders}) "
+            f"AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, time.time()),
+        ).fetchall()
+        values = {key: 0 for key in keys}
+        values.update({row[0]: int(row[1]) for row in rows})
+        return values
+
+    def cleanup_counters(self) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM counters WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+
+class SharedRateLimiter:
+    """跨进程滑动窗口计数限流器
+
+    使用相邻两个固定窗口的加权计数近似滑动窗口, 计数保存在 SharedStateStore 中。
+    接口与 rate_limiter.RateLimiter 保持一致。
+    """
+
+    def __init__(self, store: SharedStateStore, name: str, max_requests: int, window_seconds: int):
+        self.store = store
+        self.name = name
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    def _window_keys(self, key: str, now: float) -> Tuple[str, str, float]:
+        window = int(now // self.window_seconds)
+        elapsed_ratio = (now - window * self.window_seconds) / self.window_seconds
+        return (
+            f"rl:{self.name}:{key}:{window}",
+            f"rl:{self.name}:{key}:{window - 1}",
+            elapsed_ratio,
+        )
+
+    def _estimate(self, key: str, now: float) -> float:
+        current_key, previous_key, elapsed_ratio = self._window_keys(key, now)
+        counts = self.store.get_counters(current_key, previous_key)
+        return counts[previous_key] * (1.0 - elapsed_ratio) + counts[current_key]
+
+    def is_allowed(self, key: str) -> bool:
+        """先原子递增再按递增后的估计值判定, 避免多进程并发时先读后写的竞争
+
+        被拒绝的请求撤销本次计数, 与进程内限流器一样不占用配额。
+        """
+        now = time.time()
+        current_key, previous_key, elapsed_ratio = self._window_keys(key, now)
+        current = self.store.incr(current_key, ttl=self.window_seconds * 2)
+        previous = self.store.get_counter(previous_key)
+        if previous * (1.0 - elapsed_ratio) + current - 1 >= self.max_requests:
+            self.store.incr(current_key, amount=-1)
+            return False
+        return True
+
+    def get_retry_after(self, key: str) -> Optional[int]:
+        now = time.time()
+        if self._estimate(key, now) < self.max_requests:
+            return None
+        _, _, elapsed_ratio = self._window_keys(key, now)
+        return max(int((1.0 - elapsed_ratio) * self.window_seconds) + 1, 1)
+
+    def cleanup(self):
+        self.store.cleanup_counters()
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_store: Optional[SharedStateStore] = None
+_store_lock = threading.Lock()
+
+
+def is_shared_state_enabled() -> bool:
+    from performance_config import SHARED_STATE_ENABLED
+
+    return SHARED_STATE_ENABLED
+
+
+def get_shared_store() -> SharedStateStore:
+    """获取全局共享状态索引"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from performance_config import SHARED_STATE_DIR
+
+                base_dir = Path(SHARED_STATE_DIR) if SHARED_STATE_DIR else APP_ROOT.parent / "data" / "shared"
+                _store = SharedStateStore(base_dir / "state.db")
+    return _store
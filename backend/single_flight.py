@@ -0,0 +1,100 @@
+"""
+相同计算合并 (single-flight)
+同一键的计算同一时刻只执行一次: 并发到达的调用者 (工作线程或异步接口) 等待
+正在进行的那一次并共享其结果, 计算抛出的异常同样传递给所有等待者
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+
+class _Call:
+    __slots__ = ("future", "thread_id")
+
+    def __init__(self, thread_id: int) -> None:
+        self.future: Future = Future()
+        # 发起计算的线程 (异步接口为事件循环线程)
+        self.thread_id = thread_id
+
+
+class SingleFlight:
+    """按键合并并发的相同计算 (只合并进行中的调用, 不缓存结果)"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    def _join(self, key: str, thread_id: int):
+        """返回 (调用, 是否由当前调用者执行)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                return call, False
+            call = _Call(thread_id)
+            self._calls[key] = call
+            self._executions += 1
+            return call, True
+
+    def _execute(self, key: str, call: _Call, func: Callable[[], Any]) -> None:
+        try:
+            result = func()
+        except BaseException as exc:
+            call.future.set_exception(exc)
+        else:
+            call.future.set_result(result)
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def run(self, key: str, func: Callable[[], Any]) -> Any:
+        """在当前线程执行或等待进行中的同键计算"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            current = self._calls.get(key)
+            # 同一线程内的嵌套调用 (或事件循环线程上等待自身的异步计算) 不能等待自己
+            reentrant = current is not None and current.thread_id == thread_id
+        if reentrant:
+            return func()
+
+        call, leader = self._join(key, thread_id)
+        if leader:
+            self._execute(key, call, func)
+        return call.future.result()
+
+    async def run_async(self, key: str, func: Callable[[], Any]) -> Any:
+        """异步接口使用: 同步计算放到线程池执行, 不阻塞事件循环
+
+        发起者被取消时计算继续进行, 其他等待者照常拿到结果。
+        """
+        call, leader = self._join(key, threading.get_ident())
+        if leader:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self._execute, key, call, func)
+        return await asyncio.wrap_future(call.future)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+            }
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """获取全局合并器"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import unittest
+from typing import Any
+from unittest import mock
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+import admission
+from admission import AdmissionController, AdmissionRejected, admission_control, estimate_cost
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def _controller(self, **overrides):
+        options = dict(budget=10, max_queue=2, queue_timeout=1, client_burst=100, client_rate=10)
+        options.update(overrides)
+        return AdmissionController(**options)
+
+    def test_cost_grows_with_grid_method_seams_and_export(self):
+        base = estimate_cost(150, "linear")
+        self.assertAlmostEqual(base, 1.0)
+        self.assertAlmostEqual(estimate_cost(300, "linear"), 4 * base)
+        self.assertGreater(estimate_cost(150, "ordinary_kriging"), estimate_cost(150, "idw"))
+        self.assertAlmostEqual(estimate_cost(150, "linear", seams=20), 20 * base)
+        self.assertGreater(estimate_cost(150, "linear", export_type="f3grid"), estimate_cost(150, "linear", export_type="dxf"))
+
+    def test_queue_fifo_and_reject_when_full(self):
+        controller = self._controller()
+
+        async def main():
+            first = await controller.admit("a", 8)
+            order = []
+
+            async def waiter(name, cost):
+                ticket = await controller.admit(name, cost)
+                order.append(name)
+                return ticket
+
+            # 队首的大请求放不下时, 后面的小请求也排队, 不会插队饿死大请求
+            big = asyncio.create_task(waiter("b", 6))
+            small = asyncio.create_task(waiter("c", 1))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await controller.admit("d", 1)
+            self.assertGreaterEqual(ctx.exception.retry_after, 1)
+            self.assertEqual(controller.get_stats()["queue_length"], 2)
+
+            controller.release(first)
+            tickets = await asyncio.gather(big, small)
+            self.assertEqual(order, ["b", "c"])
+            for ticket in tickets:
+                controller.release(ticket)
+            self.assertEqual(controller.get_stats()["in_use"], 0)
+
+        asyncio.run(main())
+
+    def test_oversized_request_runs_alone_and_timeout_rejects(self):
+        controller = self._controller(queue_timeout=0.05)
+
+        async def main():
+            huge = await controller.admit("a", 50)
+            self.assertEqual(huge.cost, 10)
+            with self.assertRaises(AdmissionRejected):
+                await controller.admit("b", 0.5)
+            controller.release(huge)
+            controller.release(await controller.admit("b", 0.5))
+
+        asyncio.run(main())
+
+    def test_client_bucket_is_weighted_by_cost(self):
+        controller = self._controller(budget=1000, client_burst=10, client_rate=1)
+
+        async def main():
+            controller.release(await controller.admit("a", 8))
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await controller.admit("a", 8)
+            self.assertGreaterEqual(ctx.exception.retry_after, 6)
+            # 其他客户端不受影响, 小请求仍可通过
+            controller.release(await controller.admit("b", 8))
+            controller.release(await controller.admit("a", 1))
+
+        asyncio.run(main())
+
+
+class AdmissionDependencyTest(unittest.TestCase):
+    def _run(self, controller, second_status):
+        release = threading.Event()
+        app = FastAPI()
+
+        @app.post("/api/contour")
+        async def contour(_admission: Any = Depends(admission_control("contour"))):
+            # 与接口一致: 计算放入线程池, 事件循环可以继续处理其他请求
+            await run_in_threadpool(release.wait, 5)
+            return {"status": "success"}
+
+        async def main():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                body = {"resolution": 300, "method": "kriging"}
+                first = asyncio.create_task(client.post("/api/contour", json=body))
+                while controller.get_stats()["in_use"] == 0:
+                    await asyncio.sleep(0.01)
+                second = asyncio.create_task(client.post("/api/contour", json=body))
+                await asyncio.sleep(0.2)
+                stats = controller.get_stats()
+                release.set()
+                return await first, await second, stats
+
+        with mock.patch.object(admission, "_controller", controller), \
+                mock.patch("performance_config.ADMISSION_ENABLED", True):
+            first, second, stats = asyncio.run(main())
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, second_status)
+        return second, stats
+
+    def test_second_request_queues_while_first_runs(self):
+        controller = AdmissionController(budget=10, max_queue=4, queue_timeout=5, client_burst=1000, client_rate=10)
+        _, stats = self._run(controller, 200)
+        self.assertEqual(stats["queue_length"], 1)
+
+    def test_second_request_rejected_when_queue_full(self):
+        controller = AdmissionController(budget=10, max_queue=0, queue_timeout=5, client_burst=1000, client_rate=10)
+        second, _ = self._run(controller, 429)
+        self.assertGreaterEqual(int(second.headers["Retry-After"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import server
+import workspace as workspace_module
+from coal_seam_blocks import aggregator
+from coal_seam_blocks.aggregator import aggregate_borehole_sources, merge_with_coordinates, parse_borehole_sources
+from dataset_cache import DatasetCache
+from workspace import WorkspaceManager
+
+
+def _csv(text):
+    return text.encode("utf-8")
+
+
+BOREHOLES = [
+    ("ZK1.csv", _csv("序号(从下到上),名称,厚度/m\n1,砂岩,3.0\n2,煤,1.5\n3,泥岩,2.0\n")),
+    ("uploads/ZK2.csv", _csv("序号(从下到上),名称,厚度/m\n1,砂岩,4.0\n2,煤,1.2\n")),
+    # 坐标文件中没有 ZK9, ZK3 没有钻孔数据
+    ("ZK9.csv", _csv("序号(从下到上),名称,厚度/m\n1,砂岩,5.0\n2,煤,0.8\n")),
+]
+COORDS = ("坐标.csv", _csv("钻孔名,X,Y\nZK1,0,0\nZK2,10,0\nZK3,0,10\n"))
+
+
+class AggregatorTest(unittest.TestCase):
+    def test_sources_are_unified_and_named_after_files(self):
+        frames = parse_borehole_sources(BOREHOLES)
+        self.assertEqual([frame["钻孔名"].iloc[0] for frame in frames], ["ZK1", "ZK2", "ZK9"])
+        self.assertEqual(list(frames[0].columns), ["钻孔名", "序号", "名称", "厚度"])
+
+    def test_join_stats_report_unmatched_boreholes(self):
+        merged, coords, stats = aggregate_borehole_sources(BOREHOLES, COORDS)
+        self.assertEqual(len(merged), 5)
+        self.assertEqual(len(coords), 3)
+        self.assertEqual(sorted(merged["钻孔名"].unique()), ["ZK1", "ZK2"])
+        self.assertEqual(stats, {
+            "merge_key": "钻孔名",
+            "borehole_records": 7,
+            "coordinate_records": 3,
+            "merged_records": 5,
+            "lost_records": 2,
+            "unmatched_boreholes": ["ZK9"],
+        })
+
+    def test_no_matching_boreholes_is_an_error(self):
+        strata = parse_borehole_sources(BOREHOLES[2:])[0]
+        coords = parse_borehole_sources([COORDS], insert_borehole_name=False)[0]
+        with self.assertRaises(RuntimeError):
+            merge_with_coordinates(strata, coords)
+
+
+class LoadModelingColumnsTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.dataset_cache = DatasetCache(root / "datasets", 64 * 1024 * 1024)
+        manager = WorkspaceManager(memory_limit_mb=64, idle_timeout_seconds=60, snapshot_dir=root / "workspaces")
+        patches = [
+            mock.patch.object(workspace_module, "_manager", manager),
+            mock.patch.object(server, "get_dataset_cache", return_value=self.dataset_cache),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = TestClient(server.app)
+
+    def _upload(self):
+        files = [("borehole_files", (name, data, "text/csv")) for name, data in BOREHOLES]
+        files.append(("coords_file", (COORDS[0], COORDS[1], "text/csv")))
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/api/modeling/columns", files=files)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_upload_is_parsed_off_the_event_loop(self):
+        loops = []
+        original = aggregator.load_borehole_csv
+
+        def spy(*args, **kwargs):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(aggregator, "load_borehole_csv", spy):
+            body = self._upload()
+        self.assertEqual(loops, [None] * 4)
+        self.assertEqual((body["record_count"], body["join_stats"]["lost_records"]), (5, 2))
+        self.assertEqual(self.dataset_cache.get_stats()["entries"], 1)
+
+        # 同一批文件再次上传命中数据集缓存
+        with mock.patch.object(aggregator, "load_borehole_csv", spy):
+            self.assertEqual(self._upload()["join_stats"], body["join_stats"])
+        self.assertEqual(len(loops), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
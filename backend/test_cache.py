@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import cache as cache_module
+from cache import MemoryCache, bump_data_version, cache_database_query
+
+MB = 1024 * 1024
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = MemoryCache(
+            max_size=1000,
+            default_ttl=60,
+            max_bytes=3 * MB,
+            namespace_quotas={"interpolation": 2 * MB, "db": MB},
+        )
+
+    def _grid(self, mb):
+        return np.zeros(int(mb * MB) // 8)
+
+    def test_namespace_quota_evicts_only_its_own_entries(self):
+        self.cache.set("db:count", 42)
+        self.cache.set("interpolation:a", self._grid(0.9))
+        self.cache.set("interpolation:b", self._grid(0.9))
+        self.cache.get("interpolation:a")
+        self.cache.set("interpolation:c", self._grid(0.9))
+
+        self.assertIsNone(self.cache.get("interpolation:b"))
+        self.assertIsNotNone(self.cache.get("interpolation:a"))
+        self.assertEqual(self.cache.get("db:count"), 42)
+        stats = self.cache.get_stats()["namespaces"]["interpolation"]
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+        self.assertLessEqual(stats["bytes"], 2 * MB)
+
+    def test_global_budget_and_oversized_entries(self):
+        self.cache.set("models:a", self._grid(1.2))
+        self.cache.set("exports:b", self._grid(1.2))
+        self.cache.set("exports:c", self._grid(1.2))
+        self.assertIsNone(self.cache.get("models:a"))
+        self.assertLessEqual(self.cache.get_stats()["bytes"], 3 * MB)
+
+        # 超过配额的单个条目直接不缓存, 不挤掉已有条目
+        self.cache.set("db:huge", self._grid(1.5))
+        self.assertIsNone(self.cache.get("db:huge"))
+        self.assertIsNotNone(self.cache.get("exports:c"))
+        self.assertEqual(self.cache.get_stats()["namespaces"]["db"]["rejected"], 1)
+
+    def test_overwrite_and_delete_release_bytes(self):
+        self.cache.set("interpolation:a", self._grid(1))
+        self.cache.set("interpolation:a", self._grid(0.5))
+        self.assertLess(self.cache.get_stats()["bytes"], 0.6 * MB)
+        self.cache.delete("interpolation:a")
+        self.assertEqual(self.cache.get_stats()["bytes"], 0)
+
+    def test_delete_matching_prefix_and_wildcard(self):
+        self.cache.set("db:records_count:a", 1)
+        self.cache.set("db:records_cursor:a", 2)
+        self.cache.set("db:rock_count", 3)
+        self.cache.set("interpolation:records", self._grid(0.1))
+
+        self.assertEqual(self.cache.delete_matching("db:records_count"), 1)
+        self.assertEqual(self.cache.delete_matching("*records*"), 2)
+        self.assertEqual(self.cache.get("db:rock_count"), 3)
+        self.assertEqual(self.cache.get_stats()["namespaces"]["interpolation"]["bytes"], 0)
+
+
+class DataVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = MemoryCache()
+        patches = [
+            mock.patch.object(cache_module, "_global_cache", self.cache),
+            mock.patch.object(cache_module, "_data_versions", {}),
+            mock.patch("shared_state.is_shared_state_enabled", return_value=False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.calls = {"count": 0, "stats": 0}
+
+    def _count(self):
+        self.calls["count"] += 1
+        return 100 + self.calls["count"]
+
+    def _stats(self):
+        self.calls["stats"] += 1
+        return {"泥岩": self.calls["stats"]}
+
+    def test_writes_invalidate_only_dependent_queries(self):
+        self.assertEqual(cache_database_query("records_count", self._count, tables=("records",)), 101)
+        self.assertEqual(cache_database_query("lithology_stats", self._stats, tables=("lithology_stats",)), {"泥岩": 1})
+        self.assertEqual(cache_database_query("records_count", self._count, tables=("records",)), 101)
+
+        bump_data_version("records")
+        self.assertEqual(cache_database_query("records_count", self._count, tables=("records",)), 102)
+        self.assertEqual(cache_database_query("lithology_stats", self._stats, tables=("lithology_stats",)), {"泥岩": 1})
+        self.assertEqual(self.calls, {"count": 2, "stats": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import io
+import unittest
+
+from csv_reader import SNIFF_SAMPLE_BYTES, read_csv, sniff_encoding
+
+
+class CsvReaderTest(unittest.TestCase):
+    def test_sniffs_bom_and_gbk(self):
+        text = "钻孔名,厚度\nBK-1,3.5\n"
+        self.assertEqual(sniff_encoding(text.encode("utf-8-sig")), "utf-8-sig")
+        self.assertEqual(sniff_encoding(text.encode("utf-8")), "utf-8")
+        self.assertEqual(sniff_encoding(text.encode("gbk")), "gbk")
+
+    def test_reads_bytes_and_streams(self):
+        data = "钻孔名,岩性\nBK-1,细砂岩\n".encode("gbk")
+        self.assertEqual(read_csv(data).loc[0, "岩性"], "细砂岩")
+        self.assertEqual(read_csv(io.BytesIO(data)).loc[0, "钻孔名"], "BK-1")
+
+    def test_falls_back_when_invalid_bytes_follow_the_sample(self):
+        header = "name,value\n"
+        filler = "a,1\n" * (SNIFF_SAMPLE_BYTES // 4 + 1)
+        data = (header + filler + "泥岩,2\n").encode("gbk")
+        df = read_csv(data)
+        self.assertEqual(df.iloc[-1]["name"], "泥岩")
+
+
+if __name__ == "__main__":
+    unittest.main()
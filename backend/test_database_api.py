@@ -0,0 +1,281 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import cache as cache_module
+import db
+import server
+from cache import MemoryCache, bump_data_version, get_cache
+from lithology_stats import STATS_TABLE, rebuild_lithology_stats
+from records_fts import FTS_TABLE, rebuild_records_fts
+from records_import import bulk_load_records, create_import_engine
+from records_summary import SIDE_TABLE, SUMMARY_TABLE, rebuild_records_summary
+
+
+RECORDS = pd.DataFrame({
+    "矿名": ["大同矿", "大同矿", "平朔矿", "新矿", "新矿", "新矿"],
+    "省份": ["山西", "山西", "山西", "内蒙古自治区", "内蒙古", "陕西"],
+    "岩性": ["细砂岩", "泥岩", "3-1煤", "泥岩", "细砂岩", "粉砂岩"],
+    "埋深": [100.0, 200.0, 350.5, None, 400.0, 120.0],
+    "厚度": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+})
+
+
+class DatabaseApiTestCase(unittest.TestCase):
+    """在临时 SQLite 数据库上调用数据库接口"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.db_path = root / "database.db"
+        csv_path = root / "汇总表.csv"
+        RECORDS.to_csv(csv_path, index=False)
+        engine = create_import_engine(self.db_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            bulk_load_records(engine, csv_path)
+        engine.dispose()
+
+        patches = [
+            mock.patch.object(db, "DB_PATH", self.db_path),
+            mock.patch.object(db, "DATABASE_URL", f"sqlite:///{self.db_path}"),
+            mock.patch.object(db, "_engine", None),
+            mock.patch.object(db, "_read_engine", None),
+            mock.patch.object(db, "_SessionLocal", None),
+            mock.patch.object(db, "_ReadSessionLocal", None),
+            mock.patch.object(db, "_records_table", None),
+            mock.patch.object(cache_module, "_global_cache", MemoryCache()),
+            mock.patch.object(cache_module, "_data_versions", {}),
+            mock.patch("shared_state.is_shared_state_enabled", return_value=False),
+            mock.patch("performance_config.CACHE_L2_ENABLED", False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self._dispose_engines)
+        self.client = TestClient(server.app)
+
+    def _dispose_engines(self):
+        for engine in (db._engine, db._read_engine):
+            if engine is not None:
+                engine.dispose()
+
+    def query(self, sql, params=()):
+        with db.get_engine().connect() as connection:
+            return connection.exec_driver_sql(sql, params).fetchall()
+
+
+class DatabaseOverviewTest(DatabaseApiTestCase):
+    def test_overview_reads_summary(self):
+        response = self.client.get("/api/database/overview", params={"limit": 10})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["stats"], {"records": 6, "provinces": 3, "mines": 3, "lithologies": 4})
+        self.assertEqual(body["distribution"][0]["name"], "山西")
+        self.assertEqual(body["distribution"][0]["value"], 3)
+
+    def test_overview_builds_missing_summary(self):
+        with db.get_engine().begin() as connection:
+            connection.exec_driver_sql("DROP TABLE records_summary")
+        response = self.client.get("/api/database/overview")
+        self.assertEqual(response.json()["stats"]["records"], 6)
+        self.assertTrue(self.query("SELECT 1 FROM sqlite_master WHERE name = 'records_summary'"))
+
+
+class DatabaseSaveTest(DatabaseApiTestCase):
+    def _rows(self):
+        return {
+            row[0]: dict(zip(("矿名", "岩性", "埋深", "厚度"), row[1:]))
+            for row in self.query("SELECT ROWID, 矿名, 岩性, 埋深, 厚度 FROM records")
+        }
+
+    def _derived(self):
+        return {
+            "summary": self.query(f"SELECT kind, key, normalized, count FROM {SUMMARY_TABLE} ORDER BY kind, key"),
+            "normalized": self.query(f"SELECT rowid, province, lithology FROM {SIDE_TABLE} ORDER BY rowid"),
+            "stats": [
+                tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+                for row in self.query(
+                    f"SELECT lithology, property, count, mean, std, min, median, max FROM {STATS_TABLE} "
+                    "ORDER BY lithology, property"
+                )
+            ],
+            "fts": [
+                [row[0] for row in self.query(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?", (word,))]
+                for word in ("细砂岩", "中砂岩", "平朔矿")
+            ],
+        }
+
+    def _save(self, **payload):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/api/database/save", json=payload)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_partial_row_update_keeps_other_columns(self):
+        before = self._rows()
+        result = self._save(updated=[{"__rowid__": 1, "厚度": 9.5}, {"__rowid__": 2, "岩性": "泥岩", "埋深": 200}])
+        after = self._rows()
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(after[1], dict(before[1], 厚度=9.5))
+        self.assertEqual(after[2], before[2])
+
+    def test_empty_string_is_null_in_numeric_columns_only(self):
+        result = self._save(
+            updated=[{"__rowid__": 1, "矿名": "", "埋深": ""}],
+            inserted=[{"矿名": "", "岩性": "泥岩", "埋深": "", "厚度": 2.0}],
+        )
+        self.assertEqual((result["updated"], result["inserted"]), (1, 1))
+        rows = self._rows()
+        self.assertEqual((rows[1]["矿名"], rows[1]["埋深"]), ("", None))
+        self.assertEqual((rows[7]["矿名"], rows[7]["埋深"]), ("", None))
+        # NULL 与空字符串在表格中显示相同, 不视为修改
+        self.assertEqual(self._save(updated=[{"__rowid__": 4, "埋深": ""}])["updated"], 0)
+
+    def test_row_updated_and_deleted_is_only_deleted(self):
+        result = self._save(updated=[{"__rowid__": 3, "岩性": "泥岩"}, {"__rowid__": 5, "厚度": 7.0}], deleted=[3])
+        self.assertEqual((result["updated"], result["deleted"]), (1, 1))
+        rows = self._rows()
+        self.assertNotIn(3, rows)
+        self.assertEqual(rows[5]["厚度"], 7.0)
+
+    def test_incremental_maintenance_matches_rebuild(self):
+        self._save(
+            updated=[
+                {"__rowid__": 1, "岩性": "泥岩", "厚度": 3.5},
+                {"__rowid__": 2, "矿名": "平朔矿"},
+                {"__rowid__": 6, "省份": "陕西省", "埋深": 90.0},
+            ],
+            inserted=[{"矿名": "新矿", "省份": "山西", "岩性": "中砂岩", "埋深": 310.0, "厚度": 2.5}],
+            deleted=[5],
+        )
+        incremental = self._derived()
+        with db.get_engine().begin() as connection, contextlib.redirect_stdout(io.StringIO()):
+            connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')")
+            rebuild_records_summary(connection)
+            rebuild_lithology_stats(connection)
+            rebuild_records_fts(connection)
+        self.assertEqual(incremental, self._derived())
+        self.assertEqual(incremental["fts"], [[], [7], [2, 3]])
+
+
+class RecordStreamTest(DatabaseApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # 每批 4 行, 6 条记录跨两批
+        patch = mock.patch.object(server, "DB_STREAM_BATCH_SIZE", 4)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _get(self, path="/api/borehole-data", **params):
+        response = self.client.get(path, params=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response
+
+    def _parse(self, response, fmt):
+        if fmt == "json":
+            return response.json()
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        if fmt == "ndjson":
+            return lines
+        columns, rows = lines[0]["columns"], []
+        for batch in lines[1:]:
+            self.assertEqual(batch["offset"], len(rows))
+            rows.extend(
+                dict(zip(columns, values)) for values in zip(*(batch["data"][column] for column in columns))
+            )
+        return rows
+
+    def test_json_matches_json_response_bytes(self):
+        columns = [row[1] for row in self.query("PRAGMA table_info(records)")]
+        expected = [
+            {column: "" if value is None else value for column, value in zip(columns, row)}
+            for row in self.query("SELECT * FROM records ORDER BY ROWID")
+        ]
+        self.assertEqual(self._get().content, JSONResponse(expected).body)
+
+    def test_formats_parse_to_the_same_rows(self):
+        expected = self._parse(self._get(), "json")
+        self.assertEqual(len(expected), 6)
+        for fmt in ("ndjson", "columnar"):
+            with self.subTest(fmt=fmt):
+                self.assertEqual(self._parse(self._get(format=fmt), fmt), expected)
+
+    def test_projection_filters_and_limit(self):
+        rows = self._parse(self._get(columns="矿名,厚度", format="ndjson"), "ndjson")
+        self.assertEqual(list(rows[0]), ["矿名", "厚度"])
+        self.assertEqual([row["厚度"] for row in rows], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+        def thickness(**params):
+            return [row["厚度"] for row in self._parse(self._get(columns="厚度", format="columnar", **params), "columnar")]
+
+        self.assertEqual(thickness(province="内蒙古"), [4.0, 5.0])
+        self.assertEqual(thickness(lithology="泥岩"), [2.0, 4.0])
+        self.assertEqual(thickness(search="平朔矿"), [3.0])
+        self.assertEqual(thickness(province="山西", limit=2), [1.0, 2.0])
+        coal = self._parse(self._get("/api/coal-seam-data", columns="岩性"), "json")
+        self.assertEqual(coal, [{"岩性": "3-1煤"}])
+
+        response = self.client.get("/api/borehole-data", params={"columns": "矿名,不存在"})
+        self.assertEqual(response.status_code, 400)
+
+
+class RecordPagingTest(DatabaseApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # 删除留下的 ROWID 空洞让游标与 OFFSET 的差别可见
+        with db.get_engine().begin() as connection:
+            connection.exec_driver_sql("DELETE FROM records WHERE ROWID = 2")
+
+    def _page(self, **params):
+        response = self.client.get("/api/database/records", params=dict(page_size=2, **params))
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def _rowids(self, body):
+        return [row["__rowid__"] for row in body["records"]]
+
+    def test_cursor_pages_match_offset_pages(self):
+        with mock.patch.object(server, "CACHE_ENABLED", False):
+            offset_pages = [self._rowids(self._page(page=page)) for page in (1, 2, 3)]
+        self.assertEqual(offset_pages, [[1, 3], [4, 5], [6]])
+
+        # 顺序翻页: 第 2、3 页使用上一页缓存的结束游标
+        cached_pages = [self._rowids(self._page(page=page)) for page in (1, 2, 3)]
+        self.assertEqual(cached_pages, offset_pages)
+        self.assertTrue(any("records_cursor" in key for key in get_cache()._cache))
+
+        after, cursor_pages = None, []
+        while True:
+            body = self._page(**({"after": after} if after is not None else {}))
+            cursor_pages.append(self._rowids(body))
+            if not body["has_more"]:
+                break
+            after = body["next_cursor"]
+        self.assertEqual(cursor_pages, offset_pages)
+
+    def test_counts_follow_data_version(self):
+        self.assertEqual(self._page()["total"], 5)
+        self.assertEqual(self._page(search="大同")["total"], 1)
+        with db.get_engine().begin() as connection:
+            connection.exec_driver_sql("INSERT INTO records (矿名, 岩性) VALUES ('大同矿', '泥岩')")
+
+        # 写入未递增版本时仍命中缓存
+        self.assertEqual(self._page()["total"], 5)
+        self.assertEqual(self._page(search="大同")["total"], 1)
+        bump_data_version("records")
+        self.assertEqual(self._page()["total"], 6)
+        self.assertEqual(self._page(search="大同")["total"], 2)
+        self.assertEqual(self._rowids(self._page(page=3)), [6, 7])
+
+
+if __name__ == "__main__":
+    unittest.main()
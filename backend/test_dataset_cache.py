@@ -0,0 +1,106 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import dataset_cache
+from dataset_cache import CACHE_META, DATASET_FORMAT_VERSION, DatasetCache, fingerprint_sources, get_dataset_cache
+
+
+def _frame(rows, start=0.0):
+    return pd.DataFrame({"钻孔名": ["ZK1"] * rows, "厚度": np.arange(rows, dtype=float) + start})
+
+
+class DatasetCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_hit_returns_frames_and_meta(self):
+        cache = DatasetCache(self.root, 64 * 1024 * 1024)
+        merged, coords = _frame(100), pd.DataFrame({"钻孔名": ["ZK1"], "x": [1.0], "y": [2.0]})
+        cache.put("with-coords", merged, coords, {"columns": list(merged.columns)})
+        cache.put("no-coords", merged, None, {})
+
+        self.assertIsNone(cache.get("missing"))
+        hit_merged, hit_coords, meta = cache.get("with-coords")
+        pd.testing.assert_frame_equal(hit_merged, merged)
+        pd.testing.assert_frame_equal(hit_coords, coords)
+        self.assertEqual(meta["columns"], ["钻孔名", "厚度"])
+        self.assertIsNone(cache.get("no-coords")[1])
+        stats = cache.get_stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (2, 2, 1))
+
+    def test_entries_from_another_format_version_are_misses(self):
+        cache = DatasetCache(self.root, 64 * 1024 * 1024)
+        cache.put("key", _frame(10), None, {})
+        meta_path = self.root / "key" / CACHE_META
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self.assertEqual(meta["format_version"], DATASET_FORMAT_VERSION)
+        self.assertIsNotNone(cache.get("key"))
+
+        meta_path.write_text(json.dumps(dict(meta, format_version="0")), encoding="utf-8")
+        self.assertIsNone(cache.get("key"))
+
+    def test_entry_removed_during_read_is_a_miss(self):
+        cache = DatasetCache(self.root, 64 * 1024 * 1024)
+        cache.put("key", _frame(10), None, {})
+        with mock.patch.object(Path, "touch", side_effect=FileNotFoundError):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get_stats()["misses"], 1)
+
+    def test_key_follows_file_contents_and_names(self):
+        def key(*files, mode="traditional"):
+            return fingerprint_sources([(name, io.BytesIO(data)) for name, data in files], mode)
+
+        content = "钻孔名,厚度\nZK1,1.5\n".encode("utf-8")
+        base = key(("ZK1.csv", content))
+        self.assertEqual(key(("ZK1.csv", content)), base)
+        # 钻孔名缺失时由文件名补充, 同样内容换文件名得到的数据集不同
+        self.assertNotEqual(key(("ZK2.csv", content)), base)
+        self.assertNotEqual(key(("ZK1.csv", content + b"ZK1,2.0\n")), base)
+        self.assertNotEqual(key(("ZK1.csv", content), mode="merged"), base)
+        # 文件边界参与哈希: 内容在两个文件之间挪动不会碰撞
+        self.assertNotEqual(key(("a.csv", b"ab"), ("b.csv", b"c")), key(("a.csv", b"a"), ("b.csv", b"bc")))
+
+        stream = io.BytesIO(content)
+        stream.seek(5)
+        self.assertEqual(fingerprint_sources([("ZK1.csv", stream)], "traditional"), base)
+        self.assertEqual(stream.tell(), 0)
+
+    def test_least_recently_used_entry_is_evicted_by_max_mb(self):
+        with mock.patch("performance_config.DATASET_CACHE_DIR", str(self.root)), \
+                mock.patch("performance_config.DATASET_CACHE_MAX_MB", 1), \
+                mock.patch("performance_config.DATASET_CACHE_ENABLED", True), \
+                mock.patch.object(dataset_cache, "_dataset_cache", None):
+            cache = get_dataset_cache()
+            self.assertEqual(cache.max_bytes, 1024 * 1024)
+
+            # 每个条目约 0.36MB, 三个超过 1MB 上限
+            now = time.time()
+            for age, key in ((30, "a"), (20, "b")):
+                cache.put(key, _frame(30_000, start=age), None, {})
+                os.utime(self.root / key / CACHE_META, (now - age, now - age))
+            self.assertIsNotNone(cache.get("a"))
+            with contextlib.redirect_stdout(io.StringIO()):
+                cache.put("c", _frame(30_000), None, {})
+
+            self.assertTrue((self.root / "a").exists())
+            self.assertFalse((self.root / "b").exists())
+            self.assertIsNone(cache.get("b"))
+            self.assertLessEqual(cache.get_stats()["size_mb"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import cache as cache_module
+import disk_cache
+from cache import MemoryCache
+from disk_cache import DiskCache
+
+MB = 1024 * 1024
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.disk = DiskCache(self.root, int(3.5 * MB))
+
+    def test_values_survive_reopen(self):
+        grid = np.arange(12, dtype=np.float32).reshape(3, 4)
+        frame = pd.DataFrame({"岩性": ["泥岩", "煤"], "厚度": [1.5, 2.0]})
+        self.disk.set("interpolation:grid", grid, ttl=60)
+        self.disk.set("models:frame", frame, ttl=60)
+        self.disk.set("exports:file", b"f3grid", ttl=60)
+        self.disk.set("models:meta", {"nx": 4, "layers": ["煤"]}, ttl=60)
+
+        reopened = DiskCache(self.root, int(3.5 * MB))
+        np.testing.assert_array_equal(reopened.get("interpolation:grid"), grid)
+        self.assertFalse(reopened.get("interpolation:grid").flags.writeable)
+        pd.testing.assert_frame_equal(reopened.get("models:frame"), frame)
+        self.assertEqual(reopened.get("exports:file"), b"f3grid")
+        self.assertEqual(reopened.get("models:meta"), {"nx": 4, "layers": ["煤"]})
+
+    def test_ttl_and_lru_by_bytes(self):
+        self.disk.set("interpolation:expired", np.zeros(10), ttl=-1)
+        self.assertIsNone(self.disk.get("interpolation:expired"))
+
+        for name in ("a", "b", "c"):
+            self.disk.set(f"interpolation:{name}", np.zeros(MB // 8), ttl=60)
+            time.sleep(0.01)
+        self.disk.get("interpolation:a")
+        self.disk.set("interpolation:d", np.zeros(MB // 8), ttl=60)
+
+        self.assertIsNone(self.disk.get("interpolation:b"))
+        self.assertIsNotNone(self.disk.get("interpolation:a"))
+        self.assertLessEqual(self.disk.get_stats()["size_mb"], 3.5)
+
+    def test_delete_prefix(self):
+        for key in ("interpolation:a:1", "interpolation:a:2", "interpolation:b:1", "models:a:1"):
+            self.disk.set(key, np.zeros(4), ttl=60)
+        self.assertEqual(self.disk.delete_prefix("interpolation:a"), 2)
+        self.assertEqual(self.disk.delete_prefix("interpolation:", lambda key: key.endswith(":9")), 0)
+        self.assertIsNone(self.disk.get("interpolation:a:1"))
+        self.assertIsNotNone(self.disk.get("interpolation:b:1"))
+        self.assertIsNotNone(self.disk.get("models:a:1"))
+
+    def test_reads_are_not_blocked_by_a_slow_write(self):
+        self.disk.set("interpolation:a", np.zeros(4), ttl=60)
+        writing = threading.Event()
+        release = threading.Event()
+        write_value = disk_cache._write_value
+
+        def slow_write(value, directory):
+            writing.set()
+            release.wait(5)
+            return write_value(value, directory)
+
+        with mock.patch.object(disk_cache, "_write_value", slow_write):
+            writer = threading.Thread(target=self.disk.set, args=("interpolation:b", np.ones(4), 60))
+            writer.start()
+            self.assertTrue(writing.wait(5))
+            started = time.monotonic()
+            self.assertTrue(self.disk.contains("interpolation:a"))
+            self.assertIsNotNone(self.disk.get("interpolation:a"))
+            self.assertLess(time.monotonic() - started, 1)
+            release.set()
+            writer.join()
+        np.testing.assert_array_equal(self.disk.get("interpolation:b"), np.ones(4))
+
+    def test_memory_cache_demotes_evicted_entries(self):
+        demoted = []
+        cache = MemoryCache(
+            max_bytes=int(2.5 * MB),
+            on_evict=lambda key, value, expires_at, nbytes: demoted.append(key),
+        )
+        cache.set("interpolation:a", np.zeros(MB // 8))
+        cache.set("interpolation:b", np.zeros(MB // 8))
+        cache.set("interpolation:huge", np.zeros(3 * MB // 8))
+        self.assertEqual(demoted, ["interpolation:huge"])
+        cache.set("interpolation:c", np.zeros(MB // 8))
+        self.assertEqual(demoted, ["interpolation:huge", "interpolation:a"])
+
+    def test_promotion_counts_logical_bytes(self):
+        cache = MemoryCache(namespace_quotas={"interpolation": 2 * MB})
+        grid = np.zeros(MB // 8)
+        self.disk.set("interpolation:grid", grid, ttl=60)
+        with mock.patch("disk_cache.get_disk_cache", return_value=self.disk):
+            promoted = cache_module._promote_from_l2(cache, "interpolation:grid")
+        np.testing.assert_array_equal(promoted, grid)
+        self.assertFalse(promoted.flags.writeable)
+        namespace = cache.get_stats()["namespaces"]["interpolation"]
+        self.assertEqual(namespace["entries"], 1)
+        self.assertGreaterEqual(namespace["bytes"], grid.nbytes)
+
+    def test_write_through_and_demotion_use_l2_ttl(self):
+        cache = MemoryCache(default_ttl=300)
+        patches = [
+            mock.patch("disk_cache.get_disk_cache", return_value=self.disk),
+            mock.patch.object(cache_module, "_global_cache", cache),
+            mock.patch.object(cache_module, "_l2_writer", None),
+            mock.patch("performance_config.CACHE_ENABLED", True),
+            mock.patch("performance_config.CACHE_L2_TTL_SECONDS", 86400),
+            mock.patch("shared_state.is_shared_state_enabled", return_value=False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        @cache_module.cached(ttl=60, key_prefix="interpolation")
+        def grid():
+            return np.zeros(MB // 8)
+
+        grid()
+        cache_module._l2_writer.shutdown(wait=True)
+        key = next(iter(cache._cache))
+        _, expires_at = self.disk.get_with_expiry(key)
+        self.assertGreater(expires_at - time.time(), 86000)
+
+        # 提升回内存时仍按内存 TTL 过期
+        cache.clear()
+        cache_module._promote_from_l2(cache, key)
+        self.assertLessEqual(cache._cache[key]["expires_at"] - time.time(), 300)
+
+        cache_module._demote_to_l2("interpolation:demoted", np.zeros(MB // 8), time.time() + 10, MB)
+        _, expires_at = self.disk.get_with_expiry("interpolation:demoted")
+        self.assertGreater(expires_at - time.time(), 86000)
+
+
+if __name__ == "__main__":
+    unittest.main()
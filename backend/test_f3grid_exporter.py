@@ -0,0 +1,71 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from exporters.f3grid_exporter import F3GridExporter
+
+
+def _layers(thickness):
+    grid_x, grid_y = np.meshgrid(np.arange(4.0), np.arange(3.0) * 10)
+    bottom = np.zeros_like(grid_x)
+    layers = []
+    for index, value in enumerate(thickness):
+        top = bottom + value
+        layers.append({
+            "name": f"砂岩{index}",
+            "grid_x": grid_x,
+            "grid_y": grid_y,
+            "top_surface_z": top,
+            "bottom_surface_z": bottom.copy(),
+        })
+        bottom = top
+    return {"layers": layers}
+
+
+class F3GridExporterTest(unittest.TestCase):
+    def _export(self, data, options=None):
+        exporter = F3GridExporter()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.f3grid")
+            with contextlib.redirect_stdout(io.StringIO()):
+                exporter.export(data, path, options)
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        return exporter, lines
+
+    def test_layers_share_interface_nodes(self):
+        exporter, lines = self._export(_layers([1.0, 2.0]))
+        gridpoints = [line.split() for line in lines if line.startswith("G ")]
+        zones = [line.split() for line in lines if line.startswith("Z B8 ")]
+        # 3 个层面 × 12 个节点, 每层 2×3 个单元
+        self.assertEqual(len(gridpoints), 36)
+        self.assertEqual(gridpoints[13], ["G", "14", "1.000000", "0.000000", "1.000000"])
+        self.assertEqual(len(zones), 12)
+        # B8 顺序: bottom[SW, SE, NW, NE] + top[SW, SE, NW, NE]
+        self.assertEqual(zones[0], ["Z", "B8", "1", "1", "2", "5", "6", "13", "14", "17", "18"])
+        self.assertEqual(zones[6][3:7], zones[0][7:11])
+        group = lines.index("ZGROUP 'sandstone1'")
+        self.assertEqual(lines[group + 1], "7 8 9 10 11 12")
+
+    def test_filter_keeps_zone_ids_and_groups(self):
+        data = _layers([1.0, 2.0])
+        data["layers"][1]["top_surface_z"][:, :2] = data["layers"][1]["bottom_surface_z"][:, :2]
+        exporter, lines = self._export(data, {"filter_bad_zones": True})
+        self.assertEqual(len(exporter.zones), 10)
+        self.assertEqual(exporter.zone_ids[6:].tolist(), [8, 9, 11, 12])
+        group = lines.index("ZGROUP 'sandstone1'")
+        self.assertEqual(lines[group + 1], "8 9 11 12")
+
+    def test_interface_gap_is_rejected(self):
+        data = _layers([1.0, 2.0])
+        data["layers"][1]["bottom_surface_z"] = data["layers"][1]["bottom_surface_z"] + 0.5
+        with self.assertRaises(ValueError):
+            self._export(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
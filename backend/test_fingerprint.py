@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from cache import MemoryCache
+from fingerprint import fingerprint
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_arrays_hash_full_buffer_dtype_and_shape(self):
+        grid = np.arange(100000, dtype=np.float64)
+        changed = grid.copy()
+        changed[50000] += 1e-9
+        self.assertEqual(fingerprint(grid), fingerprint(grid.copy()))
+        # 旧的 json.dumps(default=str) 键会把中间元素省略成 "..."
+        self.assertEqual(str(grid), str(changed))
+        self.assertNotEqual(fingerprint(grid), fingerprint(changed))
+        self.assertNotEqual(fingerprint(grid), fingerprint(grid.astype(np.float32)))
+        self.assertNotEqual(fingerprint(grid), fingerprint(grid.reshape(100, 1000)))
+
+        matrix = np.arange(12.0).reshape(3, 4)
+        self.assertEqual(fingerprint(matrix.T), fingerprint(np.ascontiguousarray(matrix.T)))
+
+    def test_frames_include_index_and_columns(self):
+        frame = pd.DataFrame({"岩性": ["泥岩", "煤"], "厚度": [1.5, 2.0]})
+        self.assertEqual(fingerprint(frame), fingerprint(frame.copy()))
+        self.assertNotEqual(fingerprint(frame), fingerprint(frame.set_axis([5, 6])))
+        self.assertNotEqual(fingerprint(frame), fingerprint(frame.rename(columns={"厚度": "埋深"})))
+        self.assertNotEqual(fingerprint(frame), fingerprint(frame.assign(岩性=["泥岩", "砂岩"])))
+        self.assertNotEqual(fingerprint(frame["厚度"]), fingerprint(frame["厚度"].rename("埋深")))
+
+    def test_scalars_and_containers(self):
+        self.assertNotEqual(fingerprint(1), fingerprint(1.0))
+        self.assertNotEqual(fingerprint("1"), fingerprint(1))
+        self.assertNotEqual(fingerprint(("ab", "c")), fingerprint(("a", "bc")))
+        self.assertEqual(fingerprint(a=1, b=[2, 3]), fingerprint(b=[2, 3], a=1))
+        self.assertEqual(fingerprint({"b": 1, "a": 2}), fingerprint({"a": 2, "b": 1}))
+
+    def test_cache_keys_use_content(self):
+        cache = MemoryCache()
+        x = np.linspace(0, 1, 5000)
+        self.assertEqual(cache._generate_key(x, method="kriging"), cache._generate_key(x.copy(), method="kriging"))
+        self.assertNotEqual(cache._generate_key(x, method="kriging"), cache._generate_key(x[::-1], method="kriging"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from lithology_stats import pivot_stats, read_stats_table, rebuild_lithology_stats, refresh_lithology_stats
+from property_fill import build_lithology_stats
+
+
+class LithologyStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", future=True)
+        records = pd.DataFrame({
+            "岩性": ["细砂岩", "细砂岩 ", "3-1煤", "二煤层", "泥岩", "泥岩"],
+            "泊松比": [0.2, 0.3, 0.35, 0.33, 0.25, None],
+            "内摩擦角": [30, 32, 20, "22", 28, 27],
+            "文献": ["a", "b", "c", "d", "e", "f"],
+        })
+        with self.engine.begin() as connection:
+            records.to_sql("records", connection, index=False)
+            rebuild_lithology_stats(connection)
+
+    def _records(self):
+        with self.engine.connect() as connection:
+            return pd.read_sql(text("SELECT * FROM records"), connection)
+
+    def _stats(self):
+        with self.engine.begin() as connection:
+            return read_stats_table(connection).drop(columns="updated_at").sort_values(["lithology", "property"])
+
+    def test_matches_grouped_median(self):
+        stats = self._stats()
+        self.assertEqual(sorted(stats["property"].unique()), ["内摩擦角", "泊松比"])
+        expected = build_lithology_stats(self._records(), ["泊松比", "内摩擦角"])
+        pd.testing.assert_frame_equal(
+            pivot_stats(stats, "median", ["泊松比", "内摩擦角"]), expected, check_like=True
+        )
+        coal = stats[(stats["lithology"] == "煤") & (stats["property"] == "泊松比")].iloc[0]
+        self.assertEqual(coal["count"], 2)
+
+    def test_incremental_refresh_matches_rebuild(self):
+        with self.engine.begin() as connection:
+            connection.execute(text('UPDATE records SET "泊松比" = 0.4 WHERE "岩性" = \'3-1煤\''))
+            connection.execute(text('DELETE FROM records WHERE "岩性" = \'泥岩\''))
+            refresh_lithology_stats(connection, ["3-1煤", "泥岩"])
+        refreshed = self._stats().reset_index(drop=True)
+
+        with self.engine.begin() as connection:
+            rebuild_lithology_stats(connection)
+        rebuilt = self._stats().reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(refreshed, rebuilt)
+        self.assertNotIn("泥岩", set(refreshed["lithology"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from memory_estimator import MB, estimate_peak_bytes, plan_request
+
+
+class MemoryEstimatorTest(unittest.TestCase):
+    def test_estimate_grows_with_grid_layers_and_export(self):
+        base = estimate_peak_bytes(300, "linear", 150)
+        self.assertGreater(estimate_peak_bytes(300, "linear", 300), 3 * base)
+        self.assertGreater(estimate_peak_bytes(300, "linear", 150, layers=10), base)
+        self.assertGreater(estimate_peak_bytes(300, "linear", 150, exporter="f3grid"), base)
+        self.assertGreater(estimate_peak_bytes(300, "kriging", 150), base)
+        self.assertLess(estimate_peak_bytes(300, "linear", 150, layers=10, itemsize=4),
+                        estimate_peak_bytes(300, "linear", 150, layers=10))
+
+    def test_admit_within_budget(self):
+        plan = plan_request(300, "Linear", 150, layers=3, budget_bytes=1024 * MB)
+        self.assertEqual(plan.decision, "admit")
+        self.assertEqual((plan.resolution, plan.method, plan.dtype), (150, "linear", "float64"))
+        self.assertEqual(plan.changes, [])
+
+    def test_degrades_float32_then_local_method_then_resolution(self):
+        args = dict(points=400, method="linear", resolution=200, layers=20, exporter="block_model")
+        full = estimate_peak_bytes(**args)
+        half = estimate_peak_bytes(**args, itemsize=4)
+
+        plan = plan_request(**args, budget_bytes=(full + half) // 2)
+        self.assertEqual((plan.decision, plan.dtype, plan.resolution), ("degrade", "float32", 200))
+        self.assertIs(plan.numpy_dtype, np.float32)
+
+        kriging = dict(args, method="kriging")
+        plan = plan_request(**kriging, budget_bytes=half + 1)
+        self.assertEqual((plan.method, plan.resolution), ("linear", 200))
+
+        budget = estimate_peak_bytes(**dict(args, resolution=150), itemsize=4)
+        plan = plan_request(**args, budget_bytes=budget)
+        self.assertEqual(plan.decision, "degrade")
+        self.assertEqual(plan.resolution, 150)
+        self.assertLessEqual(plan.estimated_bytes, budget)
+        self.assertEqual(plan.to_dict()["requested_resolution"], 200)
+
+    def test_rejects_when_minimum_does_not_fit(self):
+        plan = plan_request(400, "linear", 200, layers=20, exporter="f3grid", budget_bytes=1 * MB)
+        self.assertEqual(plan.decision, "reject")
+        self.assertGreater(plan.estimated_bytes, plan.budget_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
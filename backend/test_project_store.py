@@ -0,0 +1,105 @@
+import asyncio
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import server
+import workspace as workspace_module
+from coal_seam_blocks.modeling import BlockModel
+from project_store import ProjectStore
+from workspace import SESSION_HEADER, ModelingState, WorkspaceManager
+
+
+class ProjectStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = ProjectStore(Path(self._tmp.name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_saved_project_reopens_with_index_and_models(self):
+        state = ModelingState()
+        state.set_dataset(
+            pd.DataFrame({
+                "序号": [2, 1, 2, 1],
+                "名称": ["煤", "砂岩", " 煤", "砂岩"],
+                "厚度": [1.5, 3.0, 2.0, None],
+            }),
+            None,
+        )
+        state.last_selected_seam_column = "名称"
+        surface = np.arange(9, dtype=float).reshape(3, 3)
+        state.last_block_models = [BlockModel("砂岩", 2, surface + 1, surface), BlockModel("煤", 2, surface + 3, surface + 1)]
+        state.last_grid_x = np.linspace(0, 1, 3)
+        state.last_grid_y = np.linspace(0, 1, 3)
+
+        meta = self.store.save("示例", state)
+        self.assertEqual([p["id"] for p in self.store.list_projects()], [meta["id"]])
+
+        reopened = self.store.open(meta["id"])
+        pd.testing.assert_frame_equal(reopened.merged_df, state.merged_df)
+        self.assertEqual(reopened.get_seam_index("名称").ordered_values(), ["砂岩", "煤"])
+        self.assertEqual(reopened.get_seam_index("名称").rows_for(["煤"]).tolist(), [0, 2])
+        self.assertEqual([model.name for model in reopened.last_block_models], ["砂岩", "煤"])
+        np.testing.assert_array_equal(reopened.last_block_models[1].thickness_grid, np.full((3, 3), 2.0))
+
+        self.store.delete(meta["id"])
+        self.assertEqual(self.store.list_projects(), [])
+
+
+class ProjectEndpointTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.store = ProjectStore(root / "projects")
+        self.loops = []
+        manager = WorkspaceManager(memory_limit_mb=64, idle_timeout_seconds=60, snapshot_dir=root / "workspaces")
+        patches = [
+            mock.patch.object(workspace_module, "_manager", manager),
+            mock.patch.object(server, "get_project_store", return_value=self.store),
+            mock.patch.object(self.store, "save", side_effect=self._record(self.store.save)),
+            mock.patch.object(self.store, "delete", side_effect=self._record(self.store.delete)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = TestClient(server.app)
+
+    def _record(self, method):
+        def wrapper(*args, **kwargs):
+            try:
+                self.loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                self.loops.append(None)
+            return method(*args, **kwargs)
+        return wrapper
+
+    def test_save_and_delete_run_off_the_event_loop(self):
+        session_id = "a" * 32
+        manager = workspace_module.get_workspace_manager()
+        workspace = manager.acquire(session_id)
+        workspace.modeling.set_dataset(pd.DataFrame({"名称": ["煤", "砂岩"], "厚度": [1.5, 3.0]}), None)
+        manager.release(workspace)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/api/projects", json={"name": "示例"}, headers={SESSION_HEADER: session_id})
+        self.assertEqual(response.status_code, 200, response.text)
+        project_id = response.json()["project"]["id"]
+        self.assertEqual(response.json()["project"]["record_count"], 2)
+        self.assertEqual(self.client.delete(f"/api/projects/{project_id}").status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/projects/{project_id}").status_code, 404)
+        self.assertEqual(self.loops, [None, None, None])
+        self.assertEqual(self.store.list_projects(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
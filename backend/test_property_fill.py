@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from property_fill import build_lithology_stats, fill_properties, normalize_lithology_name, summarize_fill
+
+
+class PropertyFillTest(unittest.TestCase):
+    def setUp(self):
+        self.rock_db = pd.DataFrame({
+            "岩性": ["细砂岩", " 细砂岩", "3-1煤", "泥岩"],
+            "泊松比": [0.2, 0.3, 0.35, np.nan],
+        })
+
+    def test_normalizes_coal_names(self):
+        self.assertEqual(normalize_lithology_name("二煤层"), "煤")
+        self.assertEqual(normalize_lithology_name(" 细砂岩 "), "细砂岩")
+
+    def test_fills_missing_and_zero_cells_and_reports_them(self):
+        stats = build_lithology_stats(self.rock_db)
+        self.assertEqual(list(stats.index), ["煤", "细砂岩"])
+
+        df = pd.DataFrame({"岩层名称": ["细砂岩", "5煤", "泥岩", "细砂岩"], "泊松比": [np.nan, 0, np.nan, 0.25]})
+        filled, mask = fill_properties(df, stats, "岩层名称")
+
+        self.assertEqual(filled["泊松比"].tolist()[:2], [0.25, 0.35])
+        self.assertTrue(np.isnan(filled.loc[2, "泊松比"]))
+        self.assertEqual(filled.loc[3, "泊松比"], 0.25)
+        self.assertEqual(summarize_fill(mask)["filled_cells"], {"泊松比": [0, 1]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from records_fts import count_fts_matches, fts_query, rebuild_records_fts
+
+
+class RecordsFtsTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", future=True)
+        records = pd.DataFrame({
+            "矿名": ["大同煤矿", "Datong Mine", "平朔矿"],
+            "岩性": ["细砂岩", "粉砂岩", "泥岩"],
+            "泊松比": [0.2, 0.3, 0.25],
+        })
+        with self.engine.begin() as connection:
+            records.to_sql("records", connection, index=False)
+            self.assertTrue(rebuild_records_fts(connection))
+
+    def _count(self, keyword):
+        with self.engine.connect() as connection:
+            return count_fts_matches(connection, fts_query(keyword))
+
+    def test_short_keywords_are_left_to_like(self):
+        self.assertIsNone(fts_query("砂岩"))
+        self.assertEqual(fts_query(' a"b '), '"a""b"')
+
+    def test_substring_match_is_case_insensitive(self):
+        self.assertEqual(self._count("细砂岩"), 1)
+        self.assertEqual(self._count("datong"), 1)
+        self.assertEqual(self._count("0.2"), 0)
+
+    def test_triggers_keep_index_in_sync(self):
+        with self.engine.begin() as connection:
+            connection.execute(text('UPDATE records SET "岩性" = \'细砂岩\' WHERE "岩性" = \'泥岩\''))
+            connection.execute(text('DELETE FROM records WHERE "矿名" = \'大同煤矿\''))
+            connection.execute(text('INSERT INTO records ("矿名", "岩性") VALUES (\'新矿\', \'细砂岩\')'))
+        self.assertEqual(self._count("细砂岩"), 2)
+        self.assertEqual(self._count("大同煤"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
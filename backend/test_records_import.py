@@ -0,0 +1,91 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+import records_import
+from records_import import LOCK_TABLE, STAGING_TABLE, ImportSkipped, bulk_load_records, create_import_engine
+
+
+class RecordsImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        self.csv_path = root / "汇总表.csv"
+        # 后续分块才出现小数、缺失值和文本, 需要放宽首块推断的列类型
+        pd.DataFrame({
+            "矿名": ["大同矿", "平朔矿", "大同矿", "新矿", "新矿"],
+            "岩性": ["细砂岩", "泥岩", "3-1煤", "泥岩", "细砂岩"],
+            "埋深": ["100", "200", "350.5", "", "400"],
+            "厚度": ["1", "2", "3", "4", "约5"],
+        }).to_csv(self.csv_path, index=False, encoding="utf-8-sig")
+        self.engine = create_import_engine(root / "database.db")
+        self.addCleanup(self.engine.dispose)
+
+    def _read(self):
+        with self.engine.connect() as connection:
+            schema = [tuple(row[1:3]) for row in connection.exec_driver_sql("PRAGMA table_info(records)")]
+            records = pd.read_sql("SELECT * FROM records", connection)
+        return schema, records
+
+    def test_chunked_load_matches_whole_file_import(self):
+        rows = bulk_load_records(self.engine, self.csv_path, chunk_size=2)
+        schema, records = self._read()
+
+        expected = pd.read_csv(self.csv_path, encoding="utf-8-sig")
+        with self.engine.begin() as connection:
+            expected.to_sql("expected", connection, index=False)
+            expected_schema = [tuple(row[1:3]) for row in connection.exec_driver_sql("PRAGMA table_info(expected)")]
+            expected_records = pd.read_sql("SELECT * FROM expected", connection)
+
+        self.assertEqual(rows, 5)
+        self.assertEqual(schema, expected_schema)
+        pd.testing.assert_frame_equal(records, expected_records)
+
+    def test_reimport_replaces_table_and_builds_derived_tables(self):
+        bulk_load_records(self.engine, self.csv_path)
+        pd.DataFrame({"矿名": ["唯一矿"], "岩性": ["泥岩"]}).to_csv(self.csv_path, index=False)
+        bulk_load_records(self.engine, self.csv_path)
+
+        _, records = self._read()
+        with self.engine.connect() as connection:
+            tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master")}
+            summary_total = connection.exec_driver_sql(
+                "SELECT count FROM records_summary WHERE kind = 'total'"
+            ).scalar()
+        self.assertEqual(records["矿名"].tolist(), ["唯一矿"])
+        self.assertNotIn(STAGING_TABLE, tables)
+        self.assertTrue({"idx_mine", "idx_lithology", "records_fts", "records_normalized"} <= tables)
+        self.assertEqual(summary_total, 1)
+
+    def test_concurrent_import_is_skipped_while_claimed(self):
+        self.assertTrue(records_import._claim_import(self.engine, "other-worker", lease_seconds=600))
+        with self.assertRaises(ImportSkipped):
+            bulk_load_records(self.engine, self.csv_path)
+        with self.engine.connect() as connection:
+            tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master")}
+        self.assertNotIn("records", tables)
+
+        # 持有进程停止续期后租约过期, 可被接管
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(f"UPDATE {LOCK_TABLE} SET heartbeat = ?", (time.time() - 3600,))
+        self.assertEqual(bulk_load_records(self.engine, self.csv_path), 5)
+        with self.engine.connect() as connection:
+            self.assertIsNone(connection.exec_driver_sql(f"SELECT owner FROM {LOCK_TABLE}").fetchone())
+
+    def test_startup_import_skips_when_another_worker_finished(self):
+        bulk_load_records(self.engine, self.csv_path)
+        with mock.patch.object(records_import, "_bulk_load_claimed") as load:
+            with self.assertRaises(ImportSkipped):
+                bulk_load_records(self.engine, self.csv_path, replace=False)
+        load.assert_not_called()
+        _, records = self._read()
+        self.assertEqual(len(records), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
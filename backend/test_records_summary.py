@@ -0,0 +1,60 @@
+import unittest
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from records_summary import (
+    SUMMARY_TABLE,
+    apply_records_changes,
+    read_lithology_counts,
+    read_overview,
+    read_summary_rows,
+    rebuild_records_summary,
+)
+
+
+class RecordsSummaryTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", future=True)
+        records = pd.DataFrame({
+            "矿名": ["大同矿", "大同矿", "平朔矿", None],
+            "份": ["山西省", "山西", "内蒙古自治区", None],
+            "岩性": ["细砂岩", "3-1煤", "二煤层", " 细砂岩"],
+        })
+        with self.engine.begin() as connection:
+            records.to_sql("records", connection, index=False)
+            rebuild_records_summary(connection)
+
+    def _snapshot(self):
+        with self.engine.connect() as connection:
+            summary = pd.read_sql(text(f"SELECT * FROM {SUMMARY_TABLE} ORDER BY kind, key"), connection)
+            side = pd.read_sql(text("SELECT * FROM records_normalized ORDER BY rowid"), connection)
+        return summary, side
+
+    def test_overview_counts_normalized_values(self):
+        with self.engine.connect() as connection:
+            overview = read_overview(connection, 10)
+            lithologies = read_lithology_counts(connection)
+        self.assertEqual(overview["stats"], {"records": 4, "provinces": 2, "mines": 2, "lithologies": 2})
+        self.assertEqual({item["name"] for item in overview["distribution"]}, {"山西", "内蒙古"})
+        self.assertEqual(lithologies, {"煤": 2, "细砂岩": 2})
+
+    def test_incremental_changes_match_rebuild(self):
+        with self.engine.begin() as connection:
+            before = read_summary_rows(connection, [1, 3])
+            connection.execute(text('UPDATE records SET "份" = \'陕西省\', "岩性" = \'泥岩\' WHERE ROWID = 1'))
+            connection.execute(text("DELETE FROM records WHERE ROWID = 3"))
+            connection.execute(text('INSERT INTO records ("矿名", "份", "岩性") VALUES (\'平朔矿\', \'山西\', \'泥岩\')'))
+            apply_records_changes(connection, before, [1, 5], [3])
+        incremental = self._snapshot()
+
+        with self.engine.begin() as connection:
+            rebuild_records_summary(connection)
+        rebuilt = self._snapshot()
+
+        pd.testing.assert_frame_equal(incremental[0], rebuilt[0])
+        pd.testing.assert_frame_equal(incremental[1], rebuilt[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
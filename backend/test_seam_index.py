@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from coal_seam_blocks.seam_index import SeamIndex, find_sequence_column
+
+
+def _frame():
+    return pd.DataFrame({
+        "序号(从下到上)": [3, 1, 2, 3, None, 1],
+        "名称": [" 煤", "砂岩", np.nan, "煤 ", "", "nan"],
+        "编号": [2, 1, "2", " 1 ", 2.0, 3],
+    })
+
+
+class SeamIndexTest(unittest.TestCase):
+    def test_labels_are_stripped_and_missing_values_skipped(self):
+        index = SeamIndex.build(_frame(), "名称")
+        self.assertEqual(len(index), 6)
+        self.assertEqual(index.categories, ["煤", "砂岩"])
+        self.assertEqual(index.codes.tolist(), [0, 1, -1, 0, -1, -1])
+
+    def test_numeric_labels_are_grouped_as_strings(self):
+        index = SeamIndex.build(_frame(), "编号")
+        self.assertEqual(index.counts(), {"2": 2, "1": 2, "2.0": 1, "3": 1})
+        self.assertEqual(index.rows_for([1]).tolist(), [1, 3])
+
+    def test_rows_for_multiple_values(self):
+        index = SeamIndex.build(_frame(), "名称")
+        self.assertEqual(index.rows_for(["砂岩", " 煤"]).tolist(), [0, 1, 3])
+        self.assertEqual(index.rows_for(["煤", "泥岩"]).tolist(), [0, 3])
+        self.assertEqual(index.rows_for(["泥岩"]).tolist(), [])
+        self.assertEqual(index.rows_for([]).tolist(), [])
+
+    def test_counts(self):
+        self.assertEqual(SeamIndex.build(_frame(), "名称").counts(), {"煤": 2, "砂岩": 1})
+
+    def test_ordered_values_follow_sequence_column(self):
+        df = _frame()
+        column = find_sequence_column(df)
+        self.assertEqual(column, "序号(从下到上)")
+        self.assertEqual(SeamIndex.build(df, "名称", column).ordered_values(), ["砂岩", "煤"])
+        # 序号最小值取自各自的全部行, 无有效序号的取值排在最后
+        df = pd.DataFrame({"序号": [5, None, 2, 1], "名称": ["泥岩", "页岩", "煤", "泥岩"]})
+        self.assertEqual(SeamIndex.build(df, "名称", "序号").ordered_values(), ["泥岩", "煤", "页岩"])
+
+    def test_ordered_values_without_sequence_column_sort_by_name(self):
+        df = pd.DataFrame({"名称": ["b", "a", "c"]})
+        self.assertIsNone(find_sequence_column(df))
+        self.assertEqual(SeamIndex.build(df, "名称").ordered_values(), ["a", "b", "c"])
+        # 序号列全部无效时同样按名称排序
+        df["序号"] = ["x", None, "y"]
+        self.assertEqual(SeamIndex.build(df, "名称", "序号").ordered_values(), ["a", "b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from shared_state import SharedRateLimiter, SharedStateStore
+
+
+class SharedRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = SharedStateStore(Path(self._tmp.name) / "state.db")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_concurrent_requests_do_not_exceed_limit(self):
+        # 每个线程各自持有连接, 模拟多个工作进程同时命中同一客户端
+        limiter = SharedRateLimiter(self.store, "requests", max_requests=10, window_seconds=3600)
+        results = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            for _ in range(5):
+                results.append(limiter.is_allowed("client"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(results), 10)
+        self.assertIsNotNone(limiter.get_retry_after("client"))
+
+    def test_rejected_requests_do_not_consume_quota(self):
+        limiter = SharedRateLimiter(self.store, "uploads", max_requests=2, window_seconds=3600)
+        self.assertEqual([limiter.is_allowed("client") for _ in range(4)], [True, True, False, False])
+        current_key, _, _ = limiter._window_keys("client", time.time())
+        self.assertEqual(self.store.get_counter(current_key), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = 0
+
+    def _slow(self, value=42, error=None):
+        def compute():
+            self.calls += 1
+            time.sleep(0.1)
+            if error is not None:
+                raise error
+            return value
+        return compute
+
+    def _run_threads(self, func, count=8):
+        results = []
+
+        def worker():
+            try:
+                results.append(self.flight.run("key", func))
+            except Exception as exc:
+                results.append(exc)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_threads_share_one_execution(self):
+        results = self._run_threads(self._slow())
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.get_stats(), {"in_flight": 0, "executions": 1, "coalesced": 7})
+
+    def test_errors_propagate_to_every_waiter(self):
+        results = self._run_threads(self._slow(error=ValueError("插值失败")))
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(item, ValueError) for item in results))
+        # 失败后不保留结果, 下一次调用重新计算
+        self.assertEqual(self.flight.run("key", lambda: "retry"), "retry")
+
+    def test_async_callers_and_threads_coalesce(self):
+        async def main():
+            thread = threading.Thread(target=lambda: self.flight.run("key", self._slow(7)))
+            tasks = [self.flight.run_async("key", self._slow(7)) for _ in range(4)]
+            thread.start()
+            results = await asyncio.gather(*tasks)
+            await asyncio.to_thread(thread.join)
+            return results
+
+        self.assertEqual(asyncio.run(main()), [7] * 4)
+        self.assertEqual(self.calls, 1)
+
+    def test_nested_call_with_same_key_does_not_deadlock(self):
+        result = self.flight.run("key", lambda: self.flight.run("key", lambda: "inner") + "+outer")
+        self.assertEqual(result, "inner+outer")
+
+
+if __name__ == "__main__":
+    unittest.main()
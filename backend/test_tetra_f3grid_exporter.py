@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from coal_seam_blocks.modeling import BlockModel
+from exporters.tetra_f3grid_exporter import TetraF3GridExporter, _signed_tet_volumes
+
+
+def _model(x):
+    grid_x, grid_y = np.meshgrid(x, [0.0, 10.0, 20.0])
+    bottom = np.zeros_like(grid_x)
+    middle = bottom + 5.0
+    top = middle + 3.0
+    block_models = [
+        BlockModel("泥岩", points=9, top_surface=middle, bottom_surface=bottom),
+        BlockModel("6煤", points=9, top_surface=top, bottom_surface=middle),
+        BlockModel("泥岩", points=9, top_surface=top + 2.0, bottom_surface=top),
+    ]
+    return {"block_models": block_models, "grid_x": grid_x, "grid_y": grid_y}
+
+
+class TetraF3GridExporterTest(unittest.TestCase):
+    def _export(self, data, options=None):
+        exporter = TetraF3GridExporter()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.f3grid")
+            with contextlib.redirect_stdout(io.StringIO()):
+                exporter.export(data, path, options)
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        return exporter, lines
+
+    def _volumes(self, lines):
+        points = {int(p[1]): [float(v) for v in p[2:]] for p in (l.split() for l in lines if l.startswith("G "))}
+        tets = np.array([[int(v) for v in l.split()[3:]] for l in lines if l.startswith("Z T4 ")])
+        xyz = np.array([points[gid] for gid in tets.ravel()]).reshape(-1, 4, 3)
+        return tets, _signed_tet_volumes(xyz[:, 0], xyz[:, 1], xyz[:, 2], xyz[:, 3])
+
+    def test_six_tets_per_hex_share_interface_nodes(self):
+        exporter, lines = self._export(_model([0.0, 10.0, 20.0]))
+        self.assertEqual(exporter.gridpoint_count, 4 * 9)
+        tets, volumes = self._volumes(lines)
+        # 3 层 × 4 个 hexa × 6 个四面体
+        self.assertEqual(len(tets), 72)
+        self.assertTrue((volumes > 0).all())
+        self.assertEqual(tets[0].tolist(), [1, 2, 5, 14])
+        # 第二层的底面节点即第一层的顶面节点
+        self.assertEqual(tets[24].tolist(), [10, 11, 14, 23])
+        # 同名岩层合并为一个分组, 每行 20 个单元ID
+        group = lines.index("ZGROUP 'mudstone'")
+        self.assertEqual(lines[group + 1].split()[:2], ["1", "2"])
+        self.assertEqual(lines[group + 2].split()[3:6], ["24", "49", "50"])
+        self.assertEqual(lines[group + 3].split()[0], "65")
+
+    def test_negative_volumes_are_flipped(self):
+        _, lines = self._export(_model([20.0, 10.0, 0.0]))
+        tets, volumes = self._volumes(lines)
+        self.assertEqual(len(tets), 72)
+        self.assertTrue((volumes > 0).all())
+        self.assertEqual(tets[0].tolist(), [1, 5, 2, 14])
+
+    def test_degenerate_tets_are_removed(self):
+        exporter, lines = self._export(_model([0.0, 10.0, 20.0]), {"min_tet_volume": 40.0})
+        # 5m 层的四面体体积为 83.3, 3m / 2m 层为 50 / 33.3
+        self.assertEqual(len(exporter.tet_zones), 48)
+        self.assertEqual([r.stop - r.start for r in exporter.layer_zone_ids["泥岩"]], [24, 0])
+        self.assertTrue(all(line.split()[2] == str(i + 1)
+                            for i, line in enumerate(l for l in lines if l.startswith("Z T4 "))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import workspace as workspace_module
+from shared_state import SharedStateStore
+from workspace import ModelingState, WorkspaceManager
+
+
+class WorkspaceManagerTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.manager = WorkspaceManager(
+            memory_limit_mb=1,
+            idle_timeout_seconds=60,
+            snapshot_dir=Path(self._tmp.name),
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _load(self, session_id, rows):
+        workspace = self.manager.acquire(session_id)
+        workspace.modeling.merged_df = pd.DataFrame({"厚度": np.arange(rows, dtype=float)})
+        self.manager.release(workspace)
+        return workspace
+
+    def test_sessions_are_isolated(self):
+        first = self._load("session-first", 10)
+        second = self._load("session-second", 20)
+        self.assertIsNot(first.modeling, second.modeling)
+        self.assertEqual(len(self.manager.acquire("session-first").modeling.merged_df), 10)
+
+    def test_lru_session_is_snapshotted_and_restored(self):
+        self._load("session-old", 80_000)
+        self._load("session-new", 80_000)
+
+        stats = self.manager.get_stats()
+        self.assertLessEqual(stats["resident_mb"], stats["limit_mb"])
+        self.assertEqual(stats["snapshot_sessions"], 1)
+
+        restored = self.manager.acquire("session-old")
+        self.assertEqual(len(restored.modeling.merged_df), 80_000)
+        self.assertEqual(self.manager.get_stats()["restores"], 1)
+
+    def test_active_workspace_is_not_evicted(self):
+        active = self.manager.acquire("session-active")
+        active.modeling.merged_df = pd.DataFrame({"厚度": np.zeros(200_000)})
+        active.measure()
+        self.manager.enforce_memory_limit()
+        self.assertIs(self.manager.acquire("session-active"), active)
+
+    def test_snapshot_write_does_not_block_other_sessions(self):
+        self._load("session-slow", 80_000)
+        started, release = threading.Event(), threading.Event()
+        original = workspace_module.write_object_state
+
+        def slow_write(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(workspace_module, "write_object_state", slow_write):
+            evicting = threading.Thread(target=self._load, args=("session-big", 80_000))
+            evicting.start()
+            self.assertTrue(started.wait(5))
+            begin = time.monotonic()
+            other = self.manager.acquire("session-other")
+            self.manager.release(other)
+            # 写快照期间被换出的会话可直接收回
+            reclaimed = self.manager.acquire("session-slow")
+            self.assertLess(time.monotonic() - begin, 1.0)
+            self.assertEqual(len(reclaimed.modeling.merged_df), 80_000)
+            release.set()
+            evicting.join(5)
+        self.manager.release(reclaimed)
+
+
+class ModelingStateTest(unittest.TestCase):
+    def test_dataset_key_fallback_is_computed_once(self):
+        state = ModelingState()
+        state.set_dataset(pd.DataFrame({"厚度": np.arange(10, dtype=float)}), None)
+        with mock.patch.object(workspace_module, "fingerprint", wraps=workspace_module.fingerprint) as spy:
+            key = state.get_dataset_key()
+            self.assertEqual(state.get_dataset_key(), key)
+        self.assertEqual(spy.call_count, 1)
+        self.assertTrue(key.startswith("frame:"))
+
+        state.set_dataset(pd.DataFrame({"厚度": np.arange(5, dtype=float)}), None, dataset_key="upload-key")
+        self.assertEqual(state.get_dataset_key(), "upload-key")
+
+
+class SharedWorkspaceTest(unittest.TestCase):
+    """两个管理器共享同一索引, 模拟两个工作进程"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        self.workers = [
+            WorkspaceManager(
+                memory_limit_mb=100,
+                idle_timeout_seconds=60,
+                snapshot_dir=root / "workspaces",
+                store=SharedStateStore(root / "state.db"),
+                shared=True,
+            )
+            for _ in range(2)
+        ]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_state_written_by_one_worker_is_visible_to_another(self):
+        first, second = self.workers
+        workspace = first.acquire("session-shared")
+        workspace.modeling.merged_df = pd.DataFrame({"厚度": [1.0, 2.0], "岩性": ["煤", "泥岩"]})
+        workspace.modeling.numeric_columns = ["厚度"]
+        first.release(workspace)
+
+        seen = second.acquire("session-shared")
+        pd.testing.assert_frame_equal(seen.modeling.merged_df, workspace.modeling.merged_df)
+        self.assertEqual(seen.modeling.numeric_columns, ["厚度"])
+        seen.modeling.last_selected_seam_column = "岩性"
+        second.release(seen)
+
+        reloaded = first.acquire("session-shared")
+        self.assertEqual(reloaded.modeling.last_selected_seam_column, "岩性")
+        self.assertEqual(first.get_stats()["reloads"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,6 +11,8 @@ import traceback
 from typing import Tuple, Dict, List, Any, Optional
 from dataclasses import dataclass
 
+from csv_reader import read_csv
+
 
 @dataclass
 class InterpolationLayer:
@@ -182,13 +184,7 @@ def process_borehole_csv_for_feasibility(csv_file_path: str, bottom_coal_name: s
     """
     try:
         # 读取CSV文件
-        try:
-            df = pd.read_csv(csv_file_path, encoding='utf-8-sig')
-        except UnicodeDecodeError:
-            try:
-                df = pd.read_csv(csv_file_path, encoding='gbk')
-            except UnicodeDecodeError:
-                df = pd.read_csv(csv_file_path, encoding='latin-1')
+        df = read_csv(csv_file_path)
 
         # 删除完全空白的行
         df.dropna(how='all', inplace=True)
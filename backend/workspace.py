@@ -0,0 +1,545 @@
+"""
+会话工作区管理
+按会话令牌隔离建模状态与关键层状态, 统计 DataFrame/ndarray 内存占用,
+超出 MODELING_STATE_MEMORY_LIMIT_MB 或长时间空闲时换出到磁盘快照;
+开启 SHARED_STATE_ENABLED 后快照在多个工作进程之间共享
+"""
+import hashlib
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import HTTPException, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from coal_seam_blocks.seam_index import SeamIndex, find_sequence_column
+from columnar_store import atomic_write_dir, read_object_state, remove_dir, write_object_state
+from fingerprint import fingerprint
+from memory_utils import estimate_nbytes
+from shared_state import SharedStateStore, get_shared_store, is_shared_state_enabled
+
+APP_ROOT = Path(__file__).resolve().parent
+
+SESSION_HEADER = "X-Session-Id"
+SESSION_COOKIE = "mining_session"
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{8,128}$")
+
+
+class ModelingState:
+    """In-memory storage for the geological modeling workflow."""
+
+    def __init__(self) -> None:
+        self.merged_df: Optional[pd.DataFrame] = None
+        self.coords_df: Optional[pd.DataFrame] = None
+        self.numeric_columns: List[str] = []
+        self.text_columns: List[str] = []
+        self.last_selected_seam_column: Optional[str] = None
+        self.borehole_file_count: int = 0
+        # 新增: 存储最近一次建模的结果
+        self.last_block_models = None
+        self.last_grid_x = None
+        self.last_grid_y = None
+        # 岩层分组索引 (列名 -> SeamIndex), 随数据集一起保存
+        self.seam_indexes: Dict[str, SeamIndex] = {}
+        # 数据集内容指纹 (上传文件指纹), 不同会话加载同一批文件时相同
+        self.dataset_key: Optional[str] = None
+
+    def ensure_loaded(self) -> None:
+        if self.merged_df is None:
+            raise HTTPException(status_code=400, detail="请先上传并合并钻孔与坐标数据")
+
+    def set_dataset(
+        self,
+        merged_df: pd.DataFrame,
+        coords_df: Optional[pd.DataFrame],
+        dataset_key: Optional[str] = None,
+    ) -> None:
+        """替换当前数据集, 旧数据集上的索引一并失效"""
+        self.merged_df = merged_df
+        self.coords_df = coords_df
+        self.seam_indexes = {}
+        self.dataset_key = dataset_key
+
+    def get_dataset_key(self) -> str:
+        """用于合并相同计算的数据集标识, 没有上传文件指纹时按 DataFrame 内容计算一次并保存"""
+        self.ensure_loaded()
+        if not getattr(self, "dataset_key", None):
+            self.dataset_key = f"frame:{fingerprint(self.merged_df, self.coords_df)}"
+        return self.dataset_key
+
+    def build_seam_indexes(self, columns: List[str]) -> None:
+        """数据加载时为岩层、钻孔等文本列一次性建立分组索引"""
+        sequence_column = find_sequence_column(self.merged_df)
+        for column in columns:
+            self.seam_indexes[column] = SeamIndex.build(self.merged_df, column, sequence_column)
+
+    def get_seam_index(self, column: str) -> SeamIndex:
+        """获取 (必要时构建) 指定列的分组索引"""
+        self.ensure_loaded()
+        index = self.seam_indexes.get(column)
+        if index is None or len(index) != len(self.merged_df):
+            index = SeamIndex.build(self.merged_df, column, find_sequence_column(self.merged_df))
+            self.seam_indexes[column] = index
+        return index
+
+    def ensure_models_ready(self):
+        """确保已经生成了块体模型"""
+        if self.last_block_models is None or self.last_grid_x is None or self.last_grid_y is None:
+            raise HTTPException(status_code=400, detail="请先调用 /api/modeling/block_model 生成3D模型")
+
+
+class KeyStratumState:
+    def __init__(self) -> None:
+        self.files: Dict[str, pd.DataFrame] = {}
+        self.filled: bool = False
+        self.last_result: Optional[pd.DataFrame] = None
+
+    def reset(self) -> None:
+        self.files = {}
+        self.filled = False
+        self.last_result = None
+
+
+class Workspace:
+    """单个会话的工作区"""
+
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self.modeling = ModelingState()
+        self.key_stratum = KeyStratumState()
+        self.last_access = time.time()
+        self.size_bytes = 0
+        self.active_requests = 0
+        # 共享快照版本号与位置, 用于判断其他工作进程是否已写入更新的状态
+        self.version = 0
+        self.snapshot_path: Optional[Path] = None
+        self.lock = threading.Lock()
+        self._measured_signature: Optional[Tuple[int, ...]] = None
+        self._persisted: Dict[str, Dict[str, Any]] = {}
+
+    def _state_signature(self) -> Tuple[int, ...]:
+        """状态对象身份签名, 未变化时无需重新统计内存"""
+        values = list(vars(self.modeling).values()) + list(vars(self.key_stratum).values())
+        values.extend(self.key_stratum.files.values())
+        return tuple(id(value) for value in values)
+
+    def measure(self) -> int:
+        signature = self._state_signature()
+        if signature != self._measured_signature:
+            self.size_bytes = estimate_nbytes(self.modeling) + estimate_nbytes(self.key_stratum)
+            self._measured_signature = signature
+        return self.size_bytes
+
+    def is_empty(self) -> bool:
+        return self.modeling.merged_df is None and not self.key_stratum.files
+
+    # ------------------------------------------------------------------
+    # 持久化跟踪
+    # ------------------------------------------------------------------
+    def _states(self) -> Dict[str, Any]:
+        return {"modeling": self.modeling, "key_stratum": self.key_stratum}
+
+    def mark_persisted(self) -> None:
+        """记录已写入快照的属性引用 (容器做浅拷贝, 以便识别原地增删)"""
+        self._persisted = {
+            part: {
+                name: dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value
+                for name, value in vars(state).items()
+            }
+            for part, state in self._states().items()
+        }
+
+    def unchanged_attributes(self, part: str) -> List[str]:
+        """自上次写快照以来未被替换的属性"""
+        persisted = self._persisted.get(part)
+        if not persisted:
+            return []
+        unchanged = []
+        for name, value in vars(self._states()[part]).items():
+            if name in persisted and _same_value(persisted[name], value):
+                unchanged.append(name)
+        return unchanged
+
+    def is_dirty(self) -> bool:
+        if not self._persisted:
+            return not self.is_empty()
+        return any(
+            len(self.unchanged_attributes(part)) != len(vars(state))
+            for part, state in self._states().items()
+        )
+
+
+def _same_value(old: Any, new: Any) -> bool:
+    if isinstance(new, dict) and isinstance(old, dict):
+        return old.keys() == new.keys() and all(old[key] is new[key] for key in new)
+    if isinstance(new, list) and isinstance(old, list):
+        return len(old) == len(new) and all(a is b for a, b in zip(old, new))
+    return old is new
+
+
+class WorkspaceManager:
+    """会话工作区管理器 (LRU + 空闲超时 + 磁盘快照)
+
+    快照以列式格式写入 ``snapshot_dir``, 位置和版本号登记在共享 SQLite 索引中。
+    ``shared=True`` 时每个请求结束后把变更写回快照 (未变化的数据集以硬链接复用),
+    获取工作区时若索引中的版本比本进程驻留副本新则重新映射, 从而支持多工作进程部署。
+    """
+
+    def __init__(
+        self,
+        memory_limit_mb: int,
+        idle_timeout_seconds: int,
+        snapshot_dir: Path,
+        snapshot_retention_seconds: int = 86400,
+        store: Optional[SharedStateStore] = None,
+        shared: bool = False,
+    ) -> None:
+        self.memory_limit_bytes = int(memory_limit_mb) * 1024 * 1024
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.snapshot_dir = Path(snapshot_dir)
+        self.snapshot_retention_seconds = snapshot_retention_seconds
+        self.store = store if store is not None else SharedStateStore(self.snapshot_dir / "index.db")
+        self.shared = shared
+        self._resident: "OrderedDict[str, Workspace]" = OrderedDict()
+        # 已移出驻留表、快照尚未写完的工作区; 以及正在从快照恢复的会话
+        self._evicting: Dict[str, Workspace] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.RLock()
+        self._evictions = 0
+        self._restores = 0
+        self._reloads = 0
+
+    # ------------------------------------------------------------------
+    # 快照
+    # ------------------------------------------------------------------
+    def _new_snapshot_path(self, session_id: str) -> Path:
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return self.snapshot_dir / f"{digest}-{uuid.uuid4().hex[:8]}"
+
+    def _write_snapshot(self, workspace: Workspace) -> None:
+        """写入新快照并登记到索引, 旧快照在登记成功后删除"""
+        with workspace.lock:
+            if not workspace.is_dirty():
+                return
+            if workspace.is_empty():
+                old_path = self.store.remove_workspace(workspace.session_id)
+                remove_dir(Path(old_path) if old_path else None)
+                workspace.version, workspace.snapshot_path = 0, None
+                workspace.mark_persisted()
+                return
+
+            previous = workspace.snapshot_path
+
+            def writer(staging: Path) -> None:
+                for part, state in workspace._states().items():
+                    write_object_state(
+                        state,
+                        staging / part,
+                        reuse_from=previous / part if previous is not None and previous.exists() else None,
+                        unchanged=workspace.unchanged_attributes(part),
+                    )
+
+            path = atomic_write_dir(self._new_snapshot_path(workspace.session_id), writer)
+            version, old_path = self.store.publish_workspace(workspace.session_id, str(path), workspace.measure())
+            workspace.version, workspace.snapshot_path = version, path
+            workspace.mark_persisted()
+            if old_path and Path(old_path) != path:
+                remove_dir(Path(old_path))
+
+    def _read_snapshot(self, session_id: str, entry: Optional[Tuple[int, str]]) -> Optional[Workspace]:
+        if entry is None:
+            return None
+        version, path = entry
+        try:
+            workspace = Workspace(session_id)
+            workspace.modeling = read_object_state(Path(path) / "modeling")
+            workspace.key_stratum = read_object_state(Path(path) / "key_stratum")
+        except Exception as exc:
+            print(f"[工作区] 快照读取失败, 已丢弃: {Path(path).name} -> {exc}")
+            return None
+        workspace.version, workspace.snapshot_path = version, Path(path)
+        workspace.mark_persisted()
+        return workspace
+
+    # ------------------------------------------------------------------
+    # 获取与释放
+    # ------------------------------------------------------------------
+    def acquire(self, session_id: str) -> Workspace:
+        """获取会话工作区 (已换出或被其他进程更新的会话从快照恢复)
+
+        快照在管理器锁外读取; 同一会话的并发请求等待首个请求恢复完成后复用其结果。
+        """
+        entry = self.store.lookup_workspace(session_id)
+        while True:
+            with self._lock:
+                workspace = self._resident.get(session_id)
+                if workspace is None and session_id in self._evicting:
+                    # 快照仍在写出, 直接收回内存中的副本
+                    workspace = self._evicting.pop(session_id)
+                    self._resident[session_id] = workspace
+                if (
+                    workspace is not None
+                    and entry is not None
+                    and entry[0] > workspace.version
+                    and workspace.active_requests == 0
+                ):
+                    # 其他工作进程写入了更新的状态, 丢弃本地副本
+                    self._resident.pop(session_id)
+                    workspace = None
+                    self._reloads += 1
+                if workspace is not None:
+                    return self._checkout(workspace)
+                loading = self._loading.get(session_id)
+                if loading is None:
+                    loading = self._loading[session_id] = threading.Event()
+                    break
+            loading.wait()
+
+        try:
+            workspace = self._read_snapshot(session_id, entry)
+            with self._lock:
+                if workspace is not None:
+                    self._restores += 1
+                    print(f"[工作区] 从快照恢复会话 {session_id[:8]} (版本 {workspace.version})")
+                else:
+                    workspace = Workspace(session_id)
+                self._resident[session_id] = workspace
+                return self._checkout(workspace)
+        finally:
+            with self._lock:
+                self._loading.pop(session_id, None)
+            loading.set()
+
+    def _checkout(self, workspace: Workspace) -> Workspace:
+        """标记工作区正在使用 (调用方须持有管理器锁)"""
+        self._resident.move_to_end(workspace.session_id)
+        workspace.active_requests += 1
+        workspace.last_access = time.time()
+        return workspace
+
+    def release(self, workspace: Workspace) -> None:
+        """请求结束: 共享模式下写回变更, 重新统计内存并按上限换出"""
+        if self.shared:
+            try:
+                self._write_snapshot(workspace)
+            except Exception as exc:
+                print(f"[工作区] 快照写入失败: {workspace.session_id[:8]} -> {exc}")
+        with self._lock:
+            workspace.active_requests = max(0, workspace.active_requests - 1)
+            workspace.last_access = time.time()
+            if self._resident.get(workspace.session_id) is workspace:
+                workspace.measure()
+        self.enforce_memory_limit(keep=workspace.session_id)
+
+    def _detach(self, session_ids: List[str]) -> List[Workspace]:
+        """从驻留表移出待换出的工作区 (调用方须持有管理器锁), 快照写完前仍可被 acquire 收回"""
+        detached = []
+        for session_id in session_ids:
+            workspace = self._resident.pop(session_id, None)
+            if workspace is not None:
+                self._evicting[session_id] = workspace
+                detached.append(workspace)
+        return detached
+
+    def _persist_detached(self, workspaces: List[Workspace]) -> None:
+        """在管理器锁外写出已移出工作区的快照"""
+        for workspace in workspaces:
+            try:
+                self._write_snapshot(workspace)
+            except Exception as exc:
+                print(f"[工作区] 快照写入失败, 会话数据已丢弃: {workspace.session_id[:8]} -> {exc}")
+            with self._lock:
+                if self._evicting.get(workspace.session_id) is workspace:
+                    self._evicting.pop(workspace.session_id)
+                self._evictions += 1
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(ws.size_bytes for ws in self._resident.values())
+
+    def enforce_memory_limit(self, keep: Optional[str] = None) -> int:
+        """按 LRU 顺序换出工作区直至总内存低于上限
+
+        正在处理请求的工作区不会被换出; ``keep`` 指定的会话最后才考虑换出。
+        在锁内挑选并移出换出对象, 快照在锁外写入。
+        """
+        with self._lock:
+            total = self.total_bytes()
+            if total <= self.memory_limit_bytes:
+                return 0
+            candidates = [sid for sid, ws in self._resident.items() if ws.active_requests == 0 and sid != keep]
+            if keep in self._resident and self._resident[keep].active_requests == 0:
+                candidates.append(keep)
+            victims = []
+            for session_id in candidates:
+                if total <= self.memory_limit_bytes:
+                    break
+                victims.append(session_id)
+                total -= self._resident[session_id].size_bytes
+            detached = self._detach(victims)
+        if detached:
+            self._persist_detached(detached)
+            print(
+                f"[工作区] 内存超限, 换出 {len(detached)} 个会话, "
+                f"当前占用 {self.total_bytes() / (1024 * 1024):.1f}MB"
+            )
+        return len(detached)
+
+    def evict_idle(self) -> int:
+        """换出空闲超时的工作区"""
+        now = time.time()
+        with self._lock:
+            idle = [
+                sid for sid, ws in self._resident.items()
+                if ws.active_requests == 0 and now - ws.last_access > self.idle_timeout_seconds
+            ]
+            detached = self._detach(idle)
+        self._persist_detached(detached)
+        return len(detached)
+
+    def cleanup_snapshots(self) -> int:
+        """删除超过保留期限的磁盘快照, 以及索引中已不存在的残留目录"""
+        cutoff = time.time() - self.snapshot_retention_seconds
+        removed = 0
+        for session_id, path in self.store.expired_workspaces(cutoff).items():
+            with self._lock:
+                if session_id in self._resident or session_id in self._evicting:
+                    continue
+            self.store.remove_workspace(session_id)
+            remove_dir(Path(path))
+            removed += 1
+
+        if self.snapshot_dir.exists():
+            referenced = set(self.store.workspace_paths())
+            for path in self.snapshot_dir.iterdir():
+                try:
+                    if path.is_dir() and str(path) not in referenced and path.stat().st_mtime < cutoff:
+                        remove_dir(path)
+                except OSError:
+                    continue
+        return removed
+
+    def clear(self) -> None:
+        """清空所有驻留工作区 (不写快照)"""
+        from memory_utils import clear_dataframe_cache
+
+        with self._lock:
+            states: List[Any] = []
+            for workspace in self._resident.values():
+                states.extend([workspace.modeling, workspace.key_stratum])
+            self._resident.clear()
+        clear_dataframe_cache(states)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident_sessions": len(self._resident),
+                "snapshot_sessions": self.store.workspace_count(),
+                "resident_mb": round(self.total_bytes() / (1024 * 1024), 2),
+                "limit_mb": round(self.memory_limit_bytes / (1024 * 1024), 2),
+                "shared": self.shared,
+                "evictions": self._evictions,
+                "restores": self._restores,
+                "reloads": self._reloads,
+            }
+
+
+# ============================================================================
+# 全局实例与 FastAPI 集成
+# ============================================================================
+
+_manager: Optional[WorkspaceManager] = None
+
+
+def get_workspace_manager() -> WorkspaceManager:
+    """获取全局工作区管理器"""
+    global _manager
+    if _manager is None:
+        from performance_config import (
+            MODELING_STATE_MEMORY_LIMIT_MB,
+            WORKSPACE_IDLE_TIMEOUT_SECONDS,
+            WORKSPACE_SNAPSHOT_DIR,
+            WORKSPACE_SNAPSHOT_RETENTION_SECONDS,
+        )
+        snapshot_dir = Path(WORKSPACE_SNAPSHOT_DIR) if WORKSPACE_SNAPSHOT_DIR else APP_ROOT.parent / "data" / "workspaces"
+        shared = is_shared_state_enabled()
+        _manager = WorkspaceManager(
+            memory_limit_mb=MODELING_STATE_MEMORY_LIMIT_MB,
+            idle_timeout_seconds=WORKSPACE_IDLE_TIMEOUT_SECONDS,
+            snapshot_dir=snapshot_dir,
+            snapshot_retention_seconds=WORKSPACE_SNAPSHOT_RETENTION_SECONDS,
+            store=get_shared_store() if shared else None,
+            shared=shared,
+        )
+    return _manager
+
+
+def resolve_session_id(request: Request) -> Tuple[str, bool]:
+    """从请求头或 Cookie 中解析会话令牌, 没有时生成新令牌
+
+    Returns:
+        (session_id, is_new)
+    """
+    for candidate in (request.headers.get(SESSION_HEADER), request.cookies.get(SESSION_COOKIE)):
+        if candidate and _SESSION_ID_PATTERN.match(candidate):
+            return candidate, False
+    return uuid.uuid4().hex, True
+
+
+class SessionMiddleware(BaseHTTPMiddleware):
+    """为每个请求分配会话令牌, 新会话通过 Cookie 下发"""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        session_id, is_new = resolve_session_id(request)
+        request.state.session_id = session_id
+        response = await call_next(request)
+        if is_new:
+            response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+        return response
+
+
+def get_workspace(request: Request) -> Iterator[Workspace]:
+    """FastAPI 依赖: 获取当前会话的工作区, 请求结束后重新统计内存"""
+    session_id = getattr(request.state, "session_id", None)
+    if not session_id:
+        session_id, _ = resolve_session_id(request)
+    manager = get_workspace_manager()
+    workspace = manager.acquire(session_id)
+    try:
+        yield workspace
+    finally:
+        manager.release(workspace)
+
+
+# ============================================================================
+# 后台清理任务
+# ============================================================================
+
+_cleanup_task = None
+
+
+def start_workspace_cleanup_task():
+    """启动后台工作区清理任务"""
+    global _cleanup_task
+
+    def cleanup_loop():
+        while True:
+            time.sleep(60)
+            manager = get_workspace_manager()
+            idle = manager.evict_idle()
+            if idle > 0:
+                print(f"[工作区] 换出了 {idle} 个空闲会话")
+            removed = manager.cleanup_snapshots()
+            if removed > 0:
+                print(f"[工作区] 删除了 {removed} 个过期快照")
+
+    if _cleanup_task is None:
+        _cleanup_task = threading.Thread(target=cleanup_loop, daemon=True)
+        _cleanup_task.start()
+        print("[工作区] 后台清理任务已启动")
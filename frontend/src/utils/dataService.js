@@ -31,14 +31,42 @@ class DataService {
     }
   }
 
-  // 获取钻孔数据
-  async getBoreholeData() {
-    try {
-      const response = await fetch(`${this.baseURL}/borehole-data`)
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`)
+  // 以 NDJSON 流式读取记录, 每解析出一批就回调 onBatch, 便于逐步渲染
+  async streamRecords(path, { params = {}, onBatch } = {}) {
+    const query = new URLSearchParams({ ...params, format: 'ndjson' })
+    const response = await fetch(`${this.baseURL}/${path}?${query.toString()}`)
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+    const records = []
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    const flush = (text) => {
+      const batch = text.split('\n').filter(line => line.trim()).map(line => JSON.parse(line))
+      if (batch.length) {
+        records.push(...batch)
+        if (onBatch) onBatch(batch, records)
       }
-      const data = await response.json()
+    }
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const end = buffer.lastIndexOf('\n')
+      if (end >= 0) {
+        flush(buffer.slice(0, end))
+        buffer = buffer.slice(end + 1)
+      }
+    }
+    flush(buffer + decoder.decode())
+    return records
+  }
+
+  // 获取钻孔数据 (options: { params, onBatch })
+  async getBoreholeData(options = {}) {
+    try {
+      const data = await this.streamRecords('borehole-data', options)
       this.globalData.boreholeData = data
       return data
     } catch (error) {
@@ -63,14 +91,10 @@ class DataService {
     }
   }
 
-  // 获取煤层数据
-  async getCoalSeamData() {
+  // 获取煤层数据 (options: { params, onBatch })
+  async getCoalSeamData(options = {}) {
     try {
-      const response = await fetch(`${this.baseURL}/coal-seam-data`)
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`)
-      }
-      const data = await response.json()
+      const data = await this.streamRecords('coal-seam-data', options)
       this.globalData.coalSeamData = data
       return data
     } catch (error) {
@@ -1,67 +1,62 @@
 """Import the aggregated rock data CSV into the SQLite database used by the FastAPI backend.
 
 Usage:
-    python scripts/import_database.py [--csv path/to/汇总表.csv] [--database path/to/database.db]
+    python scripts/import_database.py [--csv path/to/汇总表.csv] [--database path/to/database.db] [--chunk-size N]
 """
 from __future__ import annotations
 
 import argparse
+import sys
 from pathlib import Path
 from typing import Optional
 
-import pandas as pd
-from sqlalchemy import create_engine, text
-
 ROOT_DIR = Path(__file__).resolve().parents[1]
 DEFAULT_CSV = ROOT_DIR / "data" / "input" / "汇总表.csv"
 DEFAULT_DB = ROOT_DIR / "data" / "database.db"
-ENCODINGS = ("utf-8-sig", "utf-8", "gbk", "gb2312")
 
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+from cache import bump_data_version  # noqa: E402
+from lithology_stats import STATS_TABLE  # noqa: E402
+from records_fts import FTS_TABLE  # noqa: E402
+from records_import import bulk_load_records, create_import_engine  # noqa: E402
+from records_summary import SUMMARY_TABLE  # noqa: E402
+from shared_state import is_shared_state_enabled  # noqa: E402
 
-def read_source(csv_path: Path) -> pd.DataFrame:
-    if not csv_path.exists():
-        raise FileNotFoundError(f"未找到源文件: {csv_path}")
 
-    last_error: Optional[Exception] = None
-    for encoding in ENCODINGS:
-        try:
-            return pd.read_csv(csv_path, encoding=encoding)
-        except Exception as exc:  # pragma: no cover - fallback decoding attempts
-            last_error = exc
-            continue
-    raise RuntimeError(f"无法读取 CSV，最后一次错误: {last_error}")
+def _print_progress(done_bytes: int, total_bytes: int, message: str) -> None:
+    percentage = 100 * done_bytes / max(total_bytes, 1)
+    print(f"  {percentage:5.1f}%  {message}")
 
 
-def import_to_sqlite(csv_path: Path, db_path: Path) -> None:
-    df = read_source(csv_path)
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    engine = create_engine(f"sqlite:///{db_path}", future=True)
+def import_to_sqlite(csv_path: Path, db_path: Path, chunk_size: Optional[int] = None) -> None:
+    if not csv_path.exists():
+        raise FileNotFoundError(f"未找到源文件: {csv_path}")
 
-    with engine.begin() as conn:
-        conn.execute(text("DROP TABLE IF EXISTS records"))
-    df.to_sql("records", engine, if_exists="replace", index=False)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_import_engine(db_path)
+    try:
+        rows = bulk_load_records(engine, csv_path, chunk_size=chunk_size, progress=_print_progress)
+    finally:
+        engine.dispose()
 
-    with engine.begin() as conn:
-        if "份" in df.columns:
-            conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS idx_records_province ON records ("份")')
-        if "矿名" in df.columns:
-            conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS idx_records_mine ON records ("矿名")')
-        if "岩性" in df.columns:
-            conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS idx_records_lithology ON records ("岩性")')
+    # 多进程部署时通知正在运行的工作进程: 依赖这些表的缓存不再命中
+    if is_shared_state_enabled():
+        bump_data_version("records", FTS_TABLE, SUMMARY_TABLE, STATS_TABLE)
 
-    print(f"已导入 {len(df)} 条记录到 {db_path}")
+    print(f"已导入 {rows} 条记录到 {db_path}")
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="将汇总数据导入 SQLite 数据库")
     parser.add_argument("--csv", type=Path, default=DEFAULT_CSV, help="原始 CSV 文件路径")
     parser.add_argument("--database", type=Path, default=DEFAULT_DB, help="SQLite 数据库存放路径")
+    parser.add_argument("--chunk-size", type=int, default=None, help="每块读取并写入的行数")
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    import_to_sqlite(args.csv, args.database)
+    import_to_sqlite(args.csv, args.database, args.chunk_size)
 
 
 if __name__ == "__main__":